@@ -0,0 +1,36 @@
+"""Homology of a graph with many weakly connected components, computed at
+once or component by component in several threads.
+
+Run with ``pytest benchmarks/bench_components.py``. The graph is
+``medium-test-data.flag`` from flagser's test data, whose 14237 classes in
+dimension 0 are mostly isolated vertices and small components."""
+
+import os
+
+import pytest
+
+from pyflagser import load_unweighted_flag, flagser_unweighted
+
+flag_file = os.path.join(os.path.dirname(__file__), '..', 'flagser', 'test',
+                         'medium-test-data.flag')
+
+
+@pytest.fixture(scope='module')
+def adjacency_matrix():
+    if not os.path.exists(flag_file):
+        pytest.skip("{} not found.".format(flag_file))
+    return load_unweighted_flag(flag_file, fmt='coo')
+
+
+def test_whole(benchmark, adjacency_matrix):
+    benchmark.group = 'flagser_unweighted medium-test-data'
+    benchmark.pedantic(flagser_unweighted, args=(adjacency_matrix,),
+                       rounds=3)
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2, 4, 8])
+def test_split_components(benchmark, adjacency_matrix, n_jobs):
+    benchmark.group = 'flagser_unweighted medium-test-data'
+    benchmark.pedantic(flagser_unweighted, args=(adjacency_matrix,),
+                       kwargs={'split_components': True, 'n_jobs': n_jobs},
+                       rounds=3)
@@ -0,0 +1,32 @@
+"""Time and peak memory of flagser_weighted on a large sparse graph, given as
+a CSR or CSC matrix, whose edges are read by the bindings directly from its
+buffers, or as a COO matrix, whose edges are first extracted in Python.
+
+Run with ``pytest benchmarks/bench_compressed.py``. Homology is only computed
+in dimension 0, so that building the graph dominates."""
+
+import pytest
+
+from pyflagser import flagser_weighted
+
+from graphs import erdos_renyi
+
+
+@pytest.fixture(scope='module')
+def adjacency_matrix():
+    """Directed Erdős–Rényi graph with 10^5 vertices and about 10^6
+    edges."""
+    return erdos_renyi(10 ** 5, 10 ** -4)
+
+
+@pytest.mark.parametrize('max_edge_weight', [None, 1.5])
+@pytest.mark.parametrize('fmt', ['csr', 'csc', 'coo'])
+def test_flagser_weighted_format(benchmark, measure_memory, adjacency_matrix,
+                                 fmt, max_edge_weight):
+    adjacency_matrix = adjacency_matrix.asformat(fmt)
+    kwargs = {'max_edge_weight': max_edge_weight, 'max_dimension': 0}
+    benchmark.group = 'flagser_weighted max_edge_weight={}'.format(
+        max_edge_weight)
+    benchmark.pedantic(flagser_weighted, args=(adjacency_matrix,),
+                       kwargs=kwargs, rounds=3)
+    measure_memory(flagser_weighted, adjacency_matrix, **kwargs)
@@ -0,0 +1,49 @@
+"""Peak memory of flagser_weighted for edge arrays of different dtypes.
+
+Run with ``pytest benchmarks/bench_dtypes.py``. Edge arrays with 32 or
+64-bit integer indices and single or double precision weights are read by
+the bindings without being converted, so the peak memory allocated by NumPy
+during the call, reported as ``peak_memory`` in the extra information of
+each benchmark, does not grow with the number of edges."""
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from pyflagser import flagser_weighted
+
+n_edges_list = [10**5, 10**6, 10**7]
+
+
+@pytest.fixture(scope='module', params=n_edges_list)
+def edges(request):
+    """Random directed weighted graph with about 10 edges per vertex."""
+    n_edges = request.param
+    n_vertices = n_edges // 10
+    rng = np.random.default_rng(0)
+    row = rng.integers(n_vertices, size=n_edges)
+    column = rng.integers(n_vertices, size=n_edges)
+    data = rng.random(n_edges) + 1
+    return n_vertices, row, column, data
+
+
+@pytest.mark.parametrize('weight_dtype', [np.float32, np.float64])
+@pytest.mark.parametrize('index_dtype', [np.int32, np.int64])
+def test_flagser_weighted_dtypes(benchmark, measure_memory, edges,
+                                 index_dtype, weight_dtype):
+    n_vertices, row, column, data = edges
+    adjacency_matrix = sp.coo_matrix(
+        (data.astype(weight_dtype),
+         (row.astype(index_dtype), column.astype(index_dtype))),
+        shape=(n_vertices, n_vertices))
+    # scipy may downcast the indices on construction
+    adjacency_matrix.row = adjacency_matrix.row.astype(index_dtype)
+    adjacency_matrix.col = adjacency_matrix.col.astype(index_dtype)
+    kwargs = {'max_dimension': 0, 'dtype': weight_dtype}
+
+    benchmark.group = 'flagser_weighted n_edges={}'.format(len(row))
+    benchmark.extra_info['edge_memory'] = adjacency_matrix.row.nbytes + \
+        adjacency_matrix.col.nbytes + adjacency_matrix.data.nbytes
+    benchmark.pedantic(flagser_weighted, args=(adjacency_matrix,),
+                       kwargs=kwargs, rounds=3)
+    measure_memory(flagser_weighted, adjacency_matrix, **kwargs)
@@ -0,0 +1,48 @@
+"""Time and peak memory of the edge extraction from dense distance matrices,
+compared to extracting them through full-size index grids.
+
+Run with ``pytest benchmarks/bench_extract.py``, the peak memory allocated
+by NumPy during one extraction is reported as ``peak_memory`` in the extra
+information of each benchmark."""
+
+import numpy as np
+import pytest
+
+from pyflagser._utils import _extract_weighted_graph
+
+n_vertices_list = [1000, 2000, 4000, 8000]
+
+
+def _extract_weighted_graph_grid(adjacency_matrix, max_edge_weight):
+    """Edge extraction through index grids and a full-size diagonal mask."""
+    vertices = adjacency_matrix.diagonal().copy()
+    row, column = np.indices(adjacency_matrix.shape)
+    row, column = row.flat, column.flat
+    data = adjacency_matrix.flat
+    mask = np.logical_not(np.eye(*adjacency_matrix.shape, dtype=bool).flat)
+    if max_edge_weight is None:
+        mask = np.logical_and(mask, np.isfinite(data))
+    else:
+        mask = np.logical_and(mask, data <= max_edge_weight)
+    return vertices, (row[mask], column[mask], data[mask])
+
+
+@pytest.fixture(scope='module', params=n_vertices_list)
+def distance_matrix(request):
+    """Dense distance matrix between random points in the plane."""
+    rng = np.random.default_rng(0)
+    points = rng.random((request.param, 2))
+    return np.sqrt(((points[:, None, :] - points[None, :, :]) ** 2).sum(-1))
+
+
+@pytest.mark.parametrize('max_edge_weight', [None, 0.1])
+@pytest.mark.parametrize('extract', [_extract_weighted_graph,
+                                     _extract_weighted_graph_grid],
+                         ids=['blocks', 'grid'])
+def test_extract_weighted_graph(benchmark, measure_memory, distance_matrix,
+                                extract, max_edge_weight):
+    benchmark.group = 'extract n_vertices={} max_edge_weight={}'.format(
+        len(distance_matrix), max_edge_weight)
+    benchmark.pedantic(extract, args=(distance_matrix, max_edge_weight),
+                       rounds=3)
+    measure_memory(extract, distance_matrix, max_edge_weight)
@@ -0,0 +1,42 @@
+"""Load throughput of ``.flag`` files from 10^4 to 10^7 edges.
+
+Run with ``pytest benchmarks/bench_flagio.py``."""
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from pyflagser import load_unweighted_flag, load_weighted_flag, \
+    save_weighted_flag
+
+n_edges_list = [10**4, 10**5, 10**6, 10**7]
+
+
+@pytest.fixture(scope='module', params=n_edges_list)
+def flag_file(request, tmp_path_factory):
+    """Random directed weighted graph with about 10 edges per vertex."""
+    n_edges = request.param
+    n_vertices = n_edges // 10
+    rng = np.random.default_rng(0)
+    row = rng.integers(n_vertices, size=n_edges)
+    column = rng.integers(n_vertices, size=n_edges)
+    data = rng.random(n_edges)
+    adjacency_matrix = sp.coo_matrix((data, (row, column)),
+                                     shape=(n_vertices, n_vertices))
+    fname = tmp_path_factory.mktemp('flag') / '{}.flag'.format(n_edges)
+    save_weighted_flag(fname, adjacency_matrix)
+    return fname, n_edges
+
+
+def test_load_weighted_flag(benchmark, flag_file):
+    fname, n_edges = flag_file
+    benchmark.group = 'load_weighted_flag'
+    benchmark.extra_info['n_edges'] = n_edges
+    benchmark.pedantic(load_weighted_flag, args=(fname,), rounds=3)
+
+
+def test_load_unweighted_flag(benchmark, flag_file):
+    fname, n_edges = flag_file
+    benchmark.group = 'load_unweighted_flag'
+    benchmark.extra_info['n_edges'] = n_edges
+    benchmark.pedantic(load_unweighted_flag, args=(fname,), rounds=3)
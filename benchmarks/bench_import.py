@@ -0,0 +1,37 @@
+"""Time to import pyflagser in a fresh interpreter, which should stay well
+below that of numpy since the native modules, numpy and scipy are only
+imported when first needed.
+
+Run with ``pytest benchmarks/bench_import.py``."""
+
+import subprocess
+import sys
+
+import pytest
+
+# Budget in seconds for the cumulative time to import pyflagser, as reported
+# by python -X importtime. Importing numpy alone takes several times longer.
+_IMPORT_TIME_BUDGET = 0.05
+
+
+def _import_time(module):
+    """Cumulative import time of `module` in seconds, from the output of
+    python -X importtime."""
+    stderr = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import ' + module],
+        capture_output=True, text=True, check=True).stderr
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split('|')
+        if len(fields) == 3 and fields[2].strip() == module and \
+                not fields[2][1:].startswith(' '):
+            return int(fields[1]) / 1e6
+
+
+@pytest.mark.parametrize('module', ['pyflagser', 'numpy'])
+def test_import_time(benchmark, module):
+    benchmark.group = 'import time'
+    import_time = benchmark.pedantic(_import_time, args=(module,), rounds=5)
+    benchmark.extra_info['import_time'] = import_time
+    if module == 'pyflagser':
+        assert import_time < _IMPORT_TIME_BUDGET
@@ -0,0 +1,54 @@
+"""Time to update the cell counts of a graph with 10^6 edges after a few
+hundred edges changed, incrementally or by counting all cells again.
+
+Run with ``pytest benchmarks/bench_incremental.py``. In each round, the same
+edges are removed from the graph and added back, so that the graph is the
+same for all rounds."""
+
+import numpy as np
+import pytest
+
+from pyflagser import flagser_count_unweighted, IncrementalCellCounter
+
+from graphs import erdos_renyi, unweighted
+
+n_changed_edges_list = [10, 100, 1000]
+
+
+@pytest.fixture(scope='module')
+def adjacency_matrix():
+    """Directed Erdős–Rényi graph with 10^5 vertices and about 10^6
+    edges."""
+    return unweighted(erdos_renyi(10 ** 5, 10 ** -4)).tocsr()
+
+
+@pytest.fixture(scope='module')
+def counter(adjacency_matrix):
+    return IncrementalCellCounter(adjacency_matrix)
+
+
+@pytest.fixture(params=n_changed_edges_list)
+def changed_edges(request, adjacency_matrix):
+    rng = np.random.default_rng(0)
+    row, column = adjacency_matrix.nonzero()
+    mask = row != column
+    index = rng.choice(np.count_nonzero(mask), size=request.param,
+                       replace=False)
+    return np.stack([row[mask][index], column[mask][index]], axis=1)
+
+
+def test_incremental(benchmark, counter, changed_edges):
+    benchmark.group = 'n_changed_edges={}'.format(len(changed_edges))
+
+    def update():
+        counter.remove_edges(changed_edges)
+        counter.add_edges(changed_edges)
+        return counter.cell_count
+
+    benchmark.pedantic(update, rounds=5)
+
+
+def test_full_recomputation(benchmark, adjacency_matrix, changed_edges):
+    benchmark.group = 'n_changed_edges={}'.format(len(changed_edges))
+    benchmark.pedantic(flagser_count_unweighted, args=(adjacency_matrix,),
+                       rounds=3)
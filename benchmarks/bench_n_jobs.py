@@ -0,0 +1,58 @@
+"""Scaling of the cell enumeration and of homology computations with the
+number of threads.
+
+Run with ``pytest benchmarks/bench_n_jobs.py``. flagser builds each complex
+whose homology is computed with a number of threads fixed at compile time,
+which is reported as ``parallel_threads`` in the extra information of the
+homology benchmarks, so that builds with different values of
+``FLAGSER_PARALLEL_THREADS`` can be compared with
+``--benchmark-compare``."""
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from pyflagser import flagser_count_unweighted, flagser_unweighted
+from pyflagser.modules.flagser_pybind import PARALLEL_THREADS
+
+from graphs import erdos_renyi, unweighted
+
+
+def complete_directed_graph(n_vertices):
+    """Adjacency matrix of the graph ``dn.flag`` in flagser's test data,
+    whose directed flag complex has ``n! / (n - k - 1)!`` cells in
+    dimension ``k``."""
+    return np.logical_not(np.eye(n_vertices, dtype=bool))
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2, 4, 8, 16, 32, 64])
+def test_count_d10(benchmark, n_jobs):
+    adjacency_matrix = complete_directed_graph(10)
+    benchmark.group = 'flagser_count_unweighted d10'
+    benchmark.pedantic(flagser_count_unweighted, args=(adjacency_matrix,),
+                       kwargs={'n_jobs': n_jobs}, rounds=3)
+
+
+def test_homology_d10(benchmark):
+    adjacency_matrix = complete_directed_graph(10)
+    benchmark.group = 'flagser_unweighted d10'
+    benchmark.extra_info['parallel_threads'] = PARALLEL_THREADS
+    benchmark.pedantic(flagser_unweighted, args=(adjacency_matrix,),
+                       kwargs={'max_dimension': 5}, rounds=3)
+
+
+@pytest.fixture(scope='module')
+def components():
+    """Disjoint union of 64 directed Erdős–Rényi graphs with 300 vertices
+    and about 9000 edges each."""
+    return sp.block_diag([unweighted(erdos_renyi(300, 0.1, seed=seed))
+                          for seed in range(64)], format='coo')
+
+
+@pytest.mark.parametrize('n_jobs', [1, 2, 4, 8, 16, 32, 64])
+def test_homology_components(benchmark, components, n_jobs):
+    benchmark.group = 'flagser_unweighted 64 components'
+    benchmark.extra_info['parallel_threads'] = PARALLEL_THREADS
+    benchmark.pedantic(flagser_unweighted, args=(components,),
+                       kwargs={'split_components': True, 'n_jobs': n_jobs},
+                       rounds=3)
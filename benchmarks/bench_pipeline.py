@@ -0,0 +1,87 @@
+"""Time and peak memory of each step of the pipeline from ``.flag`` files to
+homology, on the deterministic graphs of ``graphs.py``.
+
+Run with ``pytest benchmarks/bench_pipeline.py``. Loading, edge extraction,
+homology and cell counts are timed separately, and the peak memory of each
+is reported in the extra information of the benchmarks, see ``conftest.py``
+for the comparison of two runs. Benchmarks of a step can be selected with
+``-k``, e.g. ``-k extract``."""
+
+import pytest
+
+from pyflagser import load_unweighted_flag, load_weighted_flag, \
+    save_weighted_flag, flagser_unweighted, flagser_weighted, \
+    flagser_count_unweighted, flagser_count_weighted
+from pyflagser._utils import _extract_unweighted_graph, \
+    _extract_weighted_graph
+
+from graphs import GRAPHS, make_graph, unweighted
+
+ROUNDS = 3
+
+
+@pytest.fixture(scope='module', params=list(GRAPHS))
+def graph(request):
+    """Name, weighted adjacency matrix and maximum homology dimension of
+    each graph."""
+    return request.param, make_graph(request.param), GRAPHS[request.param][2]
+
+
+@pytest.fixture(scope='module')
+def flag_file(graph, tmp_path_factory):
+    name, adjacency_matrix, _ = graph
+    fname = tmp_path_factory.mktemp('flag') / '{}.flag'.format(name)
+    save_weighted_flag(fname, adjacency_matrix)
+    return fname
+
+
+def _run(benchmark, measure_memory, step, graph, func, *args, **kwargs):
+    benchmark.group = '{} {}'.format(step, graph[0])
+    benchmark.pedantic(func, args=args, kwargs=kwargs, rounds=ROUNDS)
+    measure_memory(func, *args, **kwargs)
+
+
+@pytest.mark.parametrize('load', [load_unweighted_flag, load_weighted_flag])
+def test_load_flag(benchmark, measure_memory, graph, flag_file, load):
+    _run(benchmark, measure_memory, load.__name__, graph, load, flag_file)
+
+
+def test_extract_unweighted_graph(benchmark, measure_memory, graph):
+    _run(benchmark, measure_memory, 'extract_unweighted_graph', graph,
+         _extract_unweighted_graph, unweighted(graph[1]))
+
+
+def test_extract_weighted_graph(benchmark, measure_memory, graph):
+    _run(benchmark, measure_memory, 'extract_weighted_graph', graph,
+         _extract_weighted_graph, graph[1], None)
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_flagser_unweighted(benchmark, measure_memory, graph, directed):
+    _run(benchmark, measure_memory,
+         'flagser_unweighted directed={}'.format(directed), graph,
+         flagser_unweighted, unweighted(graph[1]), max_dimension=graph[2],
+         directed=directed)
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_flagser_weighted(benchmark, measure_memory, graph, directed):
+    _run(benchmark, measure_memory,
+         'flagser_weighted directed={}'.format(directed), graph,
+         flagser_weighted, graph[1], max_dimension=graph[2],
+         directed=directed)
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_flagser_count_unweighted(benchmark, measure_memory, graph,
+                                  directed):
+    _run(benchmark, measure_memory,
+         'flagser_count_unweighted directed={}'.format(directed), graph,
+         flagser_count_unweighted, unweighted(graph[1]), directed=directed)
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_flagser_count_weighted(benchmark, measure_memory, graph, directed):
+    _run(benchmark, measure_memory,
+         'flagser_count_weighted directed={}'.format(directed), graph,
+         flagser_count_weighted, graph[1], directed=directed)
@@ -0,0 +1,62 @@
+"""Time saved by the pre-reduction of graphs made of a small dense core and
+large pendant trees.
+
+Run with ``pytest benchmarks/bench_reduction.py``, the fraction of vertices
+and edges removed is reported as ``ratio`` in the extra information of each
+benchmark."""
+
+import numpy as np
+import pytest
+import scipy.sparse as sp
+
+from pyflagser import flagser_unweighted, flagser_weighted
+
+n_tree_vertices_list = [10**3, 10**4, 10**5]
+
+
+@pytest.fixture(scope='module', params=n_tree_vertices_list)
+def adjacency_matrix(request):
+    """Random directed graph on 100 vertices, with random trees hanging from
+    it whose vertices are born after their parent."""
+    n_core, n_tree = 100, request.param
+    rng = np.random.default_rng(0)
+    core = sp.random(n_core, n_core, density=0.2, random_state=0,
+                     format='coo')
+    core.setdiag(0.)
+    core.eliminate_zeros()
+
+    # Each tree vertex hangs from a random earlier vertex
+    children = np.arange(n_core, n_core + n_tree)
+    parents = (rng.random(n_tree) * children).astype(int)
+    births = np.concatenate([np.zeros(n_core), 1. + rng.random(n_tree)])
+    births[children] = np.maximum(births[children], births[parents])
+    births[children] = np.maximum.accumulate(births[children])
+
+    n_vertices = n_core + n_tree
+    row = np.concatenate([core.row, parents, np.arange(n_vertices)])
+    column = np.concatenate([core.col, children, np.arange(n_vertices)])
+    data = np.concatenate([core.data, births[children] + 1., births])
+    return sp.coo_matrix((data, (row, column)),
+                         shape=(n_vertices, n_vertices))
+
+
+@pytest.mark.parametrize('reduce_graph', [False, True])
+def test_weighted(benchmark, adjacency_matrix, reduce_graph):
+    benchmark.group = 'flagser_weighted n_vertices={}'.format(
+        adjacency_matrix.shape[0])
+    out = flagser_weighted(adjacency_matrix, max_dimension=2,
+                           reduce_graph=reduce_graph)
+    if reduce_graph:
+        benchmark.extra_info['ratio'] = out['reduction']['ratio']
+    benchmark.pedantic(flagser_weighted, args=(adjacency_matrix,),
+                       kwargs={'max_dimension': 2,
+                               'reduce_graph': reduce_graph}, rounds=3)
+
+
+@pytest.mark.parametrize('reduce_graph', [False, True])
+def test_unweighted(benchmark, adjacency_matrix, reduce_graph):
+    benchmark.group = 'flagser_unweighted n_vertices={}'.format(
+        adjacency_matrix.shape[0])
+    benchmark.pedantic(flagser_unweighted, args=(adjacency_matrix,),
+                       kwargs={'max_dimension': 2,
+                               'reduce_graph': reduce_graph}, rounds=3)
@@ -0,0 +1,39 @@
+"""Time and peak resident memory of flagser_unweighted depending on where
+flagser keeps the complex and its coboundary matrices.
+
+Run with ``pytest benchmarks/bench_storage.py``. The peak growth of the
+resident memory during one computation is reported as
+``peak_resident_memory`` in the extra information of each benchmark, for the
+default storage, for ``in_memory=True`` and for ``cache_dir``."""
+
+import pytest
+
+from pyflagser import flagser_unweighted
+
+from graphs import GRAPHS, make_graph, unweighted
+
+graph_names = ['d7', 'd10', 'erdos_renyi_dense', 'connectome_sparse']
+
+storages = {'default': {},
+            'in_memory': {'in_memory': True},
+            'cache_dir': {'cache_dir': None}}
+
+
+@pytest.fixture(scope='module', params=graph_names)
+def graph(request):
+    return request.param, unweighted(make_graph(request.param)), \
+        GRAPHS[request.param][2]
+
+
+@pytest.mark.parametrize('storage', list(storages))
+def test_flagser_unweighted_storage(benchmark, measure_memory, graph,
+                                    storage, tmp_path):
+    name, adjacency_matrix, max_dimension = graph
+    kwargs = dict(storages[storage], max_dimension=max_dimension)
+    if 'cache_dir' in kwargs:
+        kwargs['cache_dir'] = tmp_path
+
+    benchmark.group = 'flagser_unweighted {}'.format(name)
+    benchmark.pedantic(flagser_unweighted, args=(adjacency_matrix,),
+                       kwargs=kwargs, rounds=1)
+    measure_memory(flagser_unweighted, adjacency_matrix, **kwargs)
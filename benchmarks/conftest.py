@@ -0,0 +1,106 @@
+"""Peak memory measurements of the benchmarks, and their comparison to a
+previous run.
+
+Timings are compared by ``pytest-benchmark`` itself, e.g. with
+``--benchmark-autosave`` on a reference version and
+``--benchmark-compare --benchmark-compare-fail=mean:10%`` afterwards. The
+peak memory recorded by the ``measure_memory`` fixture is stored in the extra
+information of each benchmark, so that it is saved in the same files, and
+``--memory-compare=PATH`` fails the benchmarks whose peak memory allocated
+through Python grew by more than ``--memory-compare-fail`` percent since the
+run saved in ``PATH``. The peak resident memory, which depends on the state
+of the allocators, is only reported.
+"""
+
+import json
+import threading
+import tracemalloc
+
+import pytest
+
+from pyflagser._utils import _resident_memory
+
+# Interval in seconds at which the resident memory is sampled
+_SAMPLING_INTERVAL = 0.001
+
+# Growth in bytes below which a change of peak memory is never a regression
+_MIN_REGRESSION = 2 ** 20
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup('memory comparison')
+    group.addoption('--memory-compare', metavar='PATH', default=None,
+                    help="Compare the peak memory of the benchmarks to that "
+                         "saved in the JSON file PATH by pytest-benchmark.")
+    group.addoption('--memory-compare-fail', metavar='PERCENT', type=float,
+                    default=10.,
+                    help="Fail the benchmarks whose peak memory grew by more "
+                         "than PERCENT percent (default: 10).")
+
+
+def _baseline(config):
+    if not hasattr(config, '_memory_baseline'):
+        path = config.getoption('--memory-compare')
+        config._memory_baseline = {}
+        if path is not None:
+            with open(path) as f:
+                config._memory_baseline = {
+                    benchmark['fullname']: benchmark['extra_info']
+                    for benchmark in json.load(f)['benchmarks']}
+    return config._memory_baseline
+
+
+def _peak_memory(func, *args, **kwargs):
+    """Peak memory allocated through Python, NumPy arrays included, during a
+    call of `func`, and peak growth of the resident memory sampled in a
+    separate thread, which also covers the allocations of the C++ code while
+    it runs without the GIL. The latter is ``None`` if the resident memory
+    cannot be determined."""
+    start = _resident_memory()
+    peak = [start]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(_SAMPLING_INTERVAL):
+            peak[0] = max(peak[0], _resident_memory())
+
+    if start is not None:
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+    tracemalloc.start()
+    try:
+        func(*args, **kwargs)
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        done.set()
+    if start is None:
+        return peak_memory, None
+    sampler.join()
+    return peak_memory, max(peak[0], _resident_memory()) - start
+
+
+@pytest.fixture
+def measure_memory(benchmark, request):
+    """Function calling its arguments once, recording its peak memory as
+    ``peak_memory`` and ``peak_resident_memory`` in the extra information of
+    the benchmark, and failing if the former regressed compared to
+    ``--memory-compare``. It is meant to be called after timing, so that
+    regressions do not prevent timings from being saved."""
+    def measure(func, *args, **kwargs):
+        peak_memory, peak_resident_memory = _peak_memory(func, *args,
+                                                         **kwargs)
+        benchmark.extra_info['peak_memory'] = peak_memory
+        if peak_resident_memory is not None:
+            benchmark.extra_info['peak_resident_memory'] = \
+                peak_resident_memory
+
+        baseline = _baseline(request.config).get(
+            request.node.nodeid, {}).get('peak_memory')
+        tolerance = request.config.getoption('--memory-compare-fail') / 100
+        if baseline is not None and \
+                peak_memory > max(baseline * (1 + tolerance),
+                                  baseline + _MIN_REGRESSION):
+            pytest.fail("Peak memory regression: {} -> {} bytes."
+                        .format(baseline, peak_memory))
+    return measure
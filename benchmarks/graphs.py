@@ -0,0 +1,131 @@
+"""Deterministic graph generators for the benchmarks.
+
+Each generator returns the adjacency matrix of a weighted graph, with vertex
+weights on the diagonal and, for dense matrices, ``np.inf`` for absent edges,
+so that the same graph can be passed to the weighted and, through
+:func:`unweighted`, to the unweighted functions of ``pyflagser``. Graphs only
+depend on their parameters and seed."""
+
+import numpy as np
+import scipy.sparse as sp
+
+
+def _to_format(n_vertices, row, column, data, vertex_weights, dense):
+    if dense:
+        adjacency_matrix = np.full((n_vertices, n_vertices), np.inf)
+        adjacency_matrix[row, column] = data
+        np.fill_diagonal(adjacency_matrix, vertex_weights)
+        return adjacency_matrix
+
+    diagonal = np.arange(n_vertices)
+    return sp.coo_matrix(
+        (np.concatenate([data, vertex_weights]),
+         (np.concatenate([row, diagonal]),
+          np.concatenate([column, diagonal]))),
+        shape=(n_vertices, n_vertices))
+
+
+def erdos_renyi(n_vertices, density, seed=0, dense=False):
+    """Directed Erdős–Rényi graph in which each edge is present with
+    probability `density`, with uniform weights in ``[1, 2)`` and zero vertex
+    weights."""
+    rng = np.random.default_rng(seed)
+    n_edges = rng.binomial(n_vertices * (n_vertices - 1), density)
+    # Off-diagonal entries of the adjacency matrix, sampled without
+    # replacement in flat indices skipping the diagonal
+    index = rng.choice(n_vertices * (n_vertices - 1), size=n_edges,
+                       replace=False)
+    row, column = np.divmod(index, n_vertices - 1)
+    column += column >= row
+    data = 1. + rng.random(n_edges)
+    return _to_format(n_vertices, row, column, data, np.zeros(n_vertices),
+                      dense)
+
+
+def directed_clique(n_vertices, seed=0, dense=False):
+    """Complete directed graph with both edges between each pair of vertices,
+    as in the ``d5``, ``d7`` and ``d10`` flag files of the tests, with
+    uniform weights in ``[1, 2)`` and zero vertex weights."""
+    rng = np.random.default_rng(seed)
+    row, column = np.nonzero(~np.eye(n_vertices, dtype=bool))
+    data = 1. + rng.random(len(row))
+    return _to_format(n_vertices, row, column, data, np.zeros(n_vertices),
+                      dense)
+
+
+def connectome(n_vertices, mean_degree=20., length_scale=0.1,
+               reciprocity=0.3, seed=0, dense=False):
+    """Connectome-like directed graph on neurons placed uniformly at random in
+    the unit cube.
+
+    Each edge is present with a probability decaying exponentially with the
+    distance between its vertices over `length_scale`, scaled so that
+    vertices have on average `mean_degree` outgoing edges, and the reverse
+    of each edge is then added with probability `reciprocity`, so that
+    reciprocal connections are over-represented as in biological networks.
+    Edges are weighted by their length and vertices by a random delay."""
+    rng = np.random.default_rng(seed)
+    points = rng.random((n_vertices, 3))
+    # Pairs of vertices are processed by blocks of rows to bound memory
+    rows, columns, lengths = [], [], []
+    block_size = max(1, 2 ** 20 // n_vertices)
+    for start in range(0, n_vertices, block_size):
+        block = points[start:start + block_size]
+        distances = np.sqrt(((block[:, None, :] - points[None, :, :]) ** 2)
+                            .sum(-1))
+        row, column = np.nonzero(distances < 3 * length_scale)
+        keep = row + start != column
+        row, column = row[keep] + start, column[keep]
+        rows.append(row)
+        columns.append(column)
+        lengths.append(distances[row - start, column])
+    row, column = np.concatenate(rows), np.concatenate(columns)
+    lengths = np.concatenate(lengths)
+    probabilities = np.exp(-lengths / length_scale)
+    probabilities *= mean_degree * n_vertices / probabilities.sum()
+    present = rng.random(len(row)) < probabilities
+
+    # Reverse edges, without duplicates of edges already present
+    reverse = present & (rng.random(len(row)) < reciprocity)
+    keys = row.astype(np.int64) * n_vertices + column
+    reverse_keys = column[reverse].astype(np.int64) * n_vertices + \
+        row[reverse]
+    new = ~np.isin(reverse_keys, keys[present])
+    row, column = np.concatenate([row[present], column[reverse][new]]), \
+        np.concatenate([column[present], row[reverse][new]])
+    data = np.concatenate([lengths[present], lengths[reverse][new]])
+    return _to_format(n_vertices, row, column, data,
+                      0.01 * rng.random(n_vertices), dense)
+
+
+def unweighted(adjacency_matrix):
+    """Boolean adjacency matrix of the edges of a graph returned by one of
+    the generators."""
+    if sp.issparse(adjacency_matrix):
+        adjacency_matrix = adjacency_matrix.copy()
+        adjacency_matrix.data = np.ones(len(adjacency_matrix.data),
+                                        dtype=bool)
+        return adjacency_matrix
+    return np.isfinite(adjacency_matrix)
+
+
+# Graphs of the benchmarks, by name, as a generator and its arguments, and
+# the maximum dimension up to which homology is computed on them
+GRAPHS = {
+    'erdos_renyi_sparse': (erdos_renyi, {'n_vertices': 5000,
+                                         'density': 0.002}, np.inf),
+    'erdos_renyi_dense': (erdos_renyi, {'n_vertices': 500, 'density': 0.1,
+                                        'dense': True}, np.inf),
+    'd5': (directed_clique, {'n_vertices': 5}, np.inf),
+    'd7': (directed_clique, {'n_vertices': 7, 'dense': True}, np.inf),
+    'd10': (directed_clique, {'n_vertices': 10}, 5),
+    'connectome_sparse': (connectome, {'n_vertices': 5000}, 4),
+    'connectome_dense': (connectome, {'n_vertices': 1000, 'dense': True},
+                         4),
+}
+
+
+def make_graph(name):
+    """Adjacency matrix of the graph of the benchmarks called `name`."""
+    generator, kwargs, _ = GRAPHS[name]
+    return generator(**kwargs)
@@ -1,17 +1,48 @@
+from importlib import import_module
+
 from ._version import __version__
 
-from .flagio import load_unweighted_flag, load_weighted_flag, \
-    save_unweighted_flag, save_weighted_flag
-from .flagser import flagser_unweighted, flagser_weighted
-from .flagser_count import flagser_count_unweighted, \
-    flagser_count_weighted
+# Submodule defining each public name. They are imported on first access
+# (PEP 562), so that importing pyflagser loads neither scipy nor the C++
+# extension modules.
+_SUBMODULES = {
+    'load_unweighted_flag': 'flagio',
+    'load_weighted_flag': 'flagio',
+    'save_unweighted_flag': 'flagio',
+    'save_weighted_flag': 'flagio',
+    'load_unweighted_flagb': 'flagio',
+    'load_weighted_flagb': 'flagio',
+    'save_unweighted_flagb': 'flagio',
+    'save_weighted_flagb': 'flagio',
+    'flagser_unweighted': 'flagser',
+    'flagser_weighted': 'flagser',
+    'flagser_weighted_iter': 'flagser',
+    'flagser_weighted_sweep': 'flagser',
+    'flagser_unweighted_batch': 'flagser_batch',
+    'flagser_weighted_batch': 'flagser_batch',
+    'flagser_count_unweighted': 'flagser_count',
+    'flagser_count_weighted': 'flagser_count',
+    'IncrementalCellCounter': 'flagser_count',
+    'flagser_simplices': '_simplices',
+    'flagser_simplices_iter': '_simplices',
+    'FlagComplex': 'flag_complex',
+    'enable_cache': 'cache',
+    'disable_cache': 'cache',
+    'clear_cache': 'cache',
+    'cache_info': 'cache',
+    }
+
+__all__ = list(_SUBMODULES) + ['__version__']
+
+
+def __getattr__(name):
+    if name not in _SUBMODULES:
+        raise AttributeError("module {!r} has no attribute {!r}"
+                             .format(__name__, name))
+    value = getattr(import_module('.' + _SUBMODULES[name], __name__), name)
+    globals()[name] = value
+    return value
+
 
-__all__ = ['load_unweighted_flag',
-           'load_weighted_flag',
-           'save_unweighted_flag',
-           'save_weighted_flag',
-           'flagser_unweighted',
-           'flagser_weighted',
-           'flagser_count_unweighted',
-           'flagser_count_weighted',
-           '__version__']
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,102 @@
+"""Decomposition of graphs into their weakly connected components, and merge
+of the (persistent) homology of the flag complexes of these components."""
+
+import numpy as np
+
+# Minimum number of vertices and edges of the graphs into which components are
+# grouped, so that small components do not each cost a call to flagser
+_MIN_CHUNK_SIZE = 2 ** 14
+
+# Number of chunks per thread, so that threads finishing early can take over
+# some of the work of the others
+_CHUNKS_PER_JOB = 4
+
+
+def _split_components(vertices, edges, n_jobs):
+    """Split a graph given by its vertex weights and its edge arrays, as
+    returned by ``_extract_weighted_graph`` or ``_extract_unweighted_graph``,
+    into disjoint unions of its weakly connected components.
+
+    Each component belongs to exactly one of the returned graphs, in which
+    its vertices keep their relative order so that, for undirected graphs, an
+    edge in the upper triangular part of the adjacency matrix remains so.
+    Components are grouped so that each graph has at least
+    ``_MIN_CHUNK_SIZE`` vertices and edges, unless there is not enough of
+    them, and the largest graphs come first."""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n_vertices = len(vertices)
+    row, column = edges[0], edges[1]
+    graph = coo_matrix((np.ones(len(row), dtype=bool), (row, column)),
+                       shape=(n_vertices, n_vertices))
+    n_components, labels = connected_components(graph, directed=True,
+                                                connection='weak')
+    if n_components == 1:
+        return [(vertices, edges)]
+
+    # Largest components first, each of them being grouped with the next
+    # ones until the graph is large enough
+    sizes = np.bincount(labels, minlength=n_components) + \
+        np.bincount(labels[row], minlength=n_components)
+    order = np.argsort(-sizes, kind='stable')
+    target_size = max(_MIN_CHUNK_SIZE,
+                      sizes.sum() // (n_jobs * _CHUNKS_PER_JOB))
+    chunk_of_component = np.empty(n_components, dtype=np.intp)
+    n_chunks, chunk_size = 0, 0
+    for component in order:
+        chunk_of_component[component] = n_chunks
+        chunk_size += sizes[component]
+        if chunk_size >= target_size:
+            n_chunks, chunk_size = n_chunks + 1, 0
+    n_chunks += chunk_size > 0
+
+    # Vertices are sorted by chunk, their index in a chunk is their position
+    # in this order minus the number of vertices of the previous chunks
+    vertex_chunk = chunk_of_component[labels]
+    vertex_order = np.argsort(vertex_chunk, kind='stable')
+    vertex_bounds = np.searchsorted(vertex_chunk[vertex_order],
+                                    np.arange(n_chunks + 1))
+    new_index = np.empty(n_vertices, dtype=row.dtype)
+    new_index[vertex_order] = np.arange(n_vertices, dtype=row.dtype) - \
+        np.repeat(vertex_bounds[:-1], np.diff(vertex_bounds)).astype(
+            row.dtype)
+
+    edge_chunk = vertex_chunk[row]
+    edge_order = np.argsort(edge_chunk, kind='stable')
+    edge_bounds = np.searchsorted(edge_chunk[edge_order],
+                                  np.arange(n_chunks + 1))
+    edges = (new_index[row[edge_order]], new_index[column[edge_order]],
+             *(weights[edge_order] for weights in edges[2:]))
+    vertices = vertices[vertex_order]
+
+    return [(vertices[vertex_bounds[i]:vertex_bounds[i + 1]],
+             tuple(array[edge_bounds[i]:edge_bounds[i + 1]]
+                   for array in edges))
+            for i in range(n_chunks)]
+
+
+def _pad(lists, fill):
+    n = max(len(values) for values in lists)
+    return [list(values) + [fill() for _ in range(n - len(values))]
+            for values in lists]
+
+
+def _merge_components(outs):
+    """Merge the outputs of ``_flagser_graph`` on disjoint graphs into the
+    output on their union. Cell counts, Betti numbers and Euler
+    characteristics are additive, and the persistence diagram of a disjoint
+    union is the union of the persistence diagrams."""
+    out = {'betti': np.sum(_pad([out['betti'] for out in outs], int),
+                           axis=0).tolist(),
+           'cell_count': np.sum(_pad([out['cell_count'] for out in outs],
+                                     int), axis=0).tolist(),
+           'euler': sum(out['euler'] for out in outs)}
+    if 'dgms' in outs[0]:
+        dtype = next((dgm.dtype for out in outs for dgm in out['dgms']),
+                     float)
+        dgms = _pad([out['dgms'] for out in outs],
+                    lambda: np.empty((0, 2), dtype=dtype))
+        out = {'dgms': [np.concatenate(dgms_dimension)
+                        for dgms_dimension in zip(*dgms)], **out}
+    return out
@@ -0,0 +1,248 @@
+"""Pre-reduction of graphs, removing parts of them whose contribution to the
+(persistent) homology of their flag complexes is known in advance."""
+
+import numpy as np
+
+from ._utils import _VALUE_DTYPE
+
+
+def _reduce_graph(vertices, edges, directed, weighted):
+    """Remove from a graph given by its vertex weights and its edge arrays, as
+    returned by ``_extract_weighted_graph`` or ``_extract_unweighted_graph``,
+    parts which cannot belong to any 2-dimensional cell of its flag complex.
+
+    Returns the vertices and edges of the reduced graph, in which vertices
+    keep their relative order, and a dictionary with the contribution of the
+    removed parts to the output of ``_flagser_graph``, in dimensions 0 and 1,
+    as expected by ``_with_reduction``. The reduced graph always keeps at
+    least one vertex."""
+    if weighted:
+        kept, kept_edges, reduction = _reduce_weighted(vertices, edges,
+                                                       directed)
+    else:
+        kept, kept_edges, reduction = _reduce_unweighted(vertices, edges,
+                                                         directed)
+
+    row, column = edges[0], edges[1]
+    new_index = (np.cumsum(kept) - 1).astype(row.dtype)
+    edges = (new_index[row[kept_edges]], new_index[column[kept_edges]],
+             *(weights[kept_edges] for weights in edges[2:]))
+    return vertices[kept], edges, reduction
+
+
+def _simple_edges(row, column, n_vertices, directed):
+    """Distinct edges of a graph as a CSR matrix of ones, from the smaller to
+    the larger vertex in the undirected case."""
+    from scipy.sparse import coo_matrix
+
+    if not directed:
+        row, column = np.minimum(row, column), np.maximum(row, column)
+    adjacency_matrix = coo_matrix(
+        (np.ones(len(row), dtype=np.int64), (row, column)),
+        shape=(n_vertices, n_vertices)).tocsr()
+    adjacency_matrix.data[:] = 1
+    return adjacency_matrix
+
+
+def _reduce_unweighted(vertices, edges, directed):
+    """Remove the edges which belong to no 2-dimensional cell, then the
+    vertices left without edges.
+
+    Adding back such an edge adds no cell of higher dimension, so that it
+    either joins two components, decreasing the Betti number in dimension 0
+    by one, or closes a cycle, increasing that in dimension 1 by one. Which of
+    the two happens for how many of them follows from the numbers of
+    components with and without these edges."""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+
+    n_vertices = len(vertices)
+    row, column = edges
+    adjacency_matrix = _simple_edges(row, column, n_vertices, directed)
+
+    # Number of 2-dimensional cells of the flag complex containing each edge
+    if directed:
+        # As the edge from the first to the last vertex, from the first to
+        # the second and from the second to the last
+        n_triangles = adjacency_matrix @ adjacency_matrix + \
+            adjacency_matrix @ adjacency_matrix.T + \
+            adjacency_matrix.T @ adjacency_matrix
+    else:
+        symmetric = adjacency_matrix + adjacency_matrix.T
+        n_triangles = symmetric @ symmetric
+    n_triangles = n_triangles.multiply(adjacency_matrix).tocoo()
+    n_triangles.eliminate_zeros()
+    in_triangle = n_triangles.row.astype(np.int64) * n_vertices + \
+        n_triangles.col
+    simple = adjacency_matrix.tocoo()
+    bare = ~np.isin(simple.row.astype(np.int64) * n_vertices + simple.col,
+                    in_triangle)
+    n_bare = int(np.count_nonzero(bare))
+
+    # Vertices with at least one edge in a 2-dimensional cell
+    kept = np.zeros(n_vertices, dtype=bool)
+    kept[simple.row[~bare]] = True
+    kept[simple.col[~bare]] = True
+    if not kept.any():
+        kept[0] = True
+    n_removed = n_vertices - int(np.count_nonzero(kept))
+
+    n_components = connected_components(adjacency_matrix, directed=True,
+                                        connection='weak')[0]
+    reduced = coo_matrix((np.ones(len(simple.row) - n_bare),
+                          (simple.row[~bare], simple.col[~bare])),
+                         shape=adjacency_matrix.shape)
+    n_components_reduced = connected_components(reduced, directed=True,
+                                                connection='weak')[0]
+    n_joins = n_components_reduced - n_components
+
+    if not directed:
+        row, column = np.minimum(row, column), np.maximum(row, column)
+    kept_edges = np.isin(row.astype(np.int64) * n_vertices + column,
+                         in_triangle)
+    reduction = {'betti': [n_removed - n_joins, n_bare - n_joins],
+                 'cell_count': [n_removed, n_bare],
+                 'n_cells': [n_vertices, len(simple.row)]}
+    return kept, kept_edges, reduction
+
+
+def _reduce_weighted(vertices, edges, directed):
+    """Remove pendant trees whose vertices are not born before their parent
+    and which are not joined to it before they are born, then isolated
+    vertices.
+
+    In the sublevel sets of the filtration, such a leaf only adds a component
+    from its birth until its edge to its parent appears, and a directed edge
+    back to the parent adds a cycle from then on, so that the persistence
+    module is that of the rest of the graph plus these intervals. Filtration
+    values are compared in single precision as in flagser, and leaves joined
+    to their parent at their birth, which would give pairs of zero
+    persistence, are kept."""
+    n_vertices = len(vertices)
+    row, column, weights = edges
+    vertex_values = vertices.astype(_VALUE_DTYPE)
+    weights = weights.astype(_VALUE_DTYPE)
+
+    # Edges between each pair of vertices, from the smaller to the larger one
+    # (forward) or the other way around (backward)
+    forward = row < column
+    keys, inverse = np.unique(
+        np.minimum(row, column).astype(np.int64) * n_vertices +
+        np.maximum(row, column), return_inverse=True)
+    n_forward = np.bincount(inverse[forward], minlength=len(keys))
+    n_backward = np.bincount(inverse[~forward], minlength=len(keys))
+    forward_value = np.full(len(keys), np.inf, dtype=_VALUE_DTYPE)
+    backward_value = np.full(len(keys), np.inf, dtype=_VALUE_DTYPE)
+    forward_value[inverse[forward]] = weights[forward]
+    backward_value[inverse[~forward]] = weights[~forward]
+    if directed:
+        # Which of duplicate edges flagser keeps is not specified
+        strippable = np.logical_and(n_forward <= 1, n_backward <= 1)
+        n_cells = int(np.count_nonzero(n_forward) +
+                      np.count_nonzero(n_backward))
+    else:
+        # The edge in the upper triangular part takes precedence
+        strippable = np.logical_and(n_forward <= 1,
+                                    np.logical_or(n_forward == 1,
+                                                  n_backward <= 1))
+        n_cells = len(keys)
+
+    # Number of neighbours of each vertex and bitwise XOR of their indices,
+    # which is the index of the neighbour of leaves
+    neighbours = np.stack([keys // n_vertices, keys % n_vertices])
+    degree = np.bincount(neighbours.ravel(), minlength=n_vertices)
+    xor = np.zeros(n_vertices, dtype=np.int64)
+    np.bitwise_xor.at(xor, neighbours[0], neighbours[1])
+    np.bitwise_xor.at(xor, neighbours[1], neighbours[0])
+
+    removed = np.zeros(n_vertices, dtype=bool)
+    pairs_0, pairs_1 = [], []
+    n_removed_edges = 0
+    leaves = np.flatnonzero(degree == 1)
+    while len(leaves):
+        parents = xor[leaves]
+        pair = np.searchsorted(keys, np.minimum(leaves, parents) * n_vertices +
+                               np.maximum(leaves, parents))
+        # Values of the edges from the leaf to its parent and back
+        to_parent = np.where(leaves < parents, forward_value[pair],
+                             backward_value[pair])
+        from_parent = np.where(leaves < parents, backward_value[pair],
+                               forward_value[pair])
+        if directed:
+            first = np.minimum(to_parent, from_parent)
+            last = np.maximum(to_parent, from_parent)
+        else:
+            first = np.where(n_forward[pair] > 0, forward_value[pair],
+                             backward_value[pair])
+            last = np.full(len(leaves), np.inf, dtype=_VALUE_DTYPE)
+        leaf_values = vertex_values[leaves]
+        strip = strippable[pair] & (leaf_values >= vertex_values[parents]) & \
+            (first > leaf_values)
+
+        # Of two leaves joined to each other, only the larger one is removed
+        stripped = np.zeros(n_vertices, dtype=bool)
+        stripped[leaves[strip]] = True
+        strip &= ~stripped[parents] | (leaves > parents)
+        leaves, parents = leaves[strip], parents[strip]
+        first, last = first[strip], last[strip]
+
+        removed[leaves] = True
+        pairs_0.append(np.stack([leaf_values[strip], first], axis=1))
+        pairs_1.append(np.stack([last[np.isfinite(last)],
+                                 np.full(np.isfinite(last).sum(), np.inf)],
+                                axis=1))
+        n_removed_edges += len(leaves) + int(np.isfinite(last).sum())
+        np.subtract.at(degree, parents, 1)
+        np.bitwise_xor.at(xor, parents, leaves)
+        leaves = np.unique(parents[degree[parents] == 1])
+
+    # Remaining isolated vertices, including the roots of stripped trees
+    isolated = np.flatnonzero(np.logical_and(~removed, degree == 0))
+    if len(isolated) == n_vertices - removed.sum():
+        isolated = isolated[1:]
+    removed[isolated] = True
+    pairs_0.append(np.stack([vertex_values[isolated],
+                             np.full(len(isolated), np.inf)], axis=1))
+
+    pairs_1 = np.concatenate(pairs_1) if pairs_1 else np.empty((0, 2))
+    kept_edges = np.logical_and(~removed[row], ~removed[column])
+    reduction = {'betti': [len(isolated), len(pairs_1)],
+                 'cell_count': [int(removed.sum()), n_removed_edges],
+                 'dgms': [np.concatenate(pairs_0), pairs_1],
+                 'n_cells': [n_vertices, n_cells]}
+    return ~removed, kept_edges, reduction
+
+
+def _with_reduction(out, reduction, min_dimension, max_dimension):
+    """Add to the output of ``_flagser_graph`` on a reduced graph the
+    contribution of the parts removed by ``_reduce_graph``."""
+    top_dimension = min_dimension + len(out['cell_count']) - 1
+    for dimension in (0, 1):
+        if reduction['cell_count'][dimension]:
+            top_dimension = max(top_dimension, dimension)
+    n_dimensions = max(int(min(top_dimension, max_dimension)) + 1 -
+                       min_dimension, 0)
+
+    out['betti'] = _padded(out['betti'], n_dimensions, int)
+    out['cell_count'] = _padded(out['cell_count'], n_dimensions, int)
+    if 'dgms' in out:
+        dtype = next((dgm.dtype for dgm in out['dgms']), np.float64)
+        out['dgms'] = _padded(out['dgms'], n_dimensions,
+                              lambda: np.empty((0, 2), dtype=dtype))
+    for dimension in (0, 1):
+        index = dimension - min_dimension
+        if not 0 <= index < n_dimensions:
+            continue
+        out['betti'][index] += reduction['betti'][dimension]
+        out['cell_count'][index] += reduction['cell_count'][dimension]
+        out['euler'] += (-1) ** dimension * \
+            reduction['cell_count'][dimension]
+        if 'dgms' in out:
+            out['dgms'][index] = np.concatenate(
+                [out['dgms'][index],
+                 reduction['dgms'][dimension].astype(dtype)])
+    return out
+
+
+def _padded(values, length, fill):
+    return list(values) + [fill() for _ in range(length - len(values))]
@@ -0,0 +1,179 @@
+"""Implementation of the python API for the enumeration of the cells of flag
+complexes."""
+
+import numpy as np
+
+from ._utils import _extract_unweighted_graph, _extract_weighted_graph, \
+    _edge_arrays, _effective_n_jobs
+
+
+def flagser_simplices(adjacency_matrix, min_dimension=0, max_dimension=np.inf,
+                      directed=True, weighted=False, max_edge_weight=None,
+                      n_jobs=None):
+    """Enumerate the cells of a directed/undirected (filtered) flag complex.
+
+    From an adjacency matrix construct all cells forming its associated flag
+    complex and return their vertices, per dimension, along with their
+    filtration values if the graph is weighted. The cells of each dimension
+    are written directly to an array allocated once their number is known.
+
+    Parameters
+    ----------
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Adjacency matrix of a directed/undirected graph. If `weighted` is
+        ``False``, it is understood as a boolean matrix as in
+        :func:`pyflagser.flagser_unweighted`. Otherwise, it is the matrix
+        representation of a weighted graph as in
+        :func:`pyflagser.flagser_weighted`, whose diagonal elements are vertex
+        weights.
+
+    min_dimension : int, optional, default: ``0``
+        Minimum dimension of the cells to enumerate.
+
+    max_dimension : int or np.inf, optional, default: ``np.inf``
+        Maximum dimension of the cells to enumerate.
+
+    directed : bool, optional, default: ``True``
+        If ``True``, enumerates the cells of the directed flag complex
+        determined by `adjacency_matrix`. If ``False``, enumerates the cells
+        of the undirected flag complex obtained by considering all edges as
+        undirected, see :func:`pyflagser.flagser_weighted`.
+
+    weighted : bool, optional, default: ``False``
+        Whether `adjacency_matrix` represents a weighted graph, in which case
+        the filtration values of the cells are returned as well.
+
+    max_edge_weight : int or float or ``None``, optional, default: ``None``
+        Maximum edge weight to be considered if `weighted` is ``True``. All
+        edge weights greater than that value will be considered as
+        infinitely-valued, i.e., absent from the filtration. If ``None``, all
+        finite edge weights are considered.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to enumerate the cells of the complex.
+        ``None`` means 1 while ``-1`` means using all processors.
+
+    Returns
+    -------
+    out : dict of list
+        A dictionary with the following key-value pairs:
+
+        - ``'simplices'``: list of ndarray of shape ``(n_cells, k + 1)`` and
+          dtype ``numpy.uint32``, where ``k`` ranges from `min_dimension` to
+          the largest dimension with cells, at most `max_dimension`. Each row
+          holds the vertices of a ``k``-dimensional cell, in the order of the
+          directed edges between them for directed complexes. The order of
+          the rows depends on `n_jobs`.
+        - ``'filtrations'``: only if `weighted` is ``True``, list of ndarray
+          of shape ``(n_cells,)`` and dtype ``numpy.float32``, with the
+          filtration value of each cell in ``'simplices'``, i.e. the maximum
+          of the weights of its vertices and edges.
+
+    See also
+    --------
+    flagser_simplices_iter, flagser_count_unweighted, flagser_count_weighted
+
+    """
+    enumerator = _cell_enumerator(adjacency_matrix, min_dimension,
+                                  max_dimension, directed, weighted,
+                                  max_edge_weight)
+    return _cells(enumerator.cells(1, 0, _effective_n_jobs(n_jobs)),
+                  weighted)
+
+
+def flagser_simplices_iter(adjacency_matrix, chunk_size, min_dimension=0,
+                           max_dimension=np.inf, directed=True, weighted=False,
+                           max_edge_weight=None, n_jobs=None):
+    """Iterate over the cells of a directed/undirected (filtered) flag
+    complex, by chunks of bounded size.
+
+    The cells returned by :func:`flagser_simplices` are split into chunks of
+    about `chunk_size` cells, by the index of their first vertex, and each
+    chunk is enumerated and yielded in turn so that only one of them is in
+    memory at a time. Since the cells are first counted, the cells of each
+    chunk are enumerated twice overall, as well as once more beforehand.
+
+    Parameters
+    ----------
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Adjacency matrix of a directed/undirected graph, see
+        :func:`flagser_simplices`.
+
+    chunk_size : int, required
+        Number of cells, of all dimensions together, that each chunk contains
+        on average. Chunks of cells sharing their first vertex are not split,
+        so that chunks may be larger.
+
+    min_dimension : int, optional, default: ``0``
+        Minimum dimension of the cells to enumerate.
+
+    max_dimension : int or np.inf, optional, default: ``np.inf``
+        Maximum dimension of the cells to enumerate.
+
+    directed : bool, optional, default: ``True``
+        Whether the flag complex is directed, see :func:`flagser_simplices`.
+
+    weighted : bool, optional, default: ``False``
+        Whether `adjacency_matrix` represents a weighted graph, see
+        :func:`flagser_simplices`.
+
+    max_edge_weight : int or float or ``None``, optional, default: ``None``
+        Maximum edge weight to be considered if `weighted` is ``True``, see
+        :func:`flagser_simplices`.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to enumerate the cells of each chunk.
+        ``None`` means 1 while ``-1`` means using all processors.
+
+    Yields
+    ------
+    out : dict of list
+        Cells of one chunk, as returned by :func:`flagser_simplices`. All
+        chunks have arrays for the same dimensions, some of which may be
+        empty.
+
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be a positive integer, got {}."
+                         .format(chunk_size))
+    n_jobs = _effective_n_jobs(n_jobs)
+    enumerator = _cell_enumerator(adjacency_matrix, min_dimension,
+                                  max_dimension, directed, weighted,
+                                  max_edge_weight)
+
+    cell_count = enumerator.count(1, 0, n_jobs)
+    n_dimensions = max(len(cell_count) - min_dimension, 0)
+    n_chunks = max(1, -(-sum(cell_count) // chunk_size))
+    # There is no use in more chunks than vertices
+    n_chunks = min(n_chunks, max(adjacency_matrix.shape))
+    for chunk in range(n_chunks):
+        out = _cells(enumerator.cells(n_chunks, chunk, n_jobs), weighted)
+        # Chunks without cells in the highest dimensions
+        for k in range(min_dimension + len(out['simplices']),
+                       min_dimension + n_dimensions):
+            out['simplices'].append(np.empty((0, k + 1), dtype=np.uint32))
+            if weighted:
+                out['filtrations'].append(np.empty(0, dtype=np.float32))
+        yield out
+
+
+def _cell_enumerator(adjacency_matrix, min_dimension, max_dimension, directed,
+                     weighted, max_edge_weight):
+    if weighted:
+        vertices, edges = _extract_weighted_graph(adjacency_matrix,
+                                                  max_edge_weight)
+    else:
+        vertices, edges = _extract_unweighted_graph(adjacency_matrix)
+
+    # A negative maximal dimension means no limit
+    _max_dimension = -1 if max_dimension == np.inf else max_dimension
+    from .modules.flagser_count_pybind import CellEnumerator
+    return CellEnumerator(vertices, *_edge_arrays(edges), directed,
+                          min_dimension, _max_dimension)
+
+
+def _cells(cells, weighted):
+    out = {'simplices': [simplices for simplices, _ in cells]}
+    if weighted:
+        out['filtrations'] = [filtrations for _, filtrations in cells]
+    return out
@@ -0,0 +1,81 @@
+"""Vectorized summaries of persistence diagrams."""
+
+import numbers
+
+import numpy as np
+
+_SUMMARIES = ('betti_curve', 'total_persistence', 'persistence_entropy')
+
+
+def _betti_curves(dgms, grid):
+    """Number of pairs of each diagram alive at each value of `grid`, i.e.
+    born at or before it and not yet dead, as an ndarray of shape
+    (len(grid), len(dgms))."""
+    betti = np.zeros((len(grid), len(dgms)), dtype=np.int64)
+    for dimension, dgm in enumerate(dgms):
+        births = np.sort(dgm[:, 0])
+        deaths = np.sort(dgm[:, 1][np.isfinite(dgm[:, 1])])
+        betti[:, dimension] = np.searchsorted(births, grid, side='right') - \
+            np.searchsorted(deaths, grid, side='right')
+    return betti
+
+
+def _finite_lifetimes(dgms):
+    """Lifetimes of the finite pairs of all diagrams, and the index of the
+    diagram of each."""
+    lifetimes = [dgm[:, 1] - dgm[:, 0] for dgm in dgms]
+    dimensions = np.repeat(np.arange(len(dgms)),
+                           [len(lifetime) for lifetime in lifetimes])
+    lifetimes = np.concatenate(lifetimes) if lifetimes else np.empty(0)
+    mask = np.isfinite(lifetimes)
+    return lifetimes[mask], dimensions[mask]
+
+
+def _total_persistence(dgms, p):
+    lifetimes, dimensions = _finite_lifetimes(dgms)
+    return np.bincount(dimensions, weights=lifetimes ** p,
+                       minlength=len(dgms)).astype(float)
+
+
+def _persistence_entropy(dgms):
+    lifetimes, dimensions = _finite_lifetimes(dgms)
+    total = np.bincount(dimensions, weights=lifetimes, minlength=len(dgms))
+    mask = lifetimes > 0
+    lifetimes, dimensions = lifetimes[mask], dimensions[mask]
+    probabilities = lifetimes / total[dimensions]
+    return -np.bincount(dimensions,
+                        weights=probabilities * np.log(probabilities),
+                        minlength=len(dgms)).astype(float)
+
+
+def _check_summaries(summaries):
+    unknown = set(summaries) - set(_SUMMARIES)
+    if unknown:
+        raise ValueError("Summaries not recognized: {}. Available summaries "
+                         "are {}.".format(sorted(unknown), _SUMMARIES))
+    if 'betti_curve' in summaries and \
+            np.ndim(summaries['betti_curve']) != 1:
+        raise ValueError("The grid of 'betti_curve' must be "
+                         "one-dimensional.")
+    if 'total_persistence' in summaries:
+        p = summaries['total_persistence']
+        if p is not True and not isinstance(p, numbers.Real):
+            raise ValueError("The exponent of 'total_persistence' must be a "
+                             "real number or True, got {}.".format(p))
+
+
+def _compute_summaries(dgms, summaries):
+    """Summaries of the persistence diagrams `dgms`, one per dimension,
+    requested by `summaries` as documented in ``flagser_weighted``."""
+    _check_summaries(summaries)
+    out = {}
+    if 'betti_curve' in summaries:
+        grid = np.asarray(summaries['betti_curve'], dtype=float)
+        out['betti_curve'] = _betti_curves(dgms, grid).T
+    if 'total_persistence' in summaries:
+        p = summaries['total_persistence']
+        out['total_persistence'] = _total_persistence(
+            dgms, 1 if p is True else p)
+    if 'persistence_entropy' in summaries:
+        out['persistence_entropy'] = _persistence_entropy(dgms)
+    return out
@@ -1,11 +1,154 @@
 """Utility functions for adjacency matrices."""
 
+import os
+import sys
 import warnings
+from collections import namedtuple
 
 import numpy as np
 
-
-def _extract_unweighted_graph(adjacency_matrix):
+# NumPy counterparts of vertex_index_t and value_t in the C++ bindings, used
+# for the arrays allocated by pyflagser itself. The bindings also read 32 and
+# 64-bit integer indices and single or double precision weights without
+# copying them
+_VERTEX_INDEX_DTYPE = np.uint32
+_VALUE_DTYPE = np.float32
+
+# Approximate number of entries of dense adjacency matrices processed at once
+_BLOCK_SIZE = 2 ** 20
+
+# Buffers of a CSR or CSC adjacency matrix from which the homology bindings
+# read the edges of its graph directly, and how to read them
+_CompressedEdges = namedtuple(
+    '_CompressedEdges',
+    ['indptr', 'indices', 'data', 'csc', 'weighted', 'max_edge_weight'])
+
+
+def _effective_n_jobs(n_jobs):
+    """Number of threads to use, following the usual ``n_jobs`` convention:
+    ``None`` means 1 and negative values count back from the number of
+    available processors, ``-1`` meaning all of them."""
+    if n_jobs is None:
+        return 1
+    if n_jobs == 0:
+        raise ValueError("n_jobs == 0 has no meaning.")
+    if n_jobs < 0:
+        return max(os.cpu_count() + 1 + n_jobs, 1)
+    return n_jobs
+
+
+def _resident_memory():
+    """Resident set size of the current process in bytes, or ``None`` if it
+    cannot be determined on this platform."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Fall back to the peak resident set size, in bytes on macOS and in
+    # kilobytes elsewhere
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == 'darwin' else max_rss * 1024
+
+
+def _dense_edges(adjacency_matrix, edge_mask, weighted=True):
+    """Row, column and, if `weighted`, weight arrays of the off-diagonal
+    entries of a dense matrix for which ``edge_mask`` is ``True``.
+
+    The matrix is processed by blocks of rows, so that the temporary arrays
+    never have more than about ``_BLOCK_SIZE`` entries instead of one per
+    entry of the whole matrix. The edges are counted in a first pass, so that
+    the output arrays are allocated once and filled in place."""
+    n_rows, n_columns = adjacency_matrix.shape
+    block_n_rows = max(_BLOCK_SIZE // max(n_columns, 1), 1)
+
+    def block_masks():
+        for start in range(0, n_rows, block_n_rows):
+            block = adjacency_matrix[start:start + block_n_rows]
+            mask = edge_mask(block)
+
+            # Off-diagonal mask
+            diagonal = np.arange(start, min(start + len(block), n_columns))
+            mask[diagonal - start, diagonal] = False
+            yield start, block, mask
+
+    n_edges = sum(np.count_nonzero(mask) for _, _, mask in block_masks())
+    row = np.empty(n_edges, dtype=_VERTEX_INDEX_DTYPE)
+    column = np.empty(n_edges, dtype=_VERTEX_INDEX_DTYPE)
+    if weighted:
+        weights = np.empty(n_edges, dtype=adjacency_matrix.dtype)
+
+    offset = 0
+    for start, block, mask in block_masks():
+        block_row, block_column = np.nonzero(mask)
+        end = offset + len(block_row)
+        row[offset:end] = block_row
+        row[offset:end] += start
+        column[offset:end] = block_column
+        if weighted:
+            weights[offset:end] = block[block_row, block_column]
+        offset = end
+
+    if weighted:
+        return row, column, weights
+    return row, column
+
+
+def _edge_arrays(edges):
+    """Row, column and weight arrays to pass to the bindings, the weights
+    being ``None`` for unweighted graphs."""
+    if len(edges) == 2:
+        return (*edges, None)
+    return edges
+
+
+def _weight_mask(data, max_edge_weight):
+    """Mask of the finite weights not greater than `max_edge_weight`."""
+    if np.issubdtype(data.dtype, np.floating):
+        if (max_edge_weight is None) or np.isposinf(max_edge_weight):
+            return np.isfinite(data)
+        return data <= max_edge_weight
+    if max_edge_weight is not None:
+        return data <= max_edge_weight
+    return np.ones(data.shape, dtype=bool)
+
+
+def _is_compressed(adjacency_matrix):
+    """Whether `adjacency_matrix` is a CSR or CSC matrix or array, checked
+    without importing scipy."""
+    return getattr(adjacency_matrix, 'format', None) in ('csr', 'csc')
+
+
+def _compressed_edges(adjacency_matrix, weighted, max_edge_weight=None):
+    """Edges of a CSR or CSC matrix as ``_CompressedEdges``.
+
+    The bindings then skip the diagonal entries and the entries which are not
+    edges: zero ones if not `weighted`, and otherwise those masked by
+    ``_weight_mask``. `max_edge_weight` is passed as a float, infinite if
+    ``None``, after rounding it to the dtype in which NumPy compares it to
+    floating point weights."""
+    data = adjacency_matrix.data
+    if max_edge_weight is None:
+        max_edge_weight = np.inf
+    elif np.issubdtype(data.dtype, np.floating):
+        max_edge_weight = np.array(
+            max_edge_weight, dtype=np.result_type(data, max_edge_weight))
+    max_edge_weight = float(max_edge_weight)
+    return _CompressedEdges(adjacency_matrix.indptr, adjacency_matrix.indices,
+                            data, adjacency_matrix.format == 'csc', weighted,
+                            max_edge_weight)
+
+
+def _extract_unweighted_graph(adjacency_matrix, compressed=False):
+    """Vertex weights and edge arrays of an unweighted graph. If
+    `compressed` and `adjacency_matrix` is a CSR or CSC matrix, the edges
+    are returned as ``_CompressedEdges`` instead, see
+    ``_compressed_edges``."""
     input_shape = adjacency_matrix.shape
     # Warn if dense and not square
     if isinstance(adjacency_matrix, np.ndarray) and \
@@ -16,29 +159,29 @@ def _extract_unweighted_graph(adjacency_matrix):
     n_vertices = max(input_shape)
     vertices = np.ones(n_vertices, dtype=float)
 
-    # Extract edge indices
+    # Extract edge indices, the edges have no weights so that the bindings
+    # add them to the graph without filtration values
     if isinstance(adjacency_matrix, np.ndarray):
-        # Off-diagonal mask
-        mask = np.logical_not(np.eye(input_shape[0], M=input_shape[1],
-                                     dtype=bool))
-
-        # Data mask
-        mask = np.logical_and(adjacency_matrix, mask)
-
-        edges = np.argwhere(mask)
+        edges = _dense_edges(adjacency_matrix,
+                             lambda block: block.astype(bool),
+                             weighted=False)
+    elif compressed and _is_compressed(adjacency_matrix):
+        edges = _compressed_edges(adjacency_matrix, False)
     else:
-        edges = np.argwhere(adjacency_matrix)
+        row, column = adjacency_matrix.nonzero()
 
         # Remove diagonal elements a posteriori
-        edges = edges[edges[:, 0] != edges[:, 1]]
-
-    # Assign weight one
-    edges = np.insert(edges, 2, 1, axis=1)
+        mask = row != column
+        edges = (row[mask], column[mask])
 
     return vertices, edges
 
 
-def _extract_weighted_graph(adjacency_matrix, max_edge_weight):
+def _extract_weighted_graph(adjacency_matrix, max_edge_weight,
+                            compressed=False):
+    """Vertex weights and edge arrays of a weighted graph. If `compressed`
+    and `adjacency_matrix` is a CSR or CSC matrix, the edges are returned as
+    ``_CompressedEdges`` instead, see ``_compressed_edges``."""
     input_shape = adjacency_matrix.shape
     # Warn if dense and not square
     if isinstance(adjacency_matrix, np.ndarray) and \
@@ -52,33 +195,23 @@ def _extract_weighted_graph(adjacency_matrix, max_edge_weight):
 
     # Extract edge indices and weights
     if isinstance(adjacency_matrix, np.ndarray):
-        row, column = np.indices(adjacency_matrix.shape)
-        row, column = row.flat, column.flat
-        data = adjacency_matrix.flat
-
-        # Off-diagonal mask
-        mask = np.logical_not(np.eye(input_shape[0], M=input_shape[1],
-                                     dtype=bool).flat)
+        # Infinite or thresholded weights are masked block by block
+        edges = _dense_edges(
+            adjacency_matrix,
+            lambda block: _weight_mask(block, max_edge_weight))
+    elif compressed and _is_compressed(adjacency_matrix):
+        edges = _compressed_edges(adjacency_matrix, True, max_edge_weight)
     else:
         # Convert to COO format to extract row, column, and data arrays
-        fmt = adjacency_matrix.getformat()
         adjacency_matrix = adjacency_matrix.tocoo()
         row, column = adjacency_matrix.row, adjacency_matrix.col
         data = adjacency_matrix.data
-        adjacency_matrix = adjacency_matrix.asformat(fmt)
 
-        # Off-diagonal mask
-        mask = row != column
-
-    # Mask infinite or thresholded weights
-    if np.issubdtype(adjacency_matrix.dtype, np.floating):
-        if (max_edge_weight is None) or np.isposinf(max_edge_weight):
-            mask = np.logical_and(mask, np.isfinite(data))
-        else:
-            mask = np.logical_and(mask, data <= max_edge_weight)
-    elif max_edge_weight is not None:
-        mask = np.logical_and(mask, data <= max_edge_weight)
+        # Mask diagonal, infinite or thresholded weights
+        mask = np.logical_and(row != column,
+                              _weight_mask(data, max_edge_weight))
 
-    edges = np.c_[row[mask], column[mask], data[mask]]
+        # Row, column and weight arrays are passed as they are to the bindings
+        edges = (row[mask], column[mask], data[mask])
 
     return vertices, edges
@@ -0,0 +1,196 @@
+"""Opt-in cache for the results of flagser_unweighted and flagser_weighted."""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'disk_hits', 'misses',
+                                     'maxsize', 'currsize', 'directory'])
+
+
+class _ResultCache:
+    """In-memory LRU cache of flagser results, optionally backed by a
+    directory of ``.npz`` files."""
+
+    def __init__(self, maxsize, directory):
+        self.maxsize = maxsize
+        self.directory = directory
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            out = self._results.get(key)
+            if out is not None:
+                self._results.move_to_end(key)
+                self.hits += 1
+                return _copy(out)
+
+        out = self._load(key)
+        with self._lock:
+            if out is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._insert(key, out)
+        return _copy(out)
+
+    def put(self, key, out):
+        out = _copy(out)
+        with self._lock:
+            self._insert(key, out)
+        self._save(key, out)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.hits = self.disk_hits = self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return CacheInfo(self.hits, self.disk_hits, self.misses,
+                             self.maxsize, len(self._results), self.directory)
+
+    def _insert(self, key, out):
+        self._results[key] = out
+        self._results.move_to_end(key)
+        while len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with np.load(self._path(key)) as f:
+                out = {'betti': f['betti'].tolist(),
+                       'cell_count': f['cell_count'].tolist(),
+                       'euler': int(f['euler'])}
+                if 'n_dgms' in f:
+                    out = {'dgms': [f['dgm_{}'.format(i)]
+                                    for i in range(int(f['n_dgms']))],
+                           **out}
+        except (OSError, KeyError, ValueError):
+            return None
+        return out
+
+    def _save(self, key, out):
+        if self.directory is None:
+            return
+        arrays = {'betti': np.asarray(out['betti'], dtype=np.int64),
+                  'cell_count': np.asarray(out['cell_count'], dtype=np.int64),
+                  'euler': np.int64(out['euler'])}
+        if 'dgms' in out:
+            arrays['n_dgms'] = len(out['dgms'])
+            arrays.update(('dgm_{}'.format(i), dgm)
+                          for i, dgm in enumerate(out['dgms']))
+
+        # Write to a temporary file first so that concurrent readers never
+        # see a partially written file
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+def _copy(out):
+    """Copy a result so that callers cannot modify the cached one."""
+    out = {name: list(value) if isinstance(value, list) else value
+           for name, value in out.items()}
+    if 'dgms' in out:
+        out['dgms'] = [dgm.copy() for dgm in out['dgms']]
+    return out
+
+
+_result_cache = None
+
+
+def _cache_key(vertices, edges, *parameters):
+    """Hash of a graph, as returned by ``_extract_weighted_graph`` or
+    ``_extract_unweighted_graph``, and of the parameters of the
+    computation."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(repr(parameters).encode())
+    for array in (vertices, *edges):
+        array = np.ascontiguousarray(array)
+        h.update('{}{}'.format(array.dtype.str, array.shape).encode())
+        h.update(array.view(np.uint8))
+    return h.hexdigest()
+
+
+def enable_cache(maxsize=128, directory=None):
+    """Cache the results of :func:`pyflagser.flagser_unweighted` and
+    :func:`pyflagser.flagser_weighted`.
+
+    Once enabled, calls on graphs with the same vertices, edges and edge
+    weights and with the same parameters return the stored result instead of
+    recomputing it. This also applies to the dimensions computed separately
+    by :func:`pyflagser.flagser_weighted_iter` or when a budget is given.
+    Enabling the cache again replaces the previous one.
+
+    Parameters
+    ----------
+    maxsize : int, optional, default: ``128``
+        Maximum number of results kept in memory. Once it is reached, the
+        least recently used result is discarded.
+
+    directory : str or None, optional, default: ``None``
+        If not ``None``, directory in which all results are also stored as
+        ``.npz`` files, which are looked up when a result is not in memory.
+        It is created if it does not exist and can be shared between
+        processes and sessions.
+
+    """
+    global _result_cache
+    if maxsize < 1:
+        raise ValueError("maxsize must be a positive integer, got {}."
+                         .format(maxsize))
+    _result_cache = _ResultCache(maxsize, directory)
+
+
+def disable_cache():
+    """Stop caching results and discard those stored in memory. Files in the
+    cache directory are kept."""
+    global _result_cache
+    _result_cache = None
+
+
+def clear_cache():
+    """Discard the results stored in memory and reset the statistics. Files
+    in the cache directory are kept."""
+    if _result_cache is not None:
+        _result_cache.clear()
+
+
+def cache_info():
+    """Statistics of the result cache.
+
+    Returns
+    -------
+    info : CacheInfo or None
+        ``None`` if the cache is disabled, otherwise a named tuple with
+        fields ``hits`` (results returned from the cache, from memory or from
+        disk), ``disk_hits`` (results returned from the cache directory),
+        ``misses`` (results computed), ``maxsize``, ``currsize`` (number of
+        results in memory) and ``directory``.
+
+    """
+    if _result_cache is None:
+        return None
+    return _result_cache.info()
@@ -0,0 +1,350 @@
+"""Flag complexes built once and queried many times."""
+
+import numpy as np
+
+from ._utils import _extract_unweighted_graph, _extract_weighted_graph, \
+    _edge_arrays, _effective_n_jobs, _resident_memory
+from .flagser import _check_filtration
+from ._simplices import _cells
+
+
+class FlagComplex:
+    """Directed/undirected (filtered) flag complex of a graph, built once and
+    queried many times.
+
+    The graph is extracted from `adjacency_matrix` and built in C++ on the
+    first query, and then kept alive so that the (persistent) homology of its
+    flag complex can be computed for several coefficients and ranges of
+    dimensions, and its cells counted or enumerated, without extracting and
+    building it again. Results are cached per dimension, so that a query
+    only computes the dimensions which were not computed before with the
+    same coefficients and approximation.
+
+    Parameters
+    ----------
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Adjacency matrix of a directed/undirected graph. If `weighted` is
+        ``True``, it is the matrix representation of a weighted graph as in
+        :func:`pyflagser.flagser_weighted`, whose diagonal elements are vertex
+        weights. Otherwise, it is understood as a boolean matrix as in
+        :func:`pyflagser.flagser_unweighted`.
+
+    max_edge_weight : int or float or ``None``, optional, default: ``None``
+        Maximum edge weight to be considered if `weighted` is ``True``. All
+        edge weights greater than that value will be considered as
+        infinitely-valued, i.e., absent from the filtration. If ``None``, all
+        finite edge weights are considered.
+
+    directed : bool, optional, default: ``True``
+        If ``True``, the flag complex is the directed flag complex determined
+        by `adjacency_matrix`. If ``False``, it is the undirected flag complex
+        obtained by considering all edges as undirected.
+
+    filtration : string, optional, default: ``'max'``
+        Algorithm determining the filtration values of the cells of dimension
+        2 or more if `weighted` is ``True``, see
+        :func:`pyflagser.flagser_weighted`. It is checked when homology is
+        first computed.
+
+    weighted : bool, optional, default: ``True``
+        Whether `adjacency_matrix` represents a weighted graph, in which case
+        persistence diagrams and filtration values of the cells are
+        available.
+
+    cache_cells : bool, optional, default: ``False``
+        If ``True``, the cells enumerated by :meth:`simplices` are kept in
+        memory and reused by later calls to :meth:`simplices` and
+        :meth:`cell_count`.
+
+    Attributes
+    ----------
+    n_vertices : int
+        Number of vertices of the graph.
+
+    See also
+    --------
+    flagser_weighted, flagser_unweighted, flagser_count_weighted,
+    flagser_simplices
+
+    """
+
+    def __init__(self, adjacency_matrix, max_edge_weight=None, directed=True,
+                 filtration='max', weighted=True, cache_cells=False):
+        self.directed = directed
+        self.filtration = filtration if weighted else 'max'
+        self.weighted = weighted
+        self.cache_cells = cache_cells
+
+        if weighted:
+            self._vertices, self._edges = _extract_weighted_graph(
+                adjacency_matrix, max_edge_weight)
+        else:
+            self._vertices, self._edges = _extract_unweighted_graph(
+                adjacency_matrix)
+        self.n_vertices = len(self._vertices)
+        self.free()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.free()
+
+    def homology(self, coeff=2, min_dimension=0, max_dimension=np.inf,
+                 approximation=None):
+        """Compute the (persistent) homology of the flag complex.
+
+        Parameters
+        ----------
+        coeff : int, optional, default: ``2``
+            Compute homology with coefficients in the prime field
+            :math:`\\mathbb{F}_p = \\{ 0, \\ldots, p - 1 \\}` where
+            :math:`p` equals `coeff`.
+
+        min_dimension : int, optional, default: ``0``
+            Minimum dimension.
+
+        max_dimension : int or np.inf, optional, default: ``np.inf``
+            Maximum dimension.
+
+        approximation : int or None, optional, default: ``None``
+            Skip all cells creating columns in the reduction matrix with more
+            than this number of entries, see
+            :func:`pyflagser.flagser_weighted`.
+
+        Returns
+        -------
+        out : dict
+            A dictionary with the keys ``'betti'``, ``'cell_count'`` and
+            ``'euler'``, and ``'dgms'`` if the graph is weighted, as returned
+            by :func:`pyflagser.flagser_weighted`.
+
+        """
+        results = self._results.setdefault(
+            (coeff, approximation),
+            {'dimensions': {}, 'max_dimension': self.n_vertices - 1})
+        dimensions = results['dimensions']
+        upper = min(max_dimension, results['max_dimension'])
+        missing = [dimension
+                   for dimension in range(min_dimension, int(upper) + 1)
+                   if dimension not in dimensions]
+        if missing:
+            # Cells of dimension d have d + 1 vertices
+            last = np.inf if missing[-1] == self.n_vertices - 1 \
+                else missing[-1]
+            self._compute(results, coeff, approximation, missing[0], last)
+
+        out = {'betti': [], 'cell_count': [], 'euler': 0}
+        if self.weighted:
+            out = {'dgms': [], **out}
+        upper = min(max_dimension, results['max_dimension'])
+        for dimension in range(min_dimension, int(upper) + 1):
+            dgm, betti, cell_count = dimensions[dimension]
+            out['betti'].append(betti)
+            out['cell_count'].append(cell_count)
+            out['euler'] += (-1) ** dimension * cell_count
+            if self.weighted:
+                out['dgms'].append(dgm.copy())
+        return out
+
+    def diagram(self, dimension, coeff=2, approximation=None):
+        """Persistence diagram of the flag complex in one dimension.
+
+        Parameters
+        ----------
+        dimension : int
+            Homology dimension.
+
+        coeff : int, optional, default: ``2``
+            Prime field of coefficients, see :meth:`homology`.
+
+        approximation : int or None, optional, default: ``None``
+            Approximation parameter, see :meth:`homology`.
+
+        Returns
+        -------
+        dgm : ndarray of shape (n_pairs, 2)
+            Birth and death values of the pairs of the persistence diagram in
+            `dimension`, empty if the complex has no cells in that dimension.
+
+        """
+        if not self.weighted:
+            raise ValueError("Persistence diagrams are only available for "
+                             "weighted graphs.")
+        dgms = self.homology(coeff, dimension, dimension,
+                             approximation)['dgms']
+        return dgms[0] if dgms else np.empty((0, 2))
+
+    def cell_count(self, n_jobs=None):
+        """Number of cells of the flag complex per dimension.
+
+        Cell counts known from previous calls to :meth:`homology` or from
+        cached cells are reused, otherwise the cells are counted as in
+        :func:`pyflagser.flagser_count_weighted`.
+
+        Parameters
+        ----------
+        n_jobs : int or None, optional, default: ``None``
+            The number of threads used to count the cells. ``None`` means 1
+            while ``-1`` means using all processors.
+
+        Returns
+        -------
+        out : list of int
+            Cell counts, per dimension starting from ``0``.
+
+        """
+        if self._cell_count is None:
+            if self._cells is not None:
+                self._cell_count = [len(simplices)
+                                    for simplices in self._cells['simplices']]
+            else:
+                self._cell_count = self._known_cell_count()
+        if self._cell_count is None:
+            self._cell_count = self._enumerator().count(
+                1, 0, _effective_n_jobs(n_jobs))
+        return list(self._cell_count)
+
+    def simplices(self, n_jobs=None):
+        """Enumerate the cells of the flag complex.
+
+        Parameters
+        ----------
+        n_jobs : int or None, optional, default: ``None``
+            The number of threads used to enumerate the cells. ``None`` means
+            1 while ``-1`` means using all processors.
+
+        Returns
+        -------
+        out : dict of list
+            The cells of all dimensions, and their filtration values if the
+            graph is weighted, as returned by
+            :func:`pyflagser.flagser_simplices`. If `cache_cells` is ``True``,
+            these arrays are shared with later calls and should not be
+            modified.
+
+        """
+        if self._cells is not None:
+            return self._cells
+        out = _cells(self._enumerator().cells(1, 0, _effective_n_jobs(n_jobs)),
+                     self.weighted)
+        if self.cache_cells:
+            self._cells = out
+        return out
+
+    def memory_usage(self):
+        """Memory held by the complex, in bytes.
+
+        The memory of the graphs built in C++ is the growth of the resident
+        memory of the process while they were built, and is therefore
+        approximate, and ``0`` if it cannot be determined on this platform.
+
+        Returns
+        -------
+        out : dict of int
+            A dictionary with the following key-value pairs:
+
+            - ``'graph'``: memory of the vertex and edge arrays and of the
+              graphs built from them.
+            - ``'cells'``: memory of the cached cells.
+            - ``'results'``: memory of the cached persistence diagrams.
+            - ``'total'``: sum of the above.
+
+        """
+        graph = self._vertices.nbytes + \
+            sum(array.nbytes for array in self._edges) + \
+            sum(self._built_memory.values())
+        cells = 0
+        if self._cells is not None:
+            cells = sum(array.nbytes for arrays in self._cells.values()
+                        for array in arrays)
+        results = sum(dgm.nbytes for results in self._results.values()
+                      for dgm, _, _ in results['dimensions'].values()
+                      if dgm is not None)
+        return {'graph': graph, 'cells': cells, 'results': results,
+                'total': graph + cells + results}
+
+    def free(self):
+        """Free the graphs built in C++ and the cached cells and results.
+
+        The vertex and edge arrays of the graph are kept, so that the complex
+        can still be queried, the graphs being built again when needed."""
+        self._graphs = {}
+        self._cell_enumerator = None
+        self._built_memory = {}
+        self._cells = None
+        self._cell_count = None
+        self._results = {}
+
+    def _build(self, key, build):
+        """Build an object from the graph, recording the growth of the
+        resident memory meanwhile."""
+        start = _resident_memory()
+        built = build(self._vertices, *_edge_arrays(self._edges),
+                      self.directed)
+        if start is not None:
+            self._built_memory[key] = max(_resident_memory() - start, 0)
+        return built
+
+    def _graph(self, coeff):
+        # Each module has its own graph type, and the one with coefficients
+        # is only loaded if coeff != 2
+        if coeff == 2:
+            from .modules.flagser_pybind import FilteredGraph
+            key = 'graph'
+        else:
+            from .modules.flagser_coeff_pybind import FilteredGraph
+            key = 'graph_coeff'
+        if key not in self._graphs:
+            # Checked here rather than on construction, so that no homology
+            # module is loaded if only the cells are enumerated
+            _check_filtration(self.filtration, coeff)
+            self._graphs[key] = self._build(key, FilteredGraph)
+        return self._graphs[key]
+
+    def _enumerator(self):
+        if self._cell_enumerator is None:
+            from .modules.flagser_count_pybind import CellEnumerator
+            self._cell_enumerator = self._build(
+                'cell_enumerator',
+                lambda *graph: CellEnumerator(*graph, 0, -1))
+        return self._cell_enumerator
+
+    def _compute(self, results, coeff, approximation, min_dimension,
+                 max_dimension):
+        """Compute homology in a range of dimensions and store it in
+        `results`, along with the largest dimension with cells if it is
+        found to be smaller than `max_dimension`."""
+        homology = self._graph(coeff).compute_homology(
+            min_dimension, -1 if max_dimension == np.inf else max_dimension,
+            self.directed, coeff, -1 if approximation is None
+            else approximation, self.filtration, None, None, '', False)[0]
+        betti = homology.get_betti_numbers()
+        cell_count = homology.get_cell_count()
+        dgms = homology.get_persistence_diagram_arrays(np.dtype(np.float64)) \
+            if self.weighted else [None] * len(betti)
+
+        for dimension, values in enumerate(zip(dgms, betti, cell_count),
+                                           start=min_dimension):
+            if not values[2]:
+                break
+            results['dimensions'][dimension] = values
+        else:
+            dimension = min_dimension + len(betti)
+            if dimension > max_dimension:
+                return
+        # There are no cells from this dimension on
+        results['max_dimension'] = min(results['max_dimension'],
+                                       dimension - 1)
+
+    def _known_cell_count(self):
+        """Cell counts of all dimensions from previous homology computations,
+        or ``None`` if some are missing."""
+        for results in self._results.values():
+            dimensions = results['dimensions']
+            top = results['max_dimension']
+            if top < self.n_vertices - 1 and \
+                    all(dimension in dimensions
+                        for dimension in range(top + 1)):
+                return [dimensions[dimension][2]
+                        for dimension in range(top + 1)]
@@ -1,12 +1,59 @@
-"""Implementation of input/output functions for .flag files."""
+"""Implementation of input/output functions for .flag and .flagb files."""
 
+import struct
 import warnings
 import numpy as np
-import scipy.sparse as sp
 
 from ._utils import _extract_unweighted_graph, _extract_weighted_graph
 
 
+def _read_flag(fname, n_columns=None):
+    """Parse the ``dim 0`` and ``dim 1`` sections of a ``.flag`` file in bulk.
+
+    Returns the vertex values as a 1D float array and the edges as a 2D float
+    array with one row per edge, whose first two columns are the source and
+    target vertices and whose third column, if present, is the edge weight.
+    If `n_columns` is ``None``, it is inferred from the first edge.
+
+    """
+    with open(fname, 'r') as f:
+        next(f)  # Skip 'dim 0' header
+        vertices = np.fromstring(f.readline(), sep=' ')
+        next(f, None)  # Skip 'dim 1' header
+        content = f.read()
+
+    if n_columns is None:
+        first_line = content[:content.find('\n')]
+        n_columns = max(len(first_line.split()), 2)
+    edges = np.fromstring(content, sep=' ').reshape((-1, n_columns))
+
+    return vertices, edges
+
+
+def _build_csr(n_vertices, row, column, data):
+    """Build a square CSR matrix from COO triplets in one step.
+
+    Explicit zeros are kept, and if the same entry appears more than once,
+    the last value is kept as if the entries were assigned one by one.
+
+    """
+    import scipy.sparse as sp
+
+    # Sort by row and column, keeping the original order of duplicates
+    keys = row * n_vertices + column
+    order = np.argsort(keys, kind='stable')
+    keys = keys[order]
+    is_last = np.ones(len(keys), dtype=bool)
+    is_last[:-1] = keys[1:] != keys[:-1]
+    order = order[is_last]
+
+    indptr = np.zeros(n_vertices + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row[order], minlength=n_vertices), out=indptr[1:])
+
+    return sp.csr_matrix((data[order], column[order], indptr),
+                         shape=(n_vertices, n_vertices))
+
+
 def load_unweighted_flag(fname, fmt='csr', dtype=bool):
     """Load a ``.flag`` file and return the adjacency matrix of the
     directed/undirected unweighted graph it describes.
@@ -48,19 +95,13 @@ def load_unweighted_flag(fname, fmt='csr', dtype=bool):
            master/docs/documentation_flagser.pdf>`_.
 
     """
-    with open(fname, 'r') as f:
-        next(f)  # Skip 'dim0' header
-        n_vertices = len(f.readline().strip().split(' '))
-        adjacency_matrix = sp.csr_matrix((n_vertices, n_vertices), dtype=dtype)
+    vertices, edges = _read_flag(fname)
+    n_vertices = len(vertices)
+    row = edges[:, 0].astype(np.int64)
+    column = edges[:, 1].astype(np.int64)
 
-        # Silence sparse warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter('ignore', sp.SparseEfficiencyWarning)
-
-            next(f)  # Skip 'dim1' header
-            for line in f:
-                edge = line.strip().split(' ')
-                adjacency_matrix[int(edge[0]), int(edge[1])] = 1
+    adjacency_matrix = _build_csr(n_vertices, row, column,
+                                  np.ones(len(edges), dtype=dtype))
 
     return adjacency_matrix.asformat(fmt)
 
@@ -134,27 +175,23 @@ def load_weighted_flag(fname, fmt='csr', dtype=float, infinity_value=None):
         else:
             _infinity_value = infinity_value
 
-    with open(fname, 'r') as f:
-        next(f)  # Skip 'dim0' header
-        vertices = np.array(f.readline().strip().split(' '), dtype=dtype)
+    vertices, edges = _read_flag(fname, n_columns=3)
+    n_vertices = len(vertices)
 
-        if fmt == 'dense':
-            adjacency_matrix = np.full((len(vertices), len(vertices)),
-                                       _infinity_value, dtype=dtype)
-            adjacency_matrix[np.diag_indices(len(vertices))] = vertices
-        else:
-            adjacency_matrix = sp.csr_matrix((len(vertices), len(vertices)),
-                                             dtype=dtype)
+    # Vertex weights are stored on the diagonal, before the edges so that
+    # an edge from a vertex to itself overrides its weight
+    diagonal = np.arange(n_vertices)
+    row = np.concatenate([diagonal, edges[:, 0].astype(np.int64)])
+    column = np.concatenate([diagonal, edges[:, 1].astype(np.int64)])
+    data = np.concatenate([vertices, edges[:, 2]]).astype(dtype)
 
-        # Silence sparse warnings
-        with warnings.catch_warnings():
-            warnings.simplefilter('ignore', sp.SparseEfficiencyWarning)
-            adjacency_matrix.setdiag(vertices)
+    if fmt == 'dense':
+        adjacency_matrix = np.full((n_vertices, n_vertices), _infinity_value,
+                                   dtype=dtype)
+        adjacency_matrix[row, column] = data
+        return adjacency_matrix
 
-            next(f)  # Skip 'dim1' header
-            for line in f:
-                edge = line.strip().split(' ')
-                adjacency_matrix[int(edge[0]), int(edge[1])] = float(edge[2])
+    adjacency_matrix = _build_csr(n_vertices, row, column, data)
 
     return adjacency_matrix.asformat(fmt)
 
@@ -193,7 +230,8 @@ def save_unweighted_flag(fname, adjacency_matrix):
     with open(fname, 'w') as f:
         np.savetxt(f, vertices.reshape((1, -1)), delimiter=' ', comments='',
                    header='dim 0', fmt='%i')
-        np.savetxt(f, edges, comments='', header='dim 1', fmt='%i %i %i')
+        np.savetxt(f, np.column_stack((*edges, np.ones(len(edges[0])))),
+                   comments='', header='dim 1', fmt='%i %i %i')
 
 
 def save_weighted_flag(fname, adjacency_matrix, max_edge_weight=None):
@@ -242,4 +280,280 @@ def save_weighted_flag(fname, adjacency_matrix, max_edge_weight=None):
     with open(fname, 'w') as f:
         np.savetxt(f, vertices.reshape((1, -1)), delimiter=' ', comments='',
                    header='dim 0', fmt='%.18e')
-        np.savetxt(f, edges, comments='', header='dim 1', fmt='%i %i %.18e')
+        np.savetxt(f, np.column_stack(edges), comments='', header='dim 1',
+                   fmt='%i %i %.18e')
+
+
+_FLAGB_MAGIC = b'\x93FLAGB\x00\x00'
+_FLAGB_VERSION = 1
+# Magic string, version, whether weighted, number of vertices, number of
+# stored entries, index dtype and data dtype
+_FLAGB_HEADER = struct.Struct('<8sII QQ 8s8s')
+# Header and sections are aligned to this number of bytes
+_FLAGB_ALIGNMENT = 64
+
+
+def _aligned(offset):
+    return -(-offset // _FLAGB_ALIGNMENT) * _FLAGB_ALIGNMENT
+
+
+def _write_flagb(fname, n_vertices, row, column, data):
+    """Write COO triplets into a ``.flagb`` file. `data` is ``None`` for
+    unweighted graphs."""
+    index_dtype = np.dtype(np.int32 if n_vertices <= np.iinfo(np.int32).max
+                           else np.int64).newbyteorder('<')
+    sections = [np.asarray(row, dtype=index_dtype),
+                np.asarray(column, dtype=index_dtype)]
+    if data is not None:
+        data = np.asarray(data)
+        sections.append(data.astype(data.dtype.newbyteorder('<'),
+                                    copy=False))
+        data_dtype = sections[-1].dtype.str.encode()
+    else:
+        data_dtype = b''
+
+    header = _FLAGB_HEADER.pack(_FLAGB_MAGIC, _FLAGB_VERSION,
+                                data is not None, n_vertices, len(row),
+                                index_dtype.str.encode(), data_dtype)
+    with open(fname, 'wb') as f:
+        f.write(header)
+        for section in sections:
+            f.write(b'\x00' * (_aligned(f.tell()) - f.tell()))
+            section.tofile(f)
+
+
+def _read_flagb(fname, weighted):
+    """Memory-map the COO triplets stored in a ``.flagb`` file. The returned
+    arrays are copy-on-write views of the file."""
+    with open(fname, 'rb') as f:
+        header = f.read(_FLAGB_HEADER.size)
+    if len(header) < _FLAGB_HEADER.size or \
+            header[:len(_FLAGB_MAGIC)] != _FLAGB_MAGIC:
+        raise ValueError("{} is not a .flagb file.".format(fname))
+    magic, version, is_weighted, n_vertices, n_entries, index_dtype, \
+        data_dtype = _FLAGB_HEADER.unpack(header)
+    if version > _FLAGB_VERSION:
+        raise ValueError("{} uses version {} of the .flagb format, only "
+                         "versions up to {} are supported."
+                         .format(fname, version, _FLAGB_VERSION))
+    if weighted and not is_weighted:
+        raise ValueError("{} describes an unweighted graph, use "
+                         "load_unweighted_flagb instead.".format(fname))
+
+    dtypes = [index_dtype, index_dtype]
+    if is_weighted:
+        dtypes.append(data_dtype)
+
+    sections = []
+    offset = _FLAGB_HEADER.size
+    for dtype in dtypes:
+        dtype = np.dtype(dtype.rstrip(b'\x00').decode())
+        offset = _aligned(offset)
+        if n_entries:
+            sections.append(np.memmap(fname, dtype=dtype, mode='c',
+                                      offset=offset, shape=(n_entries,)))
+        else:
+            sections.append(np.empty(0, dtype=dtype))
+        offset += n_entries * dtype.itemsize
+    if not is_weighted:
+        sections.append(None)
+
+    return n_vertices, sections
+
+
+def load_unweighted_flagb(fname, fmt='coo', dtype=bool):
+    """Load a binary ``.flagb`` file and return the adjacency matrix of the
+    directed/undirected unweighted graph it describes.
+
+    The edges are memory-mapped from the file rather than read into memory.
+
+    Parameters
+    ----------
+    fname : str, or pathlib.Path, required
+        Filename of extension ``.flagb`` written by
+        :func:`save_unweighted_flagb` or :func:`save_weighted_flagb`.
+
+    fmt : {'dense', 'dia', 'csr', 'csc', 'lil', ...}, optional, \
+        default: ``'coo'``
+        Matrix format of the result. By default, a COO sparse matrix whose
+        index arrays are memory-mapped from the file is returned, so that no
+        copy of the edges is made. Other formats require a conversion.
+
+    dtype : data-type, optional, default: ``bool``
+        Data-type of the resulting array.
+
+    Returns
+    -------
+    adjacency_matrix : matrix of shape (n_vertices, n_vertices) and format \
+        `fmt`
+        Adjacency matrix of a directed/undirected unweighted graph. It is
+        understood as a boolean matrix. Off-diagonal, ``0`` or ``False`` values
+        denote absent edges while non-``0`` or ``True`` values denote edges
+        which are present. Diagonal values are ignored.
+
+    See also
+    --------
+    save_unweighted_flagb, load_unweighted_flag
+
+    """
+    import scipy.sparse as sp
+
+    n_vertices, (row, column, data) = _read_flagb(fname, weighted=False)
+
+    # Vertex weights of weighted files are stored as diagonal entries
+    if data is not None:
+        is_edge = row != column
+        row, column = row[is_edge], column[is_edge]
+
+    adjacency_matrix = sp.coo_matrix(
+        (np.ones(len(row), dtype=dtype), (row, column)),
+        shape=(n_vertices, n_vertices), copy=False
+        )
+
+    return adjacency_matrix.asformat(fmt)
+
+
+def load_weighted_flagb(fname, fmt='coo', dtype=None, infinity_value=None):
+    """Load a binary ``.flagb`` file and return the adjacency matrix of the
+    directed/undirected weighted graph it describes.
+
+    The vertex and edge weights are memory-mapped from the file rather than
+    read into memory.
+
+    Parameters
+    ----------
+    fname : str, or pathlib.Path, required
+        Filename of extension ``.flagb`` written by
+        :func:`save_weighted_flagb`.
+
+    fmt : {'dense', 'dia', 'csr', 'csc', 'lil', ...}, optional, \
+        default: ``'coo'``
+        Matrix format of the result. By default, a COO sparse matrix whose
+        arrays are memory-mapped from the file is returned, so that no copy
+        of the graph is made. Other formats require a conversion.
+
+    dtype : data-type or None, optional, default: ``None``
+        Data-type of the resulting array. If ``None``, the data-type of the
+        saved weights is kept, which avoids a copy.
+
+    infinity_value : int or float or None, optional, default: ``None``
+        Value to use to denote an absence of edge. It is only useful when `fmt`
+        is `'dense'`. If ``None``, it is set to the maximum value allowed by
+        `dtype`.
+
+    Returns
+    -------
+    adjacency_matrix : matrix of shape (n_vertices, n_vertices) and format \
+        `fmt`
+        Matrix representation of a directed/undirected weighted graph. Diagonal
+        elements are vertex weights.
+
+    See also
+    --------
+    save_weighted_flagb, load_weighted_flag
+
+    """
+    n_vertices, (row, column, data) = _read_flagb(fname, weighted=True)
+    if dtype is None:
+        dtype = data.dtype
+    data = data.astype(dtype, copy=False)
+
+    if fmt == 'dense':
+        if infinity_value is None:
+            if np.issubdtype(dtype, np.integer):
+                infinity_value = np.iinfo(dtype).max
+            elif np.issubdtype(dtype, np.floating):
+                infinity_value = np.inf
+            else:
+                infinity_value = 0
+        adjacency_matrix = np.full((n_vertices, n_vertices), infinity_value,
+                                   dtype=dtype)
+        adjacency_matrix[row, column] = data
+        return adjacency_matrix
+    elif infinity_value is not None:
+        warnings.warn("infinity_value has been specified with a fmt that "
+                      "is not 'dense' and will be ignored.")
+
+    import scipy.sparse as sp
+
+    adjacency_matrix = sp.coo_matrix((data, (row, column)),
+                                     shape=(n_vertices, n_vertices),
+                                     copy=False)
+
+    return adjacency_matrix.asformat(fmt)
+
+
+def save_unweighted_flagb(fname, adjacency_matrix):
+    """Save the adjacency matrix of a directed/undirected unweighted graph
+    into a binary ``.flagb`` file.
+
+    A ``.flagb`` file starts with a header holding a magic string, the format
+    version, the number of vertices and edges and the data-types of the
+    arrays that follow. It then stores the source and target vertices of all
+    edges as contiguous arrays, which can be memory-mapped by
+    :func:`load_unweighted_flagb` without parsing.
+
+    Parameters
+    ----------
+    fname : str, or pathlib.Path, required
+        Filename of extension ``.flagb``.
+
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Adjacency matrix of a directed/undirected unweighted graph. It is
+        understood as a boolean matrix. Off-diagonal, ``0`` or ``False`` values
+        denote absent edges while non-``0`` or ``True`` values denote edges
+        which are present. Diagonal values are ignored.
+
+    See also
+    --------
+    load_unweighted_flagb, save_unweighted_flag
+
+    """
+    vertices, edges = _extract_unweighted_graph(adjacency_matrix)
+    _write_flagb(fname, len(vertices), edges[0], edges[1], None)
+
+
+def save_weighted_flagb(fname, adjacency_matrix, max_edge_weight=None):
+    """Save the adjacency matrix of a directed/undirected weighted graph into
+    a binary ``.flagb`` file.
+
+    A ``.flagb`` file starts with a header holding a magic string, the format
+    version, the number of vertices and entries and the data-types of the
+    arrays that follow. It then stores the row, column and weight arrays of
+    the vertices, as diagonal entries, followed by those of the edges. These
+    arrays can be memory-mapped by :func:`load_weighted_flagb` without
+    parsing, and weights are stored with full precision.
+
+    Parameters
+    ----------
+    fname : str, or pathlib.Path, required
+        Filename of extension ``.flagb``.
+
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Matrix representation of a directed/undirected weighted graph. Diagonal
+        elements are vertex weights. The way zero values are handled depends on
+        the format of the matrix. If the matrix is a dense ``numpy.ndarray``,
+        zero values denote zero-weighted edges. If the matrix is a sparse
+        ``scipy.sparse`` matrix, explicitly stored off-diagonal zeros and all
+        diagonal zeros denote zero-weighted edges. Off-diagonal values that
+        have not been explicitely stored are treated by ``scipy.sparse`` as
+        zeros but will be understood as infinitely-valued edges, i.e., edges
+        absent from the filtration.
+
+    max_edge_weight : int or float or ``None``, optional, default: ``None``
+        Maximum edge weight to be considered in the filtration. All edge
+        weights greater than that value will be considered as
+        infinitely-valued, i.e., absent from the filtration. If ``None``, all
+        finite edge weights are considered.
+
+    See also
+    --------
+    load_weighted_flagb, save_weighted_flag
+
+    """
+    vertices, (row, column, weights) = \
+        _extract_weighted_graph(adjacency_matrix, max_edge_weight)
+    diagonal = np.arange(len(vertices))
+    _write_flagb(fname, len(vertices), np.concatenate([diagonal, row]),
+                 np.concatenate([diagonal, column]),
+                 np.concatenate([vertices, weights]))
@@ -1,15 +1,33 @@
 """Implementation of the python API for the flagser C++ library."""
 
+import os
+import queue
+import tempfile
+import threading
+import time
+import warnings
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
 import numpy as np
 
-from ._utils import _extract_unweighted_graph, _extract_weighted_graph
-from .modules.flagser_pybind import compute_homology, AVAILABLE_FILTRATIONS
-from .modules.flagser_coeff_pybind import compute_homology as \
-    compute_homology_coeff
+from . import cache
+from ._components import _merge_components, _split_components
+from ._reduction import _reduce_graph, _with_reduction
+from ._summaries import _betti_curves, _check_summaries, _compute_summaries
+from ._utils import _extract_unweighted_graph, _extract_weighted_graph, \
+    _edge_arrays, _effective_n_jobs, _resident_memory, _CompressedEdges, \
+    _VALUE_DTYPE
+from .flagser_count import _check_thresholds, _max_edge_weight, \
+    _cell_count_thresholds
 
 
 def flagser_unweighted(adjacency_matrix, min_dimension=0, max_dimension=np.inf,
-                       directed=True, coeff=2, approximation=None):
+                       directed=True, coeff=2, approximation=None,
+                       time_budget=None, memory_budget=None,
+                       max_cells_per_dimension=None, progress_callback=None,
+                       split_components=False, n_jobs=None,
+                       reduce_graph=False, cache_dir=None, in_memory=False):
     """Compute homology of a directed/undirected flag complex.
 
     From an adjacency_matrix construct all cells forming its associated flag
@@ -21,7 +39,10 @@ def flagser_unweighted(adjacency_matrix, min_dimension=0, max_dimension=np.inf,
         Adjacency matrix of a directed/undirected unweighted graph. It is
         understood as a boolean matrix. Off-diagonal, ``0`` or ``False`` values
         denote absent edges while non-``0`` or ``True`` values denote edges
-        which are present. Diagonal values are ignored.
+        which are present. Diagonal values are ignored. Unless
+        `split_components`, `reduce_graph` or a budget is used, the edges of
+        CSR and CSC matrices are read directly from their buffers, without
+        any conversion.
 
     min_dimension : int, optional, default: ``0``
         Minimum homology dimension to compute.
@@ -48,6 +69,74 @@ def flagser_unweighted(adjacency_matrix, min_dimension=0, max_dimension=np.inf,
         computation. If ``None``, no approximation is made and all cells are
         used. For more details, please refer to [1]_.
 
+    time_budget : float or None, optional, default: ``None``
+        Maximum time in seconds. It is checked at the start of each dimension
+        and then every 0.1 seconds while computing. If it is exceeded, the
+        computation is stopped at the next column of the coboundary matrix
+        and the results for the dimensions already finished are returned. If
+        ``None``, there is no time limit.
+
+    memory_budget : int or None, optional, default: ``None``
+        Maximum resident memory of the process in bytes, checked and enforced
+        like `time_budget`. If ``None``, there is no memory limit.
+
+    max_cells_per_dimension : int or None, optional, default: ``None``
+        Maximum number of cells in a dimension. If a dimension has more cells,
+        the computation is stopped like for `time_budget` and only the results
+        for the dimensions before are returned. If ``None``, there is no
+        limit.
+
+    progress_callback : callable or None, optional, default: ``None``
+        Function called as
+        ``progress_callback(dimension, n_cells, n_columns)`` at the start of
+        the reduction in each dimension and then every 0.1 seconds, also
+        while the complex is being built, where `n_cells` is the number of
+        cells of `dimension` enumerated so far and `n_columns` the number of
+        columns of the coboundary matrix in `dimension` reduced so far that
+        gave a bar or were skipped. If it raises an exception, the
+        computation is aborted at the next such column and the exception is
+        propagated, which can be used to cancel long computations.
+        Independently of it, the computation can be interrupted with
+        ``KeyboardInterrupt``.
+
+    split_components : bool, optional, default: ``False``
+        If ``True``, the homology of the flag complex of each weakly
+        connected component of the graph is computed separately, in parallel
+        threads, and the results are merged, which is exact since homology
+        is additive over disjoint unions. Small components are grouped
+        together to limit the overhead of each call to flagser. It cannot be
+        combined with `time_budget`, `memory_budget`,
+        `max_cells_per_dimension` or `progress_callback`.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to compute the homology of the components
+        if `split_components` is ``True``, and has no effect otherwise.
+        ``None`` means 1 while ``-1`` means using all processors. It does not
+        control the construction of the complexes: flagser always builds
+        each complex with a number of threads fixed when pyflagser is
+        compiled, 8 by default, see ``FLAGSER_PARALLEL_THREADS`` in the
+        installation instructions.
+
+    reduce_graph : bool, optional, default: ``False``
+        If ``True``, the edges which belong to no 2-dimensional cell, and the
+        vertices left without edges, are removed from the graph before its
+        flag complex is built. Their contribution to the Betti numbers, which
+        only depends on the connected components with and without them, and
+        to the cell counts is then added back, so that the results are
+        identical. It cannot be combined with `time_budget`, `memory_budget`
+        or `max_cells_per_dimension`.
+
+    cache_dir : str or path-like or None, optional, default: ``None``
+        If not ``None``, directory in which flagser stores the coboundary
+        matrices of the complex as files, through its ``cache`` option, so
+        that they do not all need to be held in memory. Each computation uses
+        its own temporary subdirectory, which is removed once it is done.
+
+    in_memory : bool, optional, default: ``False``
+        If ``True``, flagser keeps the cells of the complex in memory instead
+        of enumerating them again when needed, through its ``in-memory``
+        option, which can be faster but uses more memory.
+
     Returns
     -------
     out : dict of list
@@ -61,6 +150,18 @@ def flagser_unweighted(adjacency_matrix, min_dimension=0, max_dimension=np.inf,
           equal to `min_dimension` and less than `max_dimension`.
         - ``'euler'``: int
           Euler characteristic.
+        - ``'truncated'``: bool
+          Only present if `time_budget`, `memory_budget` or
+          `max_cells_per_dimension` is set. Whether the computation was
+          stopped before `max_dimension` because a budget was exhausted, in
+          which case the lists above only cover the dimensions finished
+          before, and ``'euler'`` is the alternating sum of their cell
+          counts.
+        - ``'reduction'``: dict
+          Only present if `reduce_graph` is ``True``. Numbers of vertices
+          (``'n_vertices'``) and edges (``'n_edges'``) removed from the
+          graph, fraction of its vertices and edges they represent
+          (``'ratio'``), and time in seconds spent reducing it (``'time'``).
 
     Notes
     -----
@@ -75,46 +176,54 @@ def flagser_unweighted(adjacency_matrix, min_dimension=0, max_dimension=np.inf,
            master/docs/documentation_flagser.pdf>`_.
 
     """
-    # Handle default parameters
-    if max_dimension == np.inf:
-        _max_dimension = -1
-    else:
-        _max_dimension = max_dimension
-
-    if approximation is None:
-        _approximation = -1
-    else:
-        _approximation = approximation
+    # Extract vertices and edges. If the graph is passed as it is to the
+    # bindings, they read the edges of CSR and CSC matrices directly
+    plain = not (reduce_graph or split_components) and \
+        time_budget is None and memory_budget is None and \
+        max_cells_per_dimension is None
+    vertices, edges = _extract_unweighted_graph(adjacency_matrix,
+                                                compressed=plain)
 
     # All edge filtrations are equivalent in the static case
-    _filtration = 'max'
-
-    # Extract vertices and edges
-    vertices, edges = _extract_unweighted_graph(adjacency_matrix)
-
-    # Select the homology computer based on coeff
-    if coeff == 2:
-        _compute_homology = compute_homology
-    else:
-        _compute_homology = compute_homology_coeff
-
-    # Call flagser binding
-    homology = _compute_homology(vertices, edges, min_dimension,
-                                 _max_dimension, directed, coeff,
-                                 _approximation, _filtration)[0]
-
-    # Creating dictionary of return values
-    out = {
-        'betti': homology.get_betti_numbers(),
-        'cell_count': homology.get_cell_count(),
-        'euler': homology.get_euler_characteristic()
-    }
-    return out
+    if reduce_graph:
+        _check_no_budget('reduce_graph', time_budget, memory_budget,
+                         max_cells_per_dimension)
+        return _flagser_graph_reduced(vertices, edges, min_dimension,
+                                      max_dimension, directed, 'max', coeff,
+                                      approximation, False, split_components,
+                                      n_jobs, progress_callback,
+                                      cache_dir=cache_dir,
+                                      in_memory=in_memory)
+    if split_components:
+        _check_no_budget('split_components', time_budget, memory_budget,
+                         max_cells_per_dimension)
+        return _flagser_graph_components(vertices, edges, min_dimension,
+                                         max_dimension, directed, 'max',
+                                         coeff, approximation, False, n_jobs,
+                                         progress_callback,
+                                         cache_dir=cache_dir,
+                                         in_memory=in_memory)
+    if plain:
+        return _flagser_graph(vertices, edges, min_dimension, max_dimension,
+                              directed, 'max', coeff, approximation,
+                              weighted=False,
+                              progress_callback=progress_callback,
+                              cache_dir=cache_dir, in_memory=in_memory)
+    return _flagser_graph_budget(vertices, edges, min_dimension,
+                                 max_dimension, directed, 'max', coeff,
+                                 approximation, False, time_budget,
+                                 memory_budget, max_cells_per_dimension,
+                                 progress_callback, cache_dir=cache_dir,
+                                 in_memory=in_memory)
 
 
 def flagser_weighted(adjacency_matrix, max_edge_weight=None, min_dimension=0,
                      max_dimension=np.inf, directed=True, filtration="max",
-                     coeff=2, approximation=None):
+                     coeff=2, approximation=None, time_budget=None,
+                     memory_budget=None, max_cells_per_dimension=None,
+                     progress_callback=None, dtype=np.float64,
+                     summaries=None, split_components=False, n_jobs=None,
+                     reduce_graph=False, cache_dir=None, in_memory=False):
     """Compute persistent homology of a directed/undirected filtered flag
     complex.
 
@@ -133,7 +242,9 @@ def flagser_weighted(adjacency_matrix, max_edge_weight=None, min_dimension=0,
         diagonal zeros denote zero-weighted edges. Off-diagonal values that
         have not been explicitly stored are treated by ``scipy.sparse`` as
         zeros but will be understood as infinitely-valued edges, i.e., edges
-        absent from the filtration.
+        absent from the filtration. Unless `split_components`,
+        `reduce_graph` or a budget is used, the edges of CSR and CSC matrices
+        are read directly from their buffers, without any conversion.
 
     max_edge_weight : int or float or ``None``, optional, default: ``None``
         Maximum edge weight to be considered in the filtration. All edge
@@ -184,6 +295,100 @@ def flagser_weighted(adjacency_matrix, max_edge_weight=None, min_dimension=0,
         computation. If ``None``, no approximation is made and all cells are
         used. For more details, please refer to [1]_.
 
+    time_budget : float or None, optional, default: ``None``
+        Maximum time in seconds. It is checked at the start of each dimension
+        and then every 0.1 seconds while computing. If it is exceeded, the
+        computation is stopped at the next column of the coboundary matrix
+        and the results for the dimensions already finished are returned. If
+        ``None``, there is no time limit.
+
+    memory_budget : int or None, optional, default: ``None``
+        Maximum resident memory of the process in bytes, checked and enforced
+        like `time_budget`. If ``None``, there is no memory limit.
+
+    max_cells_per_dimension : int or None, optional, default: ``None``
+        Maximum number of cells in a dimension. If a dimension has more cells,
+        the computation is stopped like for `time_budget` and only the results
+        for the dimensions before are returned. If ``None``, there is no
+        limit.
+
+    progress_callback : callable or None, optional, default: ``None``
+        Function called as
+        ``progress_callback(dimension, n_cells, n_columns)`` at the start of
+        the reduction in each dimension and then every 0.1 seconds, also
+        while the complex is being built, where `n_cells` is the number of
+        cells of `dimension` enumerated so far and `n_columns` the number of
+        columns of the coboundary matrix in `dimension` reduced so far that
+        gave a bar or were skipped. If it raises an exception, the
+        computation is aborted at the next such column and the exception is
+        propagated, which can be used to cancel long computations.
+        Independently of it, the computation can be interrupted with
+        ``KeyboardInterrupt``.
+
+    dtype : data-type, optional, default: ``np.float64``
+        Data-type of the persistence diagrams. Filtration values are computed
+        in single precision, so that ``np.float32`` halves the memory taken by
+        the diagrams without any loss of precision.
+
+    summaries : dict or None, optional, default: ``None``
+        Summaries of the persistence diagrams to compute, with vectorized
+        NumPy code, in addition to them. Keys are summary names and values
+        their parameters:
+
+        - ``'betti_curve'``: array-like of shape ``(n_values,)``
+          Filtration values at which to evaluate the Betti curves, i.e. the
+          number of pairs born at or before each value and not yet dead.
+        - ``'total_persistence'``: float or ``True``
+          Exponent :math:`p` of the total persistence
+          :math:`\\sum_i (d_i - b_i)^p` of the finite pairs, ``True``
+          meaning ``1``.
+        - ``'persistence_entropy'``: ``True``
+          Entropy :math:`-\\sum_i \\frac{l_i}{L} \\log \\frac{l_i}{L}` of
+          the lifetimes :math:`l_i` of the finite pairs, where :math:`L` is
+          their sum, ``0`` if there are none.
+
+    split_components : bool, optional, default: ``False``
+        If ``True``, the persistent homology of the filtered flag complex of
+        each weakly connected component of the graph is computed separately,
+        in parallel threads, and the results are merged, which is exact since
+        the persistence diagram of a disjoint union is the union of the
+        persistence diagrams. Small components are grouped together to limit
+        the overhead of each call to flagser. It cannot be combined with
+        `time_budget`, `memory_budget`, `max_cells_per_dimension` or
+        `progress_callback`.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to compute the homology of the components
+        if `split_components` is ``True``, and has no effect otherwise.
+        ``None`` means 1 while ``-1`` means using all processors. It does not
+        control the construction of the complexes: flagser always builds
+        each complex with a number of threads fixed when pyflagser is
+        compiled, 8 by default, see ``FLAGSER_PARALLEL_THREADS`` in the
+        installation instructions.
+
+    reduce_graph : bool, optional, default: ``False``
+        If ``True``, pendant trees are removed from the graph before its
+        filtered flag complex is built, as long as each of their vertices
+        appears no earlier than its parent and strictly before its edges to
+        it, as well as isolated vertices. Their persistence pairs, in
+        dimension 0 and, for edges in both directions between a vertex and
+        its parent in the directed case, in dimension 1, and their cells are
+        then added back, so that the results are identical up to the order
+        of the pairs. Only available for the ``'max'`` filtration, and it
+        cannot be combined with `time_budget`, `memory_budget` or
+        `max_cells_per_dimension`.
+
+    cache_dir : str or path-like or None, optional, default: ``None``
+        If not ``None``, directory in which flagser stores the coboundary
+        matrices of the complex as files, through its ``cache`` option, so
+        that they do not all need to be held in memory. Each computation uses
+        its own temporary subdirectory, which is removed once it is done.
+
+    in_memory : bool, optional, default: ``False``
+        If ``True``, flagser keeps the cells of the complex in memory instead
+        of enumerating them again when needed, through its ``in-memory``
+        option, which can be faster but uses more memory.
+
     Returns
     -------
     out : dict of list
@@ -205,6 +410,23 @@ def flagser_weighted(adjacency_matrix, max_edge_weight=None, min_dimension=0,
           `min_dimension` and less than `max_dimension`.
         - ``'euler'``: int
           Euler characteristic at filtration value `max_edge_weight`.
+        - ``'truncated'``: bool
+          Only present if `time_budget`, `memory_budget` or
+          `max_cells_per_dimension` is set. Whether the computation was
+          stopped before `max_dimension` because a budget was exhausted, in
+          which case the lists above only cover the dimensions finished
+          before, and ``'euler'`` is the alternating sum of their cell
+          counts.
+        - ``'summaries'``: dict of ndarray
+          Only present if `summaries` is given. For each requested summary,
+          an ndarray with one entry per persistence diagram, of shape
+          ``(n_dimensions, n_values)`` for ``'betti_curve'`` and
+          ``(n_dimensions,)`` otherwise.
+        - ``'reduction'``: dict
+          Only present if `reduce_graph` is ``True``. Numbers of vertices
+          (``'n_vertices'``) and edges (``'n_edges'``) removed from the
+          graph, fraction of its vertices and edges they represent
+          (``'ratio'``), and time in seconds spent reducing it (``'time'``).
 
     Notes
     -----
@@ -219,6 +441,305 @@ def flagser_weighted(adjacency_matrix, max_edge_weight=None, min_dimension=0,
            master/docs/documentation_flagser.pdf>`_.
 
     """
+    _check_filtration(filtration, coeff)
+
+    if summaries is not None:
+        _check_summaries(summaries)
+
+    # Extract vertices and edges weights. If the graph is passed as it is to
+    # the bindings, they read the edges of CSR and CSC matrices directly
+    plain = not (reduce_graph or split_components) and \
+        time_budget is None and memory_budget is None and \
+        max_cells_per_dimension is None
+    vertices, edges = _extract_weighted_graph(adjacency_matrix,
+                                              max_edge_weight,
+                                              compressed=plain)
+
+    if reduce_graph:
+        if filtration != 'max':
+            raise ValueError("reduce_graph is only available for the 'max' "
+                             "filtration.")
+        _check_no_budget('reduce_graph', time_budget, memory_budget,
+                         max_cells_per_dimension)
+        out = _flagser_graph_reduced(vertices, edges, min_dimension,
+                                     max_dimension, directed, filtration,
+                                     coeff, approximation, True,
+                                     split_components, n_jobs,
+                                     progress_callback, dtype=dtype,
+                                     cache_dir=cache_dir, in_memory=in_memory)
+        return _with_summaries(out, summaries)
+    if split_components:
+        _check_no_budget('split_components', time_budget, memory_budget,
+                         max_cells_per_dimension)
+        out = _flagser_graph_components(vertices, edges, min_dimension,
+                                        max_dimension, directed, filtration,
+                                        coeff, approximation, True, n_jobs,
+                                        progress_callback, dtype=dtype,
+                                        cache_dir=cache_dir,
+                                        in_memory=in_memory)
+        return _with_summaries(out, summaries)
+    if plain:
+        return _flagser_graph(vertices, edges, min_dimension, max_dimension,
+                              directed, filtration, coeff, approximation,
+                              weighted=True,
+                              progress_callback=progress_callback,
+                              dtype=dtype, summaries=summaries,
+                              cache_dir=cache_dir, in_memory=in_memory)
+    out = _flagser_graph_budget(vertices, edges, min_dimension,
+                                max_dimension, directed, filtration, coeff,
+                                approximation, True, time_budget,
+                                memory_budget, max_cells_per_dimension,
+                                progress_callback, dtype=dtype,
+                                cache_dir=cache_dir, in_memory=in_memory)
+    if summaries is not None:
+        out['summaries'] = _compute_summaries(out['dgms'], summaries)
+    return out
+
+
+def flagser_weighted_iter(adjacency_matrix, max_edge_weight=None,
+                          min_dimension=0, max_dimension=np.inf,
+                          directed=True, filtration="max", coeff=2,
+                          approximation=None, dtype=np.float64):
+    """Iterate over the persistence diagrams of a directed/undirected
+    filtered flag complex, one dimension at a time.
+
+    Unlike :func:`flagser_weighted`, which only returns once all dimensions
+    have been computed, each persistence diagram is yielded as soon as the
+    reduction in its dimension is complete, so that it can be processed while
+    the next dimensions are being computed. All dimensions are computed by a
+    single call to flagser, running in a background thread, which is stopped
+    if the iteration is stopped before the last dimension.
+
+    Parameters
+    ----------
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Matrix representation of a directed/undirected weighted graph, see
+        :func:`flagser_weighted`.
+
+    max_edge_weight : int or float or ``None``, optional, default: ``None``
+        Maximum edge weight to be considered in the filtration. All edge
+        weights greater than that value will be considered as
+        infinitely-valued, i.e., absent from the filtration. If ``None``, all
+        finite edge weights are considered.
+
+    min_dimension : int, optional, default: ``0``
+        Minimum homology dimension to compute.
+
+    max_dimension : int or np.inf, optional, default: ``np.inf``
+        Maximum homology dimension to compute. If ``np.inf``, it is
+        determined by flagser as for :func:`flagser_weighted`.
+
+    directed : bool, optional, default: ``True``
+        If ``True``, computes persistent homology for the directed filtered
+        flag complex determined by `adjacency_matrix`. If ``False``, computes
+        persistent homology for the undirected filtered flag complex, see
+        :func:`flagser_weighted`.
+
+    filtration : string, optional, default: ``'max'``
+        Algorithm determining the filtration, see :func:`flagser_weighted`.
+
+    coeff : int, optional, default: ``2``
+        Compute homology with coefficients in the prime field
+        :math:`\\mathbb{F}_p = \\{ 0, \\ldots, p - 1 \\}` where
+        :math:`p` equals `coeff`.
+
+    approximation : int or None, optional, default: ``None``
+        Skip all cells creating columns in the reduction matrix with more than
+        this number of entries, see :func:`flagser_weighted`.
+
+    dtype : data-type, optional, default: ``np.float64``
+        Data-type of the persistence diagrams, see :func:`flagser_weighted`.
+
+    Yields
+    ------
+    dimension : int
+        Homology dimension.
+
+    diagram : ndarray of shape ``(n_pairs, 2)``
+        Persistence diagram in dimension `dimension`, with the first column
+        representing the birth time and the second column representing the
+        death time of each pair.
+
+    """
+    _check_filtration(filtration, coeff)
+
+    vertices, edges = _extract_weighted_graph(adjacency_matrix,
+                                              max_edge_weight)
+
+    # The diagrams are passed from the computing thread through a queue,
+    # followed by None, or by the exception raised by the computation
+    diagrams = queue.Queue()
+    stopped = threading.Event()
+
+    def compute():
+        try:
+            _flagser_graph(vertices, edges, min_dimension, max_dimension,
+                           directed, filtration, coeff, approximation,
+                           weighted=True, dtype=dtype,
+                           stop=lambda *progress: stopped.is_set(),
+                           dimension_callback=lambda *item: diagrams.put(
+                               item))
+        except BaseException as error:
+            diagrams.put(error)
+        else:
+            diagrams.put(None)
+
+    thread = threading.Thread(target=compute, daemon=True)
+    thread.start()
+    try:
+        while True:
+            # Waiting with a timeout, so that signals such as
+            # KeyboardInterrupt are handled meanwhile
+            try:
+                item = diagrams.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # The computation stops at its next progress report if the iteration
+        # is stopped early, e.g. by closing the generator
+        stopped.set()
+        while thread.is_alive():
+            thread.join(0.1)
+
+
+def flagser_weighted_sweep(adjacency_matrix, thresholds, min_dimension=0,
+                           max_dimension=np.inf, directed=True, coeff=2,
+                           approximation=None, n_jobs=None):
+    """Compute Betti numbers, cell counts and Euler characteristics of a
+    directed/undirected filtered flag complex at several filtration values.
+
+    Equivalent to calling :func:`flagser_weighted` once per threshold with
+    `max_edge_weight` set to that threshold, but the flag complex is built
+    only once: Betti numbers are read off the persistence diagrams of the
+    ``'max'`` filtration and cell counts from a single enumeration of the
+    cells.
+
+    Parameters
+    ----------
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Matrix representation of a directed/undirected weighted graph, see
+        :func:`flagser_weighted`.
+
+    thresholds : array-like of shape (n_thresholds,), required
+        Filtration values at which to compute the Betti numbers, cell counts
+        and Euler characteristics, in any order.
+
+    min_dimension : int, optional, default: ``0``
+        Minimum homology dimension to compute.
+
+    max_dimension : int or np.inf, optional, default: ``np.inf``
+        Maximum homology dimension to compute.
+
+    directed : bool, optional, default: ``True``
+        If ``True``, computes homology for the directed filtered flag complex
+        determined by `adjacency_matrix`. If ``False``, computes homology for
+        the undirected filtered flag complex, see :func:`flagser_weighted`.
+
+    coeff : int, optional, default: ``2``
+        Compute homology with coefficients in the prime field
+        :math:`\\mathbb{F}_p = \\{ 0, \\ldots, p - 1 \\}` where
+        :math:`p` equals `coeff`.
+
+    approximation : None, optional, default: ``None``
+        Must be ``None``. Approximate persistence diagrams do not give the
+        Betti numbers at each threshold, which would then be inconsistent
+        with the exact cell counts and Euler characteristics.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to enumerate the cells of the complex.
+        ``None`` means 1 while ``-1`` means using all processors.
+
+    Returns
+    -------
+    out : dict
+        A dictionary with the following key-value pairs:
+
+        - ``'dgms'``: list of ndarray of shape ``(n_pairs, 2)``
+          Persistence diagrams of the ``'max'`` filtration, as returned by
+          :func:`flagser_weighted`.
+        - ``'betti'``: ndarray of shape ``(n_thresholds, n_dimensions)``
+          Betti numbers at each threshold, per dimension greater than or
+          equal to `min_dimension` and less than `max_dimension`.
+        - ``'cell_count'``: ndarray of shape ``(n_thresholds, n_dimensions)``
+          Cell counts (number of simplices) at each threshold, per dimension
+          greater than or equal to `min_dimension` and less than
+          `max_dimension`.
+        - ``'euler'``: ndarray of shape ``(n_thresholds,)``
+          Euler characteristic at each threshold, computed from the cell
+          counts above.
+
+    Notes
+    -----
+    The complex at a threshold is made of the cells whose filtration value,
+    the maximum weight of their vertices and edges, is at most the
+    threshold. Unlike with `max_edge_weight`, vertices whose weight exceeds a
+    threshold are therefore not part of the complex at that threshold.
+
+    """
+    if approximation is not None:
+        raise ValueError("approximation is not available for "
+                         "flagser_weighted_sweep.")
+    thresholds = _check_thresholds(thresholds)
+    vertices, edges = _extract_weighted_graph(adjacency_matrix,
+                                              _max_edge_weight(thresholds))
+
+    out = _flagser_graph(vertices, edges, min_dimension, max_dimension,
+                         directed, 'max', coeff, approximation, weighted=True)
+    cell_count = _cell_count_thresholds(vertices, edges, thresholds, directed,
+                                        min_dimension, max_dimension, n_jobs)
+
+    # Filtration values are single precision, compare them to the thresholds
+    # with the same rounding as for the cell counts
+    thresholds = thresholds.astype(_VALUE_DTYPE).astype(float)
+    betti = _betti_curves(out['dgms'], thresholds)
+
+    n_dimensions = max(betti.shape[1], cell_count.shape[1])
+    betti = np.pad(betti, ((0, 0), (0, n_dimensions - betti.shape[1])))
+    cell_count = np.pad(cell_count,
+                        ((0, 0), (0, n_dimensions - cell_count.shape[1])))
+    signs = (-1) ** np.arange(min_dimension, min_dimension + n_dimensions)
+
+    return {'dgms': out['dgms'],
+            'betti': betti,
+            'cell_count': cell_count,
+            'euler': cell_count @ signs}
+
+
+def _flagser_graph(vertices, edges, min_dimension, max_dimension, directed,
+                   filtration, coeff, approximation, weighted,
+                   progress_callback=None, dtype=np.float64,
+                   summaries=None, cache_dir=None, in_memory=False,
+                   stop=None, dimension_callback=None):
+    """Compute the (persistent) homology of the flag complex of a graph
+    given by its vertex weights and its (row, column, weight) edge arrays or
+    ``_CompressedEdges``, as returned by ``_extract_weighted_graph`` or
+    ``_extract_unweighted_graph``.
+
+    If `stop` is set, it is called along with `progress_callback` and the
+    computation is stopped as soon as it returns ``True``, the output then
+    only holding the dimensions finished before and ``'truncated'`` being
+    ``True``. If `dimension_callback` is set, it is called as
+    ``dimension_callback(dimension, diagram)`` as soon as each dimension is
+    finished."""
+    result_cache = cache._result_cache
+    if result_cache is not None:
+        key = cache._cache_key(vertices, edges, min_dimension, max_dimension,
+                               directed, filtration, coeff, approximation,
+                               weighted, np.dtype(dtype).str)
+        out = result_cache.get(key)
+        if out is not None:
+            if dimension_callback is not None:
+                for i, dgm in enumerate(out['dgms']):
+                    dimension_callback(min_dimension + i, dgm)
+            if stop is not None:
+                out = {**out, 'truncated': False}
+            return _with_summaries(out, summaries)
+
     # Handle default parameters
     if max_dimension == np.inf:
         _max_dimension = -1
@@ -230,31 +751,243 @@ def flagser_weighted(adjacency_matrix, max_edge_weight=None, min_dimension=0,
     else:
         _approximation = approximation
 
-    if filtration not in AVAILABLE_FILTRATIONS:
-        raise ValueError("Filtration not recognized. Available filtrations "
-                         "are ", AVAILABLE_FILTRATIONS)
-
-    # Extract vertices and edges weights
-    vertices, edges = _extract_weighted_graph(adjacency_matrix,
-                                              max_edge_weight)
-
-    # Select the homology computer based on coeff
+    # The bindings stop the computation if their progress callback returns
+    # True, and count the dimensions finished before through their dimension
+    # callback
+    stopped = []
+    finished = []
+
+    def _progress_callback(*progress):
+        if progress_callback is not None:
+            progress_callback(*progress)
+        if stop(*progress):
+            stopped.append(True)
+            return True
+
+    def _dimension_callback(dimension, diagram):
+        finished.append(dimension)
+        if dimension_callback is not None:
+            dimension_callback(dimension, diagram.astype(dtype, copy=False))
+
+    # Select the homology computer based on coeff. The modules are only loaded
+    # when first needed, the one with coefficients only if coeff != 2.
     if coeff == 2:
-        _compute_homology = compute_homology
+        from .modules import flagser_pybind as _module
+    else:
+        from .modules import flagser_coeff_pybind as _module
+    if isinstance(edges, _CompressedEdges):
+        _compute_homology = _module.compute_homology_compressed
+        graph = edges
     else:
-        _compute_homology = compute_homology_coeff
+        _compute_homology = _module.compute_homology
+        graph = _edge_arrays(edges)
 
     # Call flagser binding
-    homology = _compute_homology(vertices, edges, min_dimension,
-                                 _max_dimension, directed, coeff,
-                                 _approximation, filtration)[0]
+    with _cache_directory(cache_dir) as _cache_dir:
+        homology = _compute_homology(
+            vertices, *graph, min_dimension, _max_dimension, directed, coeff,
+            _approximation, filtration,
+            progress_callback if stop is None else _progress_callback,
+            None if stop is None and dimension_callback is None
+            else _dimension_callback, _cache_dir, in_memory)[0]
 
     # Create dictionary of return values
     out = {
-        'dgms': [np.asarray(d).reshape((-1, 2))
-                 for d in homology.get_persistence_diagram()],
         'betti': homology.get_betti_numbers(),
         'cell_count': homology.get_cell_count(),
         'euler': homology.get_euler_characteristic()
     }
+    if weighted:
+        out = {'dgms': homology.get_persistence_diagram_arrays(
+            np.dtype(dtype)), **out}
+
+    if stopped:
+        # Only keep the dimensions finished before the computation stopped
+        return _with_summaries(_truncated(out, min_dimension,
+                                          len(finished)), summaries)
+    if result_cache is not None:
+        result_cache.put(key, out)
+    if stop is not None:
+        out = {**out, 'truncated': False}
+    return _with_summaries(out, summaries)
+
+
+def _truncated(out, min_dimension, n_dimensions):
+    """Output of ``_flagser_graph`` restricted to its first `n_dimensions`
+    dimensions, with ``'truncated'`` set to ``True``."""
+    out = {name: value[:n_dimensions] if name in ('dgms', 'betti',
+                                                  'cell_count') else value
+           for name, value in out.items()}
+    out['euler'] = sum((-1) ** (min_dimension + i) * n_cells
+                       for i, n_cells in enumerate(out['cell_count']))
+    out['truncated'] = True
+    return out
+
+
+@contextmanager
+def _cache_directory(cache_dir):
+    """Path of a new temporary subdirectory of `cache_dir`, removed on exit,
+    or an empty string if `cache_dir` is ``None``. flagser reuses the files it
+    finds in its cache directory, which may have been written by computations
+    on other graphs or by concurrent ones."""
+    if cache_dir is None:
+        yield ''
+        return
+    os.makedirs(cache_dir, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='flagser-',
+                                     dir=cache_dir) as directory:
+        yield directory + os.sep
+
+
+def _with_summaries(out, summaries):
+    if summaries is not None:
+        out['summaries'] = _compute_summaries(out['dgms'], summaries)
+    return out
+
+
+def _check_no_budget(option, time_budget, memory_budget,
+                     max_cells_per_dimension):
+    if time_budget is not None or memory_budget is not None or \
+            max_cells_per_dimension is not None:
+        raise ValueError("{} cannot be combined with time_budget, "
+                         "memory_budget or max_cells_per_dimension."
+                         .format(option))
+
+
+def _check_filtration(filtration, coeff=2):
+    # Filtrations are read from the module used for coeff, so that checking
+    # them does not load the other one
+    if coeff == 2:
+        from .modules.flagser_pybind import AVAILABLE_FILTRATIONS
+    else:
+        from .modules.flagser_coeff_pybind import AVAILABLE_FILTRATIONS
+    if filtration not in AVAILABLE_FILTRATIONS:
+        raise ValueError("Filtration not recognized. Available filtrations "
+                         "are ", AVAILABLE_FILTRATIONS)
+
+
+def _flagser_graph_components(vertices, edges, min_dimension, max_dimension,
+                              directed, filtration, coeff, approximation,
+                              weighted, n_jobs, progress_callback=None,
+                              dtype=np.float64, cache_dir=None,
+                              in_memory=False):
+    """Same as ``_flagser_graph``, but computing the (persistent) homology of
+    groups of weakly connected components of the graph separately, in
+    `n_jobs` threads, and merging the results."""
+    # The progress of the components, computed in several threads at once,
+    # does not add up to the progress of the whole computation
+    if progress_callback is not None:
+        raise ValueError("progress_callback cannot be combined with "
+                         "split_components.")
+    n_jobs = _effective_n_jobs(n_jobs)
+    graphs = _split_components(vertices, edges, n_jobs)
+    cancelled = threading.Event()
+
+    def check_cancelled(*progress):
+        # Signals are only checked by the bindings in the main thread, so the
+        # computations in the worker threads are stopped through this
+        # callback once the calling thread is interrupted
+        if cancelled.is_set():
+            raise RuntimeError("Computation cancelled.")
+
+    def compute(graph):
+        return _flagser_graph(*graph, min_dimension, max_dimension, directed,
+                              filtration, coeff, approximation, weighted,
+                              check_cancelled, dtype, cache_dir=cache_dir,
+                              in_memory=in_memory)
+
+    if len(graphs) == 1:
+        return compute(graphs[0])
+    # The bindings release the GIL while computing
+    with ThreadPoolExecutor(max_workers=min(n_jobs, len(graphs))) as executor:
+        futures = [executor.submit(compute, graph) for graph in graphs]
+        try:
+            # Waiting with a timeout, so that the calling thread handles
+            # signals such as KeyboardInterrupt while the workers compute
+            not_done = futures
+            while not_done:
+                done, not_done = wait(not_done, timeout=0.1,
+                                      return_when=FIRST_EXCEPTION)
+                for future in done:
+                    future.result()
+            outs = [future.result() for future in futures]
+        except BaseException:
+            # E.g. KeyboardInterrupt, or an error in one of the components
+            cancelled.set()
+            for future in futures:
+                future.cancel()
+            raise
+    return _merge_components(outs)
+
+
+def _flagser_graph_reduced(vertices, edges, min_dimension, max_dimension,
+                           directed, filtration, coeff, approximation,
+                           weighted, split_components, n_jobs,
+                           progress_callback=None, dtype=np.float64,
+                           cache_dir=None, in_memory=False):
+    """Same as ``_flagser_graph``, or ``_flagser_graph_components`` if
+    `split_components`, but on the graph reduced by ``_reduce_graph``, the
+    contribution of the removed parts being added back to the output."""
+    start = time.perf_counter()
+    vertices, edges, reduction = _reduce_graph(vertices, edges, directed,
+                                               weighted)
+    reduction_time = time.perf_counter() - start
+
+    if split_components:
+        out = _flagser_graph_components(vertices, edges, min_dimension,
+                                        max_dimension, directed, filtration,
+                                        coeff, approximation, weighted,
+                                        n_jobs, progress_callback, dtype,
+                                        cache_dir=cache_dir,
+                                        in_memory=in_memory)
+    else:
+        out = _flagser_graph(vertices, edges, min_dimension, max_dimension,
+                             directed, filtration, coeff, approximation,
+                             weighted, progress_callback, dtype,
+                             cache_dir=cache_dir, in_memory=in_memory)
+    out = _with_reduction(out, reduction, min_dimension, max_dimension)
+
+    n_vertices, n_edges = reduction['cell_count']
+    out['reduction'] = {
+        'n_vertices': n_vertices,
+        'n_edges': n_edges,
+        'ratio': (n_vertices + n_edges) / max(sum(reduction['n_cells']), 1),
+        'time': reduction_time
+    }
+    return out
+
+
+def _flagser_graph_budget(vertices, edges, min_dimension, max_dimension,
+                          directed, filtration, coeff, approximation,
+                          weighted, time_budget, memory_budget,
+                          max_cells_per_dimension, progress_callback=None,
+                          dtype=np.float64, cache_dir=None, in_memory=False):
+    """Same as ``_flagser_graph``, but stopping the computation as soon as
+    one of the budgets is exhausted."""
+    start = time.perf_counter()
+    if memory_budget is not None and _resident_memory() is None:
+        warnings.warn("The memory used by the process cannot be measured on "
+                      "this platform, memory_budget will be ignored.")
+        memory_budget = None
+
+    def stop(dimension, n_cells, n_columns):
+        # Called by the bindings at the start of each dimension and then
+        # every 0.1 seconds
+        return (time_budget is not None and
+                time.perf_counter() - start >= time_budget) or \
+            (memory_budget is not None and
+             _resident_memory() >= memory_budget) or \
+            (max_cells_per_dimension is not None and
+             n_cells > max_cells_per_dimension)
+
+    out = _flagser_graph(vertices, edges, min_dimension, max_dimension,
+                         directed, filtration, coeff, approximation, weighted,
+                         progress_callback, dtype, cache_dir=cache_dir,
+                         in_memory=in_memory, stop=stop)
+
+    # The cells of a dimension may only be counted once it is finished
+    if max_cells_per_dimension is not None:
+        for i, n_cells in enumerate(out['cell_count']):
+            if n_cells > max_cells_per_dimension:
+                return _truncated(out, min_dimension, i)
     return out
@@ -0,0 +1,277 @@
+"""Implementation of the python API for the flagser C++ library on batches
+of graphs, processed in parallel by a pool of worker processes."""
+
+from multiprocessing import Pool
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from ._summaries import _check_summaries
+from ._utils import _extract_unweighted_graph, _extract_weighted_graph, \
+    _effective_n_jobs, _VERTEX_INDEX_DTYPE, _VALUE_DTYPE
+from .flagser import _flagser_graph, _check_filtration
+
+# Number of chunks per worker when chunks are sized automatically
+_CHUNKS_PER_JOB = 4
+
+# Shared memory block holding the graphs of the batch, attached once by each
+# worker process
+_shared_memory = None
+
+
+def _dtypes(n_edge_arrays):
+    # Vertex weights, then source and target vertices of the edges and their
+    # weights if any
+    return [_VALUE_DTYPE, _VERTEX_INDEX_DTYPE, _VERTEX_INDEX_DTYPE,
+            _VALUE_DTYPE][:1 + n_edge_arrays]
+
+
+def _layout(graphs):
+    """Byte offsets of the arrays of all graphs in a shared memory block."""
+    layouts = []
+    offset = 0
+    for vertices, edges in graphs:
+        arrays = []
+        for array, dtype in zip([vertices, *edges], _dtypes(len(edges))):
+            itemsize = np.dtype(dtype).itemsize
+            offset = -(-offset // itemsize) * itemsize
+            arrays.append((offset, len(array)))
+            offset += itemsize * len(array)
+        layouts.append(arrays)
+    return layouts, offset
+
+
+def _graph_views(buffer, layout):
+    """Vertex and edge arrays of a graph stored in a shared memory buffer."""
+    vertices, *edges = [
+        np.ndarray(size, dtype=dtype, buffer=buffer, offset=offset)
+        for (offset, size), dtype in zip(layout, _dtypes(len(layout) - 1))
+        ]
+    return vertices, tuple(edges)
+
+
+def _attach_shared_memory(name):
+    global _shared_memory
+    _shared_memory = SharedMemory(name=name)
+
+
+def _compute_chunk(args):
+    chunk, kwargs = args
+    return [(index, _flagser_graph(*_graph_views(_shared_memory.buf, layout),
+                                   **kwargs))
+            for index, layout in chunk]
+
+
+def _make_chunks(sizes, n_jobs, chunksize):
+    """Split graph indices into chunks, largest graphs first. Unless
+    `chunksize` is given, chunks hold about the same total size, so that
+    large graphs are processed on their own and small ones are grouped."""
+    order = np.argsort(-np.asarray(sizes), kind='stable')
+    if chunksize is None:
+        target = sum(sizes) / (_CHUNKS_PER_JOB * n_jobs)
+        max_graphs = len(sizes)
+    else:
+        target = np.inf
+        max_graphs = chunksize
+
+    chunks = [[]]
+    chunk_size = 0
+    for index in order:
+        if chunks[-1] and (chunk_size >= target or
+                           len(chunks[-1]) == max_graphs):
+            chunks.append([])
+            chunk_size = 0
+        chunks[-1].append(index)
+        chunk_size += sizes[index]
+    return [chunk for chunk in chunks if chunk]
+
+
+def _flagser_batch(graphs, n_jobs, chunksize, **kwargs):
+    n_jobs = min(_effective_n_jobs(n_jobs), len(graphs))
+    if n_jobs <= 1:
+        return [_flagser_graph(vertices, edges, **kwargs)
+                for vertices, edges in graphs]
+
+    # Copy all graphs into shared memory, with the data types expected by the
+    # bindings, so that workers only receive offsets into it
+    layouts, n_bytes = _layout(graphs)
+    shared_memory = SharedMemory(create=True, size=max(n_bytes, 1))
+    try:
+        for (vertices, edges), layout in zip(graphs, layouts):
+            views = _graph_views(shared_memory.buf, layout)
+            views[0][:] = vertices
+            for view, edge_array in zip(views[1], edges):
+                view[:] = edge_array
+            del views
+
+        sizes = [sum(size for _, size in layout) for layout in layouts]
+        tasks = [([(index, layouts[index]) for index in chunk], kwargs)
+                 for chunk in _make_chunks(sizes, n_jobs, chunksize)]
+
+        results = len(layouts) * [None]
+        with Pool(processes=n_jobs, initializer=_attach_shared_memory,
+                  initargs=(shared_memory.name,)) as pool:
+            for chunk_results in pool.imap_unordered(_compute_chunk, tasks):
+                for index, result in chunk_results:
+                    results[index] = result
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
+
+    return results
+
+
+def flagser_unweighted_batch(adjacency_matrices, min_dimension=0,
+                             max_dimension=np.inf, directed=True, coeff=2,
+                             approximation=None, n_jobs=None,
+                             chunksize=None):
+    """Compute homology of a batch of directed/undirected flag complexes in
+    parallel.
+
+    Equivalent to calling :func:`flagser_unweighted` on each adjacency
+    matrix, but the graphs are distributed to a pool of worker processes
+    through shared memory rather than pickled, and the largest graphs are
+    processed first.
+
+    Parameters
+    ----------
+    adjacency_matrices : iterable of 2d ndarray or scipy.sparse matrix, \
+        required
+        Adjacency matrices of directed/undirected unweighted graphs, see
+        :func:`flagser_unweighted`.
+
+    min_dimension : int, optional, default: ``0``
+        Minimum homology dimension to compute.
+
+    max_dimension : int or np.inf, optional, default: ``np.inf``
+        Maximum homology dimension to compute.
+
+    directed : bool, optional, default: ``True``
+        If ``True``, computes homology for the directed flag complexes
+        determined by `adjacency_matrices`. If ``False``, computes homology
+        for the undirected flag complexes obtained by considering all edges as
+        undirected.
+
+    coeff : int, optional, default: ``2``
+        Compute homology with coefficients in the prime field
+        :math:`\\mathbb{F}_p = \\{ 0, \\ldots, p - 1 \\}` where
+        :math:`p` equals `coeff`.
+
+    approximation : int or None, optional, default: ``None``
+        Skip all cells creating columns in the reduction matrix with more than
+        this number of entries, see :func:`flagser_unweighted`.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of worker processes. ``None`` means 1, in which case the
+        graphs are processed one after the other in the calling process,
+        while ``-1`` means using all processors.
+
+    chunksize : int or None, optional, default: ``None``
+        Maximum number of graphs sent to a worker at once. If ``None``, the
+        graphs are grouped into chunks of roughly equal total numbers of
+        vertices and edges, with several chunks per worker.
+
+    Returns
+    -------
+    out : list of dict
+        One dictionary per adjacency matrix, in the order of
+        `adjacency_matrices`, as returned by :func:`flagser_unweighted`.
+
+    """
+    graphs = [_extract_unweighted_graph(adjacency_matrix)
+              for adjacency_matrix in adjacency_matrices]
+
+    return _flagser_batch(graphs, n_jobs, chunksize,
+                          min_dimension=min_dimension,
+                          max_dimension=max_dimension, directed=directed,
+                          filtration='max', coeff=coeff,
+                          approximation=approximation, weighted=False)
+
+
+def flagser_weighted_batch(adjacency_matrices, max_edge_weight=None,
+                           min_dimension=0, max_dimension=np.inf,
+                           directed=True, filtration="max", coeff=2,
+                           approximation=None, n_jobs=None, chunksize=None,
+                           dtype=np.float64, summaries=None):
+    """Compute persistent homology of a batch of directed/undirected filtered
+    flag complexes in parallel.
+
+    Equivalent to calling :func:`flagser_weighted` on each adjacency matrix,
+    but the graphs are distributed to a pool of worker processes through
+    shared memory rather than pickled, and the largest graphs are processed
+    first.
+
+    Parameters
+    ----------
+    adjacency_matrices : iterable of 2d ndarray or scipy.sparse matrix, \
+        required
+        Matrix representations of directed/undirected weighted graphs, see
+        :func:`flagser_weighted`.
+
+    max_edge_weight : int or float or ``None``, optional, default: ``None``
+        Maximum edge weight to be considered in the filtration. All edge
+        weights greater than that value will be considered as
+        infinitely-valued, i.e., absent from the filtration. If ``None``, all
+        finite edge weights are considered.
+
+    min_dimension : int, optional, default: ``0``
+        Minimum homology dimension to compute.
+
+    max_dimension : int or np.inf, optional, default: ``np.inf``
+        Maximum homology dimension to compute.
+
+    directed : bool, optional, default: ``True``
+        If ``True``, computes persistent homology for the directed filtered
+        flag complexes determined by `adjacency_matrices`. If ``False``,
+        computes persistent homology for the undirected filtered flag
+        complexes, see :func:`flagser_weighted`.
+
+    filtration : string, optional, default: ``'max'``
+        Algorithm determining the filtration, see :func:`flagser_weighted`.
+
+    coeff : int, optional, default: ``2``
+        Compute homology with coefficients in the prime field
+        :math:`\\mathbb{F}_p = \\{ 0, \\ldots, p - 1 \\}` where
+        :math:`p` equals `coeff`.
+
+    approximation : int or None, optional, default: ``None``
+        Skip all cells creating columns in the reduction matrix with more than
+        this number of entries, see :func:`flagser_weighted`.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of worker processes. ``None`` means 1, in which case the
+        graphs are processed one after the other in the calling process,
+        while ``-1`` means using all processors.
+
+    chunksize : int or None, optional, default: ``None``
+        Maximum number of graphs sent to a worker at once. If ``None``, the
+        graphs are grouped into chunks of roughly equal total numbers of
+        vertices and edges, with several chunks per worker.
+
+    dtype : data-type, optional, default: ``np.float64``
+        Data-type of the persistence diagrams, see :func:`flagser_weighted`.
+
+    summaries : dict or None, optional, default: ``None``
+        Summaries of the persistence diagrams to compute in the workers, see
+        :func:`flagser_weighted`.
+
+    Returns
+    -------
+    out : list of dict
+        One dictionary per adjacency matrix, in the order of
+        `adjacency_matrices`, as returned by :func:`flagser_weighted`.
+
+    """
+    _check_filtration(filtration, coeff)
+    if summaries is not None:
+        _check_summaries(summaries)
+
+    graphs = [_extract_weighted_graph(adjacency_matrix, max_edge_weight)
+              for adjacency_matrix in adjacency_matrices]
+
+    return _flagser_batch(graphs, n_jobs, chunksize,
+                          min_dimension=min_dimension,
+                          max_dimension=max_dimension, directed=directed,
+                          filtration=filtration, coeff=coeff,
+                          approximation=approximation, weighted=True,
+                          dtype=dtype, summaries=summaries)
@@ -1,11 +1,14 @@
 """Implementation of the python API for the cell count of the flagser C++
 library."""
 
-from ._utils import _extract_unweighted_graph, _extract_weighted_graph
-from .modules.flagser_count_pybind import compute_cell_count
+import numpy as np
 
+from ._utils import _extract_unweighted_graph, _extract_weighted_graph, \
+    _edge_arrays, _effective_n_jobs, _VALUE_DTYPE
 
-def flagser_count_unweighted(adjacency_matrix, directed=True):
+
+def flagser_count_unweighted(adjacency_matrix, directed=True, n_jobs=None,
+                             participation=False):
     """Compute the cell count per dimension of a directed/undirected unweighted
     flag complex.
 
@@ -27,11 +30,36 @@ def flagser_count_unweighted(adjacency_matrix, directed=True):
         undirected, and it is therefore sufficient (but not necessary)
         to pass an upper-triangular matrix.
 
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to enumerate the cells of the complex.
+        ``None`` means 1 while ``-1`` means using all processors.
+
+    participation : bool, optional, default: ``False``
+        If ``True``, also count, per dimension, the cells that each vertex and
+        each edge belong to. These counts are accumulated while the cells are
+        enumerated in one table per dimension shared by all threads, so that
+        it takes memory of order ``(n_vertices + n_edges) * n_dimensions``
+        whatever `n_jobs`.
+
     Returns
     -------
-    out : list of int
+    out : list of int or dict
         Cell counts (number of simplices), per dimension greater than or equal
-        to `min_dimension` and less than `max_dimension`.
+        to `min_dimension` and less than `max_dimension`. If `participation`
+        is ``True``, a dictionary with the following key-value pairs
+        instead:
+
+        - ``'cell_count'``: list of int, the cell counts as above.
+        - ``'vertex_participation'``: ndarray of shape ``(n_vertices,
+          n_dimensions)``, the number of cells of each dimension that each
+          vertex belongs to.
+        - ``'edges'``: ndarray of shape ``(n_edges, 2)`` and dtype
+          ``numpy.uint32``, the distinct edges of the graph as pairs of
+          source and target vertices, sorted lexicographically. In the
+          undirected case, the source is the smaller vertex.
+        - ``'edge_participation'``: ndarray of shape ``(n_edges,
+          n_dimensions)``, the number of cells of each dimension that each
+          edge in ``'edges'`` belongs to.
 
     Notes
     -----
@@ -49,14 +77,20 @@ def flagser_count_unweighted(adjacency_matrix, directed=True):
     # Extract vertices and edges
     vertices, edges = _extract_unweighted_graph(adjacency_matrix)
 
+    if participation:
+        return _participation(vertices, edges, directed, n_jobs)
+
     # Call flagser_count binding
-    cell_count = compute_cell_count(vertices, edges, directed)
+    from .modules.flagser_count_pybind import compute_cell_count
+    cell_count = compute_cell_count(vertices, *_edge_arrays(edges), directed,
+                                    0, -1, _effective_n_jobs(n_jobs))
 
     return cell_count
 
 
 def flagser_count_weighted(adjacency_matrix, max_edge_weight=None,
-                           directed=True):
+                           directed=True, n_jobs=None, thresholds=None,
+                           participation=False):
     """Compute the cell count per dimension of a directed/undirected
     filtered flag complex.
 
@@ -98,11 +132,50 @@ def flagser_count_weighted(adjacency_matrix, max_edge_weight=None,
         - if `max_edge_weight` is finite, it is recommended to pass either a
           symmetric dense matrix, or a sparse upper-triangular matrix.
 
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to enumerate the cells of the complex.
+        ``None`` means 1 while ``-1`` means using all processors.
+
+    thresholds : array-like of shape (n_thresholds,) or None, optional, \
+        default: ``None``
+        If not ``None``, the cells are counted at each of these filtration
+        values at once, instead of only at `max_edge_weight`, which must then
+        be ``None``. The flag complex is built and its cells enumerated only
+        once, the filtration value of each cell being the maximum of the
+        weights of its vertices and edges.
+
+    participation : bool, optional, default: ``False``
+        If ``True``, also count, per dimension, the cells that each vertex and
+        each edge belong to. These counts are accumulated while the cells are
+        enumerated in one table per dimension shared by all threads, so that
+        it takes memory of order ``(n_vertices + n_edges) * n_dimensions``
+        whatever `n_jobs`. It cannot be combined with `thresholds`.
+
     Returns
     -------
-    out : list of int
+    out : list of int or ndarray of shape (n_thresholds, n_dimensions) \
+        or dict
         Cell counts (number of simplices) at filtration value
-        `max_edge_weight`, per dimension.
+        `max_edge_weight`, per dimension. If `thresholds` is given, cell
+        counts of the subcomplexes of cells whose filtration value is at most
+        each threshold, per threshold and dimension. Unlike with
+        `max_edge_weight`, vertices whose weight exceeds a threshold are not
+        counted at that threshold. If `participation` is ``True``, a
+        dictionary with the following key-value pairs instead:
+
+        - ``'cell_count'``: list of int, the cell counts at
+          `max_edge_weight`.
+        - ``'vertex_participation'``: ndarray of shape ``(n_vertices,
+          n_dimensions)``, the number of cells of each dimension that each
+          vertex belongs to.
+        - ``'edges'``: ndarray of shape ``(n_edges, 2)`` and dtype
+          ``numpy.uint32``, the distinct edges with weight at most
+          `max_edge_weight` as pairs of source and target vertices, sorted
+          lexicographically. In the undirected case, the source is the
+          smaller vertex.
+        - ``'edge_participation'``: ndarray of shape ``(n_edges,
+          n_dimensions)``, the number of cells of each dimension that each
+          edge in ``'edges'`` belongs to.
 
     Notes
     -----
@@ -117,11 +190,192 @@ def flagser_count_weighted(adjacency_matrix, max_edge_weight=None,
            master/docs/documentation_flagser.pdf>`_.
 
     """
+    if thresholds is not None:
+        if max_edge_weight is not None:
+            raise ValueError("max_edge_weight and thresholds cannot be both "
+                             "given.")
+        if participation:
+            raise ValueError("participation cannot be computed with "
+                             "thresholds.")
+        thresholds = _check_thresholds(thresholds)
+        vertices, edges = _extract_weighted_graph(
+            adjacency_matrix, _max_edge_weight(thresholds))
+        return _cell_count_thresholds(vertices, edges, thresholds, directed,
+                                      0, np.inf, n_jobs)
+
     # Extract vertices and edges weights
     vertices, edges = _extract_weighted_graph(adjacency_matrix,
                                               max_edge_weight)
 
+    if participation:
+        return _participation(vertices, edges, directed, n_jobs)
+
     # Call flagser_count binding
-    cell_count = compute_cell_count(vertices, edges, directed)
+    from .modules.flagser_count_pybind import compute_cell_count
+    cell_count = compute_cell_count(vertices, *edges, directed, 0, -1,
+                                    _effective_n_jobs(n_jobs))
 
     return cell_count
+
+
+class IncrementalCellCounter:
+    """Cell counts per dimension of a directed/undirected flag complex, kept
+    up to date as edges are added to and removed from its graph.
+
+    The cells are first counted as by :func:`flagser_count_unweighted`. When
+    an edge is then added or removed, only the cells containing it are
+    enumerated, among the common neighbours of its vertices, so that the cost
+    of an update depends on the neighbourhood of the changed edges and not on
+    the size of the graph.
+
+    Parameters
+    ----------
+    adjacency_matrix : 2d ndarray or scipy.sparse matrix, required
+        Adjacency matrix of the initial graph. If `weighted` is ``False``, it
+        is understood as a boolean matrix as in
+        :func:`flagser_count_unweighted`. Otherwise, it is the matrix
+        representation of a weighted graph as in
+        :func:`flagser_count_weighted`, whose edges with weight at most
+        `max_edge_weight` are kept.
+
+    directed : bool, optional, default: ``True``
+        If ``True``, counts the cells of the directed flag complex of the
+        graph. If ``False``, counts the cells of the undirected flag complex
+        obtained by considering all edges as undirected.
+
+    weighted : bool, optional, default: ``False``
+        Whether `adjacency_matrix` represents a weighted graph.
+
+    max_edge_weight : int or float or ``None``, optional, default: ``None``
+        Maximum edge weight to be considered if `weighted` is ``True``. If
+        ``None``, all finite edge weights are considered.
+
+    n_jobs : int or None, optional, default: ``None``
+        The number of threads used to count the cells of the initial complex.
+        ``None`` means 1 while ``-1`` means using all processors. Updates are
+        computed in a single thread.
+
+    Attributes
+    ----------
+    n_vertices : int
+        Number of vertices of the graph, which does not change.
+
+    See also
+    --------
+    flagser_count_unweighted, flagser_count_weighted
+
+    """
+
+    def __init__(self, adjacency_matrix, directed=True, weighted=False,
+                 max_edge_weight=None, n_jobs=None):
+        if weighted:
+            vertices, edges = _extract_weighted_graph(adjacency_matrix,
+                                                      max_edge_weight)
+        else:
+            vertices, edges = _extract_unweighted_graph(adjacency_matrix)
+        self.directed = directed
+        self.n_vertices = len(vertices)
+        row, column = _edge_arrays(edges)[:2]
+        from .modules.flagser_count_pybind import IncrementalCellCounter as \
+            _IncrementalCellCounter
+        self._counter = _IncrementalCellCounter(
+            vertices, row, column, directed, _effective_n_jobs(n_jobs))
+
+    @property
+    def cell_count(self):
+        """Cell counts (number of simplices), per dimension."""
+        return self._counter.get_cell_count()
+
+    @property
+    def euler(self):
+        """Euler characteristic of the flag complex."""
+        return sum((-1) ** dimension * count
+                   for dimension, count in enumerate(self.cell_count))
+
+    def add_edges(self, edges):
+        """Add edges to the graph and update the cell counts. Edges already
+        in the graph and self-loops are ignored.
+
+        Parameters
+        ----------
+        edges : array-like of shape (n_edges, 2)
+            Source and target vertex of each edge. In the undirected case,
+            the order of the two vertices does not matter.
+
+        """
+        self._counter.add_edges(*_edge_columns(edges))
+
+    def remove_edges(self, edges):
+        """Remove edges from the graph and update the cell counts. Edges
+        which are not in the graph are ignored.
+
+        Parameters
+        ----------
+        edges : array-like of shape (n_edges, 2)
+            Source and target vertex of each edge. In the undirected case,
+            the order of the two vertices does not matter.
+
+        """
+        self._counter.remove_edges(*_edge_columns(edges))
+
+
+def _edge_columns(edges):
+    edges = np.asarray(edges)
+    if edges.size == 0:
+        edges = edges.reshape(0, 2).astype(np.int64)
+    if edges.ndim != 2 or edges.shape[1] != 2:
+        raise ValueError("edges must be of shape (n_edges, 2), got an array "
+                         "of shape {}.".format(edges.shape))
+    return np.ascontiguousarray(edges[:, 0]), \
+        np.ascontiguousarray(edges[:, 1])
+
+
+def _check_thresholds(thresholds):
+    thresholds = np.asarray(thresholds, dtype=float)
+    if thresholds.ndim != 1:
+        raise ValueError("thresholds must be one-dimensional, got an array "
+                         "of shape {}.".format(thresholds.shape))
+    return thresholds
+
+
+def _max_edge_weight(thresholds):
+    """Largest edge weight that can matter at any of the thresholds."""
+    if not len(thresholds) or np.isposinf(thresholds.max()):
+        return None
+    return thresholds.max()
+
+
+def _cell_count_thresholds(vertices, edges, thresholds, directed,
+                           min_dimension, max_dimension, n_jobs):
+    """Cell counts per threshold and dimension of the max filtration of a
+    graph, as an ndarray of shape (n_thresholds, n_dimensions)."""
+    # Filtration values are single precision, so that rounding the thresholds
+    # keeps all cells whose filtration value is at most the thresholds
+    thresholds = thresholds.astype(_VALUE_DTYPE)
+    order = np.argsort(thresholds, kind='stable')
+    _max_dimension = -1 if max_dimension == np.inf else max_dimension
+
+    from .modules.flagser_count_pybind import compute_cell_count_thresholds
+    cell_count = compute_cell_count_thresholds(
+        vertices, *_edge_arrays(edges), directed, thresholds[order],
+        min_dimension, _max_dimension, _effective_n_jobs(n_jobs))
+    cell_count = np.array(cell_count, dtype=np.int64).reshape(
+        len(cell_count), len(thresholds))[min_dimension:]
+
+    out = np.empty((len(thresholds), len(cell_count)), dtype=np.int64)
+    out[order] = cell_count.T
+    return out
+
+
+def _participation(vertices, edges, directed, n_jobs):
+    from .modules.flagser_count_pybind import compute_participation
+    vertex_participation, edges, edge_participation = compute_participation(
+        vertices, *_edge_arrays(edges), directed, 0, -1,
+        _effective_n_jobs(n_jobs))
+    # Each cell of dimension d has d + 1 vertices
+    n_vertices_per_cell = np.arange(1, vertex_participation.shape[1] + 1)
+    cell_count = vertex_participation.sum(axis=0) // n_vertices_per_cell
+    return {'cell_count': cell_count.tolist(),
+            'vertex_participation': vertex_participation,
+            'edges': edges,
+            'edge_participation': edge_participation}
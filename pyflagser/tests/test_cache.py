@@ -0,0 +1,74 @@
+"""Testing for the cache of flagser results."""
+
+import pytest
+from numpy.testing import assert_almost_equal
+
+from pyflagser import load_weighted_flag, flagser_unweighted, \
+    flagser_weighted, enable_cache, disable_cache, clear_cache, cache_info
+
+
+@pytest.fixture
+def result_cache():
+    yield
+    disable_cache()
+
+
+def assert_results_equal(res, res_exp):
+    assert res.keys() == res_exp.keys()
+    assert res['betti'] == res_exp['betti']
+    assert res['cell_count'] == res_exp['cell_count']
+    assert res['euler'] == res_exp['euler']
+    if 'dgms' in res_exp:
+        assert len(res['dgms']) == len(res_exp['dgms'])
+        for dgm, dgm_exp in zip(res['dgms'], res_exp['dgms']):
+            assert_almost_equal(dgm, dgm_exp)
+
+
+def test_memory(flag_file_small, result_cache):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    res_exp = flagser_weighted(adjacency_matrix)
+    assert cache_info() is None
+
+    enable_cache(maxsize=2)
+    res = flagser_weighted(adjacency_matrix)
+    assert cache_info()[:5] == (0, 0, 1, 2, 1)
+    assert_results_equal(res, res_exp)
+
+    # Modifying a result does not modify the cached one
+    res['betti'].append(0)
+    res['dgms'][0][:] = -1
+    assert_results_equal(flagser_weighted(adjacency_matrix), res_exp)
+    assert cache_info()[:5] == (1, 0, 1, 2, 1)
+
+    # Different parameters, different results
+    flagser_weighted(adjacency_matrix, directed=False)
+    flagser_unweighted(adjacency_matrix)
+    assert cache_info()[:5] == (1, 0, 3, 2, 2)
+
+    # The least recently used result has been evicted
+    flagser_weighted(adjacency_matrix)
+    assert cache_info()[:5] == (1, 0, 4, 2, 2)
+
+    clear_cache()
+    assert cache_info()[:5] == (0, 0, 0, 2, 0)
+
+
+def test_disk(flag_file_small, result_cache, tmp_path):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    res_exp = flagser_weighted(adjacency_matrix)
+
+    enable_cache(directory=str(tmp_path))
+    flagser_weighted(adjacency_matrix)
+    assert len(list(tmp_path.glob('*.npz'))) == 1
+
+    # A new cache in the same directory finds the result on disk
+    enable_cache(directory=str(tmp_path))
+    res = flagser_weighted(adjacency_matrix)
+    assert cache_info()[:3] == (1, 1, 0)
+    assert_results_equal(res, res_exp)
+
+
+def test_maxsize():
+    with pytest.raises(ValueError):
+        enable_cache(maxsize=0)
+    assert cache_info() is None
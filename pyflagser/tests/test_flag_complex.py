@@ -0,0 +1,82 @@
+"""Testing for flag complexes built once and queried many times."""
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from pyflagser import load_unweighted_flag, load_weighted_flag, \
+    flagser_unweighted, flagser_weighted, flagser_count_weighted, \
+    FlagComplex
+
+
+def _assert_dgms_equal(dgms_res, dgms_exp):
+    assert len(dgms_res) == len(dgms_exp)
+    for dgm_res, dgm_exp in zip(dgms_res, dgms_exp):
+        assert_almost_equal(np.sort(dgm_res, axis=0),
+                            np.sort(dgm_exp, axis=0))
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_homology(flag_file_small, directed):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    flag_complex = FlagComplex(adjacency_matrix, directed=directed)
+    for coeff in [2, 3]:
+        for min_dimension, max_dimension in [(0, np.inf), (1, 2), (0, 1),
+                                             (2, np.inf)]:
+            out_exp = flagser_weighted(adjacency_matrix,
+                                       min_dimension=min_dimension,
+                                       max_dimension=max_dimension,
+                                       directed=directed, coeff=coeff)
+            out = flag_complex.homology(coeff, min_dimension, max_dimension)
+            assert out['betti'] == out_exp['betti']
+            assert out['cell_count'] == out_exp['cell_count']
+            assert out['euler'] == out_exp['euler']
+            _assert_dgms_equal(out['dgms'], out_exp['dgms'])
+
+
+def test_unweighted(flag_file_small):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='coo')
+    flag_complex = FlagComplex(adjacency_matrix, weighted=False)
+    out = flag_complex.homology()
+    out_exp = flagser_unweighted(adjacency_matrix)
+    assert 'dgms' not in out
+    assert out == out_exp
+    with pytest.raises(ValueError):
+        flag_complex.diagram(0)
+
+
+def test_diagram(flag_file_small):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    flag_complex = FlagComplex(adjacency_matrix)
+    out_exp = flagser_weighted(adjacency_matrix)
+    for dimension, dgm_exp in enumerate(out_exp['dgms']):
+        _assert_dgms_equal([flag_complex.diagram(dimension)], [dgm_exp])
+    assert flag_complex.diagram(len(out_exp['dgms'])).shape == (0, 2)
+
+
+@pytest.mark.parametrize('cache_cells', [True, False])
+def test_cell_count(flag_file_small, cache_cells):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    flag_complex = FlagComplex(adjacency_matrix, cache_cells=cache_cells)
+    cell_count_exp = flagser_count_weighted(adjacency_matrix)
+    assert flag_complex.cell_count() == cell_count_exp
+    out = flag_complex.simplices()
+    assert [len(simplices) for simplices in out['simplices']] == \
+        cell_count_exp
+    assert (flag_complex.memory_usage()['cells'] > 0) == cache_cells
+
+
+def test_free(flag_file_small):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    with FlagComplex(adjacency_matrix, cache_cells=True) as flag_complex:
+        out = flag_complex.homology()
+        flag_complex.simplices()
+        memory_usage = flag_complex.memory_usage()
+        assert memory_usage['total'] == memory_usage['graph'] + \
+            memory_usage['cells'] + memory_usage['results']
+
+        flag_complex.free()
+        memory_usage = flag_complex.memory_usage()
+        assert memory_usage['cells'] == memory_usage['results'] == 0
+        # The complex is built again when needed
+        assert flag_complex.homology()['betti'] == out['betti']
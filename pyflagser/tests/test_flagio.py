@@ -7,7 +7,9 @@ import numpy as np
 from numpy.testing import assert_almost_equal
 
 from pyflagser import load_unweighted_flag, load_weighted_flag, \
-    save_weighted_flag, save_unweighted_flag
+    save_weighted_flag, save_unweighted_flag, load_unweighted_flagb, \
+    load_weighted_flagb, save_unweighted_flagb, save_weighted_flagb
+from pyflagser import _utils
 from pyflagser._utils import _extract_unweighted_graph, \
     _extract_weighted_graph
 
@@ -18,6 +20,8 @@ def test_unweighted_fmt(flag_file_small):
     adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='dense')
     vertices_dense, edges_dense = _extract_unweighted_graph(adjacency_matrix)
     assert_almost_equal(vertices_coo, vertices_dense)
+    # Unweighted edges are passed without weights
+    assert len(edges_coo) == len(edges_dense) == 2
     assert_almost_equal(edges_coo, edges_dense)
 
 
@@ -46,3 +50,76 @@ def test_unweighted(flag_file_small):
     os.remove(fname_temp)
     assert_almost_equal(vertices_a, vertices_a)
     assert_almost_equal(edges_b, edges_b)
+
+
+@pytest.mark.parametrize('block_size', [1, 7])
+@pytest.mark.parametrize('max_edge_length', [0.1, np.inf])
+def test_weighted_dense_blocks(flag_file_small, max_edge_length, block_size,
+                               monkeypatch):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    vertices_coo, edges_coo = _extract_weighted_graph(adjacency_matrix,
+                                                      max_edge_length)
+    monkeypatch.setattr(_utils, '_BLOCK_SIZE', block_size)
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='dense')
+    vertices_dense, edges_dense = _extract_weighted_graph(adjacency_matrix,
+                                                          max_edge_length)
+    assert_almost_equal(vertices_coo, vertices_dense)
+    assert_almost_equal(_sorted_edges(edges_coo), _sorted_edges(edges_dense))
+
+
+def _sorted_edges(edges):
+    order = np.lexsort((edges[1], edges[0]))
+    return [e[order] for e in edges]
+
+
+@pytest.mark.parametrize('max_edge_length', [0.1, np.inf])
+def test_weighted_flagb(flag_file_small, max_edge_length, tmp_path):
+    adjacency_matrix = load_weighted_flag(flag_file_small)
+    vertices_a, edges_a = _extract_weighted_graph(adjacency_matrix,
+                                                  max_edge_length)
+    fname_temp = tmp_path / 'graph.flagb'
+    save_weighted_flagb(fname_temp, adjacency_matrix)
+    adjacency_matrix = load_weighted_flagb(fname_temp)
+    vertices_b, edges_b = _extract_weighted_graph(adjacency_matrix,
+                                                  max_edge_length)
+    assert_almost_equal(vertices_a, vertices_b)
+    assert_almost_equal(_sorted_edges(edges_a), _sorted_edges(edges_b))
+
+
+def test_unweighted_flagb(flag_file_small, tmp_path):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='dense')
+    fname_temp = tmp_path / 'graph.flagb'
+    save_unweighted_flagb(fname_temp, adjacency_matrix)
+    assert_almost_equal(load_unweighted_flagb(fname_temp, fmt='dense'),
+                        adjacency_matrix)
+
+
+def test_flagb_wrong_file(flag_file_small, tmp_path):
+    with pytest.raises(ValueError, match="not a .flagb file"):
+        load_weighted_flagb(flag_file_small)
+
+    fname_temp = tmp_path / 'graph.flagb'
+    save_unweighted_flagb(fname_temp, load_unweighted_flag(flag_file_small))
+    with pytest.raises(ValueError, match="unweighted graph"):
+        load_weighted_flagb(fname_temp)
+
+
+def test_weighted_duplicate_edges(tmp_path):
+    """The last occurrence of an edge determines its weight, and vertex
+    weights and zero-weighted edges are stored explicitly."""
+    fname = tmp_path / 'duplicates.flag'
+    with open(fname, 'w') as f:
+        f.write('dim 0\n0 0.5 0\ndim 1\n0 1 1.5\n1 0 2\n0 1 0.5\n1 2 0\n')
+
+    adjacency_matrix = load_weighted_flag(fname)
+    assert adjacency_matrix.nnz == 6
+    assert_almost_equal(adjacency_matrix.toarray(),
+                        np.array([[0., 0.5, 0.],
+                                  [2., 0.5, 0.],
+                                  [0., 0., 0.]]))
+
+    adjacency_matrix = load_weighted_flag(fname, fmt='dense')
+    assert_almost_equal(adjacency_matrix,
+                        np.array([[0., 0.5, np.inf],
+                                  [2., 0.5, 0.],
+                                  [np.inf, np.inf, 0.]]))
@@ -1,13 +1,18 @@
 """Testing for the python bindings of the C++ flagser library."""
 
+import _thread
 import os
+import threading
+import time
 import numpy as np
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from multiprocessing import Pool
 from numpy.testing import assert_almost_equal
 
 from pyflagser import load_unweighted_flag, load_weighted_flag, \
-    flagser_unweighted, flagser_weighted
+    flagser_unweighted, flagser_weighted, flagser_weighted_iter, \
+    flagser_weighted_sweep
 
 
 betti = {
@@ -240,6 +245,24 @@ def test_concurrent(flag_file_small):
     pool.join()
 
 
+def test_concurrent_threads(flag_file_small):
+    """Many threads calling the bindings at the same time must give the same
+    results as serial calls."""
+    nb_workers = 8
+    nb_calls = 64
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    res_exp = flagser_weighted(adjacency_matrix)
+
+    with ThreadPoolExecutor(max_workers=nb_workers) as executor:
+        res_list = list(executor.map(flagser_weighted,
+                                     nb_calls * [adjacency_matrix]))
+
+    for res in res_list:
+        assert res['betti'] == res_exp['betti']
+        assert res['cell_count'] == res_exp['cell_count']
+        assert are_matrices_equal(res['dgms'], res_exp['dgms'])
+
+
 @pytest.mark.timeout(30)
 def test_higher_coefficients():
     """Regression test for issue #45"""
@@ -253,3 +276,356 @@ def test_huge_graphs():
     from scipy.sparse import coo_matrix
     x = coo_matrix(([1], ([0], [1])), shape=(2**16, 2**16))
     flagser_unweighted(x)
+
+
+def test_weighted_iter(flag_file_small):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    res = flagser_weighted(adjacency_matrix, directed=False)
+    res_iter = list(flagser_weighted_iter(adjacency_matrix, directed=False))
+    assert [dimension for dimension, _ in res_iter] == \
+        list(range(len(res_iter)))
+    assert are_matrices_equal([dgm for _, dgm in res_iter], res['dgms'])
+    for dgm in res['dgms']:
+        assert isinstance(dgm, np.ndarray) and dgm.shape[1:] == (2,)
+
+
+def test_weighted_iter_close():
+    # Same graph as in test_progress_interrupt, the computation of the next
+    # dimensions is stopped when the iteration is
+    rng = np.random.default_rng(0)
+    adjacency_matrix = rng.random((300, 300))
+    adjacency_matrix[rng.random((300, 300)) > 0.2] = np.inf
+    np.fill_diagonal(adjacency_matrix, 0)
+
+    start = time.perf_counter()
+    iterator = flagser_weighted_iter(adjacency_matrix, max_dimension=3)
+    dimension, dgm = next(iterator)
+    iterator.close()
+    assert time.perf_counter() - start < 5
+    assert dimension == 0 and dgm.shape[1:] == (2,)
+
+
+def test_max_cells_per_dimension(flag_file_small):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='coo')
+    res = flagser_unweighted(adjacency_matrix)
+    max_cells = max(res['cell_count'])
+    res_budget = flagser_unweighted(adjacency_matrix,
+                                    max_cells_per_dimension=max_cells)
+    assert not res_budget['truncated']
+    assert res_budget['betti'] == res['betti']
+    assert res_budget['cell_count'] == res['cell_count']
+    assert res_budget['euler'] == res['euler']
+
+    res_budget = flagser_unweighted(adjacency_matrix,
+                                    max_cells_per_dimension=max_cells - 1)
+    assert res_budget['truncated']
+    n_dimensions = len(res_budget['betti'])
+    assert n_dimensions < len(res['betti'])
+    assert res_budget['betti'] == res['betti'][:n_dimensions]
+
+
+def test_time_budget(flag_file_small):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    res = flagser_weighted(adjacency_matrix, time_budget=0.)
+    assert res['truncated']
+    assert res['dgms'] == res['betti'] == res['cell_count'] == []
+    assert res['euler'] == 0
+
+    res = flagser_weighted(adjacency_matrix, time_budget=np.inf,
+                           memory_budget=np.inf)
+    assert not res['truncated']
+    assert are_matrices_equal(res['dgms'],
+                              flagser_weighted(adjacency_matrix)['dgms'])
+
+
+def test_time_budget_stops_computation():
+    # Same graph as in test_progress_interrupt, the budget stops the single
+    # computation while it is running
+    rng = np.random.default_rng(0)
+    adjacency_matrix = rng.random((300, 300))
+    adjacency_matrix[rng.random((300, 300)) > 0.2] = np.inf
+    np.fill_diagonal(adjacency_matrix, 0)
+
+    start = time.perf_counter()
+    res = flagser_weighted(adjacency_matrix, max_dimension=3,
+                           time_budget=0.5)
+    assert time.perf_counter() - start < 5
+    assert res['truncated']
+    assert len(res['dgms']) == len(res['betti']) == len(res['cell_count'])
+    assert len(res['betti']) < 4
+
+
+def test_progress_callback(flag_file_small):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    calls = []
+    res = flagser_weighted(adjacency_matrix,
+                           progress_callback=lambda *args: calls.append(args))
+    dimensions = [dimension for dimension, _, _ in calls]
+    assert dimensions == sorted(dimensions)
+    assert dimensions[0] == 0
+    assert set(dimensions) <= set(range(len(res['betti'])))
+    for dimension, n_cells, n_columns in calls:
+        assert n_cells <= res['cell_count'][dimension]
+        assert n_columns <= n_cells
+
+
+def test_progress_callback_cancel(flag_file_small):
+    class Cancelled(Exception):
+        pass
+
+    def cancel(dimension, n_cells, n_columns):
+        raise Cancelled
+
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='coo')
+    with pytest.raises(Cancelled):
+        flagser_unweighted(adjacency_matrix, progress_callback=cancel)
+    # The module is still usable after a cancelled computation
+    flagser_unweighted(adjacency_matrix)
+
+
+def test_progress_interrupt():
+    # Weighted Erdos-Renyi graph whose homology takes much longer to compute
+    # than the time after which it is interrupted
+    rng = np.random.default_rng(0)
+    adjacency_matrix = rng.random((300, 300))
+    adjacency_matrix[rng.random((300, 300)) > 0.2] = np.inf
+    np.fill_diagonal(adjacency_matrix, 0)
+
+    def interrupt(dimension, n_cells, n_columns):
+        if time.perf_counter() - start > 0.5:
+            _thread.interrupt_main()
+
+    start = time.perf_counter()
+    with pytest.raises(KeyboardInterrupt):
+        flagser_weighted(adjacency_matrix, max_dimension=3,
+                         progress_callback=interrupt)
+    assert time.perf_counter() - start < 5
+
+
+@pytest.mark.parametrize('index_dtype', [np.int32, np.uint32, np.int64])
+@pytest.mark.parametrize('weight_dtype', [np.float32, np.float64])
+def test_dtypes(flag_file_small, index_dtype, weight_dtype):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    res_exp = flagser_weighted(adjacency_matrix)
+    adjacency_matrix.row = adjacency_matrix.row.astype(index_dtype)
+    adjacency_matrix.col = adjacency_matrix.col.astype(index_dtype)
+    adjacency_matrix.data = adjacency_matrix.data.astype(weight_dtype)
+    res = flagser_weighted(adjacency_matrix, dtype=weight_dtype)
+    assert res['betti'] == res_exp['betti']
+    for dgm, dgm_exp in zip(res['dgms'], res_exp['dgms']):
+        assert dgm.dtype == weight_dtype
+        assert_almost_equal(dgm, dgm_exp)
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_weighted_sweep(flag_file_small, directed):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    # At least the largest vertex weight, see test_thresholds in
+    # test_flagser_count.py
+    thresholds = np.quantile(adjacency_matrix.data, [0.5, 1., 0.75])
+    thresholds = np.maximum(thresholds, adjacency_matrix.diagonal().max())
+    res = flagser_weighted_sweep(adjacency_matrix, thresholds,
+                                 directed=directed)
+    for i, threshold in enumerate(thresholds):
+        res_exp = flagser_weighted(adjacency_matrix,
+                                   max_edge_weight=threshold,
+                                   directed=directed)
+        n_dimensions = len(res_exp['betti'])
+        assert list(res['betti'][i, :n_dimensions]) == res_exp['betti']
+        assert list(res['cell_count'][i, :n_dimensions]) == \
+            res_exp['cell_count']
+        assert res['euler'][i] == res_exp['euler']
+
+
+def test_weighted_sweep_approximation():
+    # Betti numbers would not match the exact Euler characteristics
+    with pytest.raises(ValueError):
+        flagser_weighted_sweep(np.zeros((2, 2)), [0.], approximation=10)
+
+
+def test_summaries(flag_file_small):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    grid = np.linspace(0., adjacency_matrix.data.max(), 10)
+    res = flagser_weighted(adjacency_matrix,
+                           summaries={'betti_curve': grid,
+                                      'total_persistence': 2,
+                                      'persistence_entropy': True})
+    summaries = res['summaries']
+    for dimension, dgm in enumerate(res['dgms']):
+        betti_curve = [np.sum((dgm[:, 0] <= t) & (dgm[:, 1] > t))
+                       for t in grid]
+        assert_almost_equal(summaries['betti_curve'][dimension], betti_curve)
+        lifetimes = dgm[:, 1] - dgm[:, 0]
+        lifetimes = lifetimes[np.isfinite(lifetimes)]
+        assert_almost_equal(summaries['total_persistence'][dimension],
+                            np.sum(lifetimes ** 2))
+        probabilities = lifetimes[lifetimes > 0] / np.sum(lifetimes)
+        assert_almost_equal(summaries['persistence_entropy'][dimension],
+                            -np.sum(probabilities * np.log(probabilities)))
+
+
+def test_summaries_unknown():
+    with pytest.raises(ValueError):
+        flagser_weighted(np.zeros((2, 2)), summaries={'landscape': True})
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_split_components(flag_file_small, directed, monkeypatch):
+    from scipy.sparse import block_diag
+    from pyflagser import _components
+    # Do not group the components, so that each is computed separately
+    monkeypatch.setattr(_components, '_MIN_CHUNK_SIZE', 1)
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    adjacency_matrix = block_diag(3 * [adjacency_matrix], format='coo')
+
+    res_exp = flagser_unweighted(adjacency_matrix, directed=directed)
+    res = flagser_unweighted(adjacency_matrix, directed=directed,
+                             split_components=True, n_jobs=2)
+    assert res == res_exp
+
+    res_exp = flagser_weighted(adjacency_matrix, directed=directed)
+    res = flagser_weighted(adjacency_matrix, directed=directed,
+                           split_components=True, n_jobs=2)
+    assert res['betti'] == res_exp['betti']
+    assert res['cell_count'] == res_exp['cell_count']
+    assert res['euler'] == res_exp['euler']
+    assert len(res['dgms']) == len(res_exp['dgms'])
+    for dgm, dgm_exp in zip(res['dgms'], res_exp['dgms']):
+        # Pairs are in a different order
+        assert_almost_equal(dgm[np.lexsort(dgm.T)],
+                            dgm_exp[np.lexsort(dgm_exp.T)])
+
+
+def test_split_components_budget():
+    with pytest.raises(ValueError):
+        flagser_unweighted(np.zeros((2, 2)), split_components=True,
+                           time_budget=1.)
+    with pytest.raises(ValueError):
+        flagser_unweighted(np.zeros((2, 2)), split_components=True,
+                           progress_callback=print)
+
+
+def test_split_components_interrupt():
+    # Two copies of the graph of test_progress_interrupt, whose homology is
+    # computed in worker threads, which do not receive signals
+    rng = np.random.default_rng(0)
+    adjacency_matrix = np.full((600, 600), np.inf)
+    for block in [slice(0, 300), slice(300, 600)]:
+        weights = rng.random((300, 300))
+        weights[rng.random((300, 300)) > 0.2] = np.inf
+        adjacency_matrix[block, block] = weights
+    np.fill_diagonal(adjacency_matrix, 0)
+
+    timer = threading.Timer(0.5, _thread.interrupt_main)
+    start = time.perf_counter()
+    timer.start()
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            flagser_weighted(adjacency_matrix, max_dimension=3,
+                             split_components=True, n_jobs=2)
+    finally:
+        timer.cancel()
+    assert time.perf_counter() - start < 5
+
+
+def _with_pendant_tree(adjacency_matrix, n_leaves=5):
+    """Add to a weighted graph isolated vertices and a path hanging from its
+    first vertex, born after the rest of the graph."""
+    from scipy.sparse import coo_matrix
+    n_vertices = adjacency_matrix.shape[0]
+    value = max(adjacency_matrix.data.max(), 0.)
+    path = np.arange(n_vertices, n_vertices + n_leaves)
+    row = np.concatenate([adjacency_matrix.row, path, [0], path[:-1]])
+    column = np.concatenate([adjacency_matrix.col, path, path[:1], path[1:]])
+    data = np.concatenate([adjacency_matrix.data,
+                           value + 1. + np.arange(n_leaves),
+                           [value + 2.], value + 3. + np.arange(n_leaves - 1)])
+    n_vertices += 2 * n_leaves
+    return coo_matrix((data, (row, column)), shape=(n_vertices, n_vertices))
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_reduce_graph(flag_file_small, directed):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    adjacency_matrix = _with_pendant_tree(adjacency_matrix)
+
+    res_exp = flagser_unweighted(adjacency_matrix, directed=directed)
+    res = flagser_unweighted(adjacency_matrix, directed=directed,
+                             reduce_graph=True)
+    assert res.pop('reduction')['n_vertices'] >= 10
+    assert res == res_exp
+
+    res_exp = flagser_weighted(adjacency_matrix, directed=directed)
+    res = flagser_weighted(adjacency_matrix, directed=directed,
+                           reduce_graph=True)
+    assert res['reduction']['n_vertices'] >= 10
+    assert 0. < res['reduction']['ratio'] < 1.
+    assert res['betti'] == res_exp['betti']
+    assert res['cell_count'] == res_exp['cell_count']
+    assert res['euler'] == res_exp['euler']
+    assert len(res['dgms']) == len(res_exp['dgms'])
+    for dgm, dgm_exp in zip(res['dgms'], res_exp['dgms']):
+        # Pairs are in a different order
+        assert_almost_equal(dgm[np.lexsort(dgm.T)],
+                            dgm_exp[np.lexsort(dgm_exp.T)])
+
+
+def test_reduce_graph_filtration():
+    with pytest.raises(ValueError):
+        flagser_weighted(np.zeros((2, 2)), filtration='zero',
+                         reduce_graph=True)
+
+
+@pytest.mark.parametrize('in_memory', [True, False])
+def test_cache_dir(flag_file_small, tmp_path, in_memory):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    cache_dir = tmp_path / 'cache'
+
+    res_exp = flagser_weighted(adjacency_matrix)
+    for _ in range(2):
+        res = flagser_weighted(adjacency_matrix, cache_dir=cache_dir,
+                               in_memory=in_memory)
+        assert res['betti'] == res_exp['betti']
+        assert res['cell_count'] == res_exp['cell_count']
+        for dgm, dgm_exp in zip(res['dgms'], res_exp['dgms']):
+            assert_almost_equal(dgm[np.lexsort(dgm.T)],
+                                dgm_exp[np.lexsort(dgm_exp.T)])
+        # Files of each computation are removed once it is done
+        assert not list(cache_dir.iterdir())
+
+    res_exp = flagser_unweighted(adjacency_matrix)
+    res = flagser_unweighted(adjacency_matrix, cache_dir=cache_dir,
+                             in_memory=in_memory, split_components=True,
+                             n_jobs=2)
+    assert res == res_exp
+
+
+@pytest.mark.parametrize('fmt', ['csr', 'csc'])
+@pytest.mark.parametrize('index_dtype', [np.int32, np.int64])
+def test_compressed(flag_file_small, fmt, index_dtype):
+    def to_format(adjacency_matrix):
+        compressed = adjacency_matrix.asformat(fmt)
+        compressed.indptr = compressed.indptr.astype(index_dtype)
+        compressed.indices = compressed.indices.astype(index_dtype)
+        return compressed
+
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    off_diagonal = np.flatnonzero(adjacency_matrix.row != adjacency_matrix.col)
+    # Infinite weights are skipped as in other formats
+    adjacency_matrix.data[off_diagonal[::3]] = np.inf
+    compressed = to_format(adjacency_matrix)
+    for max_edge_weight in [None, np.median(adjacency_matrix.data)]:
+        res_exp = flagser_weighted(adjacency_matrix,
+                                   max_edge_weight=max_edge_weight)
+        res = flagser_weighted(compressed, max_edge_weight=max_edge_weight)
+        assert res['betti'] == res_exp['betti']
+        assert res['cell_count'] == res_exp['cell_count']
+        for dgm, dgm_exp in zip(res['dgms'], res_exp['dgms']):
+            assert_almost_equal(dgm[np.lexsort(dgm.T)],
+                                dgm_exp[np.lexsort(dgm_exp.T)])
+
+    # So are explicit zeros of unweighted graphs
+    adjacency_matrix.data[off_diagonal[1::3]] = 0.
+    compressed = to_format(adjacency_matrix)
+    assert flagser_unweighted(compressed, coeff=3) == \
+        flagser_unweighted(adjacency_matrix, coeff=3)
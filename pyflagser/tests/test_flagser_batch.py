@@ -0,0 +1,47 @@
+"""Testing for the batch API of the python bindings of the C++ flagser
+library."""
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from pyflagser import load_unweighted_flag, load_weighted_flag, \
+    flagser_unweighted, flagser_weighted, flagser_unweighted_batch, \
+    flagser_weighted_batch
+
+
+@pytest.fixture
+def random_graphs():
+    rng = np.random.default_rng(42)
+    adjacency_matrices = []
+    for n_vertices in rng.integers(1, 20, size=20):
+        adjacency_matrix = rng.random((n_vertices, n_vertices))
+        adjacency_matrix[adjacency_matrix > 0.6] = np.inf
+        adjacency_matrices.append(adjacency_matrix)
+    return adjacency_matrices
+
+
+@pytest.mark.parametrize('n_jobs', [None, 2])
+@pytest.mark.parametrize('chunksize', [None, 3])
+def test_weighted_batch(random_graphs, n_jobs, chunksize):
+    res_exp = [flagser_weighted(adjacency_matrix, max_dimension=2)
+               for adjacency_matrix in random_graphs]
+    res = flagser_weighted_batch(random_graphs, max_dimension=2,
+                                 n_jobs=n_jobs, chunksize=chunksize)
+    assert len(res) == len(res_exp)
+    for r, r_exp in zip(res, res_exp):
+        assert r['betti'] == r_exp['betti']
+        assert r['cell_count'] == r_exp['cell_count']
+        assert r['euler'] == r_exp['euler']
+        for dgm, dgm_exp in zip(r['dgms'], r_exp['dgms']):
+            assert_almost_equal(dgm, dgm_exp)
+
+
+def test_unweighted_batch(flag_file_small):
+    adjacency_matrices = [load_unweighted_flag(flag_file_small),
+                          load_weighted_flag(flag_file_small, fmt='coo')]
+    res_exp = [flagser_unweighted(adjacency_matrix, directed=False)
+               for adjacency_matrix in adjacency_matrices]
+    res = flagser_unweighted_batch(adjacency_matrices, directed=False,
+                                   n_jobs=2)
+    assert res == res_exp
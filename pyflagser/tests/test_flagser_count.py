@@ -2,10 +2,12 @@
 
 import os
 
+import numpy as np
+import pytest
 from numpy.testing import assert_almost_equal
 
 from pyflagser import load_unweighted_flag, load_weighted_flag, \
-    flagser_count_unweighted, flagser_count_weighted
+    flagser_count_unweighted, flagser_count_weighted, IncrementalCellCounter
 
 
 cell_count = {
@@ -42,3 +44,106 @@ def test_weighted(flag_file):
     cell_count_exp = cell_count[os.path.split(flag_file)[1]]
     cell_count_res = flagser_count_weighted(adjacency_matrix)
     assert_almost_equal(cell_count_res, cell_count_exp)
+
+
+@pytest.mark.parametrize('n_jobs', [2, -1])
+def test_n_jobs(flag_file_small, n_jobs):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='coo')
+    cell_count_exp = cell_count[os.path.split(flag_file_small)[1]]
+    cell_count_res = flagser_count_unweighted(adjacency_matrix, n_jobs=n_jobs)
+    assert_almost_equal(cell_count_res, cell_count_exp)
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_thresholds(flag_file_small, directed):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='coo')
+    # At least the largest vertex weight, so that all vertices are counted
+    # at all thresholds as with max_edge_weight
+    thresholds = np.quantile(adjacency_matrix.data, [1., 0.75, 0.5, 0.9])
+    thresholds = np.maximum(thresholds, adjacency_matrix.diagonal().max())
+    thresholds = np.append(thresholds, np.inf)
+    cell_count_res = flagser_count_weighted(adjacency_matrix,
+                                            directed=directed,
+                                            thresholds=thresholds, n_jobs=2)
+    assert cell_count_res.shape[0] == len(thresholds)
+    for threshold, counts in zip(thresholds, cell_count_res):
+        cell_count_exp = flagser_count_weighted(
+            adjacency_matrix, max_edge_weight=threshold, directed=directed)
+        assert not counts[len(cell_count_exp):].any()
+        assert_almost_equal(counts[:len(cell_count_exp)], cell_count_exp)
+
+
+def test_thresholds_max_edge_weight():
+    with pytest.raises(ValueError):
+        flagser_count_weighted(np.zeros((2, 2)), max_edge_weight=1.,
+                               thresholds=[1.])
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_participation(flag_file_small, directed):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='coo')
+    out = flagser_count_unweighted(adjacency_matrix, directed=directed,
+                                   n_jobs=2, participation=True)
+    cell_count_exp = flagser_count_unweighted(adjacency_matrix,
+                                              directed=directed)
+    assert out['cell_count'] == cell_count_exp
+
+    n_dimensions = len(cell_count_exp)
+    assert out['vertex_participation'].shape == \
+        (adjacency_matrix.shape[0], n_dimensions)
+    assert out['edge_participation'].shape == \
+        (len(out['edges']), n_dimensions)
+    # Each cell of dimension d has d + 1 vertices and d (d + 1) / 2 edges
+    dimensions = np.arange(n_dimensions)
+    assert_almost_equal(out['vertex_participation'].sum(axis=0),
+                        np.multiply(cell_count_exp, dimensions + 1))
+    assert_almost_equal(out['edge_participation'].sum(axis=0),
+                        np.multiply(cell_count_exp,
+                                    dimensions * (dimensions + 1) // 2))
+    assert (out['edge_participation'][:, 1] == 1).all()
+
+
+def test_participation_thresholds():
+    with pytest.raises(ValueError):
+        flagser_count_weighted(np.zeros((2, 2)), thresholds=[1.],
+                               participation=True)
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_incremental(flag_file_small, directed):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='dense')
+    counter = IncrementalCellCounter(adjacency_matrix, directed=directed)
+    assert counter.cell_count == \
+        flagser_count_unweighted(adjacency_matrix, directed=directed)
+
+    n_vertices = adjacency_matrix.shape[0]
+    rng = np.random.default_rng(0)
+    for _ in range(10):
+        edges = rng.integers(n_vertices, size=(3, 2))
+        if rng.random() < 0.5:
+            counter.add_edges(edges)
+            adjacency_matrix[edges[:, 0], edges[:, 1]] = True
+        else:
+            counter.remove_edges(edges)
+            adjacency_matrix[edges[:, 0], edges[:, 1]] = False
+            if not directed:
+                adjacency_matrix[edges[:, 1], edges[:, 0]] = False
+        cell_count_exp = flagser_count_unweighted(adjacency_matrix,
+                                                  directed=directed)
+        assert counter.cell_count == cell_count_exp
+        assert counter.euler == sum((-1) ** dimension * count for
+                                    dimension, count in
+                                    enumerate(cell_count_exp))
+
+
+def test_incremental_weighted():
+    adjacency_matrix = np.array([[0., 1., 3.],
+                                 [np.inf, 0., 1.],
+                                 [np.inf, np.inf, 0.]])
+    counter = IncrementalCellCounter(adjacency_matrix, weighted=True,
+                                     max_edge_weight=2.)
+    assert counter.cell_count == [3, 2]
+    counter.add_edges([[0, 2]])
+    assert counter.cell_count == [3, 3, 1]
+    with pytest.raises(ValueError):
+        counter.add_edges([0, 2])
@@ -0,0 +1,74 @@
+"""Testing for the enumeration of the cells of flag complexes."""
+
+from itertools import combinations
+
+import numpy as np
+import pytest
+from numpy.testing import assert_almost_equal
+
+from pyflagser import load_unweighted_flag, load_weighted_flag, \
+    flagser_count_unweighted, flagser_simplices, flagser_simplices_iter
+
+
+def _sorted_rows(simplices):
+    return sorted(map(tuple, simplices))
+
+
+@pytest.mark.parametrize('directed', [True, False])
+def test_unweighted(flag_file_small, directed):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='dense')
+    out = flagser_simplices(adjacency_matrix, directed=directed)
+    assert 'filtrations' not in out
+    cell_count_exp = flagser_count_unweighted(adjacency_matrix,
+                                              directed=directed)
+    assert [len(simplices) for simplices in out['simplices']] == \
+        cell_count_exp
+
+    edges = adjacency_matrix.astype(bool)
+    if not directed:
+        edges = np.logical_or(edges, edges.T)
+    for dimension, simplices in enumerate(out['simplices']):
+        assert simplices.shape == (len(simplices), dimension + 1)
+        assert simplices.dtype == np.uint32
+        # All pairs of vertices of a cell are linked, in order if directed
+        for i, j in combinations(range(dimension + 1), 2):
+            assert edges[simplices[:, i], simplices[:, j]].all()
+
+
+def test_weighted(flag_file_small):
+    adjacency_matrix = load_weighted_flag(flag_file_small, fmt='dense')
+    out = flagser_simplices(adjacency_matrix, min_dimension=1,
+                            max_dimension=2, weighted=True)
+    assert len(out['simplices']) == len(out['filtrations']) <= 2
+    for dimension, (simplices, filtrations) in enumerate(
+            zip(out['simplices'], out['filtrations']), start=1):
+        assert simplices.shape[1] == dimension + 1
+        filtrations_exp = adjacency_matrix[simplices, simplices].max(axis=1)
+        for i, j in combinations(range(dimension + 1), 2):
+            filtrations_exp = np.maximum(
+                filtrations_exp,
+                adjacency_matrix[simplices[:, i], simplices[:, j]])
+        assert_almost_equal(filtrations, filtrations_exp, decimal=5)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 10, 10**9])
+def test_iter(flag_file_small, chunk_size):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='coo')
+    out = flagser_simplices(adjacency_matrix)
+    chunks = list(flagser_simplices_iter(adjacency_matrix, chunk_size,
+                                         n_jobs=2))
+    assert len(chunks) >= 1
+    for dimension, simplices in enumerate(out['simplices']):
+        simplices_res = np.concatenate([chunk['simplices'][dimension]
+                                        for chunk in chunks])
+        assert _sorted_rows(simplices_res) == _sorted_rows(simplices)
+
+
+@pytest.mark.parametrize('n_jobs', [2, -1])
+def test_n_jobs(flag_file_small, n_jobs):
+    adjacency_matrix = load_unweighted_flag(flag_file_small, fmt='coo')
+    out = flagser_simplices(adjacency_matrix)
+    out_res = flagser_simplices(adjacency_matrix, n_jobs=n_jobs)
+    for simplices_res, simplices in zip(out_res['simplices'],
+                                        out['simplices']):
+        assert _sorted_rows(simplices_res) == _sorted_rows(simplices)
@@ -0,0 +1,61 @@
+"""Testing that importing pyflagser loads its dependencies lazily."""
+
+import subprocess
+import sys
+
+import pytest
+
+
+def _run(code):
+    return subprocess.run([sys.executable, '-c', code],
+                          capture_output=True, text=True, check=True)
+
+
+def _loaded_modules(code):
+    code += "\nimport sys\nprint(' '.join(sys.modules))"
+    return _run(code).stdout.split()
+
+
+def test_lazy_import():
+    modules = _loaded_modules("import pyflagser")
+    assert not [module for module in modules
+                if module.split('.')[0] in ['numpy', 'scipy']
+                or module.startswith('pyflagser.modules')]
+
+
+def test_public_names():
+    import pyflagser
+    from pyflagser import flagser_simplices
+    for name in pyflagser.__all__:
+        assert name in dir(pyflagser)
+        getattr(pyflagser, name)
+    assert pyflagser.flagser_simplices is flagser_simplices
+    assert callable(flagser_simplices)
+    with pytest.raises(AttributeError):
+        pyflagser.unknown_name
+
+
+def test_public_names_after_submodule_import():
+    # Submodules importing each other must not shadow the public names
+    code = ("import pyflagser.flag_complex\n"
+            "from pyflagser import flagser_simplices\n"
+            "import pyflagser\n"
+            "assert callable(flagser_simplices)\n"
+            "assert callable(pyflagser.flagser_simplices)")
+    _run(code)
+
+
+@pytest.mark.parametrize('call', [
+    'flagser_unweighted(np.ones((3, 3)), coeff={})',
+    'flagser_weighted(np.ones((3, 3)), coeff={})',
+    'FlagComplex(np.ones((3, 3))).homology(coeff={})'])
+@pytest.mark.parametrize('coeff', [2, 3])
+def test_coefficient_module(call, coeff):
+    modules = _loaded_modules(
+        "import numpy as np\n"
+        "from pyflagser import {}\n".format(call.split('(')[0]) +
+        call.format(coeff))
+    assert 'scipy' not in modules
+    assert ('pyflagser.modules.flagser_pybind' in modules) == (coeff == 2)
+    assert ('pyflagser.modules.flagser_coeff_pybind' in modules) == \
+        (coeff != 2)
@@ -110,6 +110,11 @@ class CMakeBuild(build_ext):
             self.get_ext_fullpath(ext.name)), 'pyflagser', 'modules'))
         cmake_args = ['-DCMAKE_LIBRARY_OUTPUT_DIRECTORY=' + extdir,
                       '-DPYTHON_EXECUTABLE=' + sys.executable]
+        # Number of threads with which flagser builds the complexes when
+        # computing homology, fixed at compile time
+        if 'FLAGSER_PARALLEL_THREADS' in os.environ:
+            cmake_args += ['-DFLAGSER_PARALLEL_THREADS=' +
+                           os.environ['FLAGSER_PARALLEL_THREADS']]
 
         cfg = 'Debug' if self.debug else 'Release'
         build_args = ['--config', cfg]
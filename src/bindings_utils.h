@@ -0,0 +1,367 @@
+#pragma once
+
+#include <cmath>
+#include <iostream>
+#include <limits>
+#include <mutex>
+#include <type_traits>
+
+#include <pybind11/numpy.h>
+#include <pybind11/pybind11.h>
+
+namespace py = pybind11;
+
+// State shared by all pyflagser modules loaded in the interpreter
+struct cout_silencer_state_t {
+  std::mutex mutex;
+  size_t active = 0;
+  std::streambuf* buffer = nullptr;
+};
+
+// Disables std::cout while at least one silencer is alive, in any thread and
+// in any of the pyflagser modules. std::cout is process-global, so the first
+// silencer stores its buffer and the last one restores it; redirecting and
+// restoring it in every call would race between concurrent calls.
+// Must be constructed while holding the GIL.
+class cout_silencer_t {
+ public:
+  cout_silencer_t()
+      : state(py::get_or_create_shared_data<cout_silencer_state_t>(
+            "pyflagser_cout_silencer")) {
+    std::lock_guard<std::mutex> lock(state.mutex);
+    if (state.active++ == 0) state.buffer = std::cout.rdbuf(nullptr);
+  }
+
+  ~cout_silencer_t() {
+    std::lock_guard<std::mutex> lock(state.mutex);
+    if (--state.active == 0) {
+      std::cout.rdbuf(state.buffer);
+      // Writing to a null buffer sets the badbit
+      std::cout.clear();
+    }
+  }
+
+  cout_silencer_t(const cout_silencer_t&) = delete;
+  cout_silencer_t& operator=(const cout_silencer_t&) = delete;
+
+ private:
+  cout_silencer_state_t& state;
+};
+
+// The following requires the definitions of flagser to be included first
+
+typedef py::array_t<value_t, py::array::c_style | py::array::forcecast>
+    value_array_t;
+
+// Returns a C-contiguous version of array whose dtype is one of Types, the
+// dtype of array if possible so that no copy is made, and Fallback otherwise
+template <typename Fallback, typename... Types>
+py::array as_array_of(const py::array& array) {
+  const bool is_listed[] = {py::isinstance<py::array_t<Types>>(array)...};
+  for (bool listed : is_listed)
+    if (listed)
+      return py::array::ensure(array, py::array::c_style);
+  return py::array_t<Fallback, py::array::c_style | py::array::forcecast>::
+      ensure(array);
+}
+
+// Read-only view on the buffers describing the edges of a graph, obtained
+// while holding the GIL so that the graph can be built without it. Vertex
+// indices can be 32 or 64-bit integers and weights single or double
+// precision floats, other dtypes are converted. Unweighted graphs pass None
+// as weights, in which case weights is nullptr. Must be destroyed while
+// holding the GIL.
+struct edge_buffers_t {
+  const void* row;
+  const void* column;
+  const void* weights = nullptr;
+  size_t size;
+  bool signed_indices;
+  size_t index_size;
+  size_t weight_size = 0;
+
+  edge_buffers_t(const py::array& row_data, const py::array& column_data,
+                 const py::object& weights_data)
+      : row_array(as_index_array(row_data)),
+        column_array(as_index_array(column_data)) {
+    if (row_array.ndim() != 1 || column_array.ndim() != 1)
+      throw py::value_error("Edge arrays must be one-dimensional.");
+    if (row_array.dtype().kind() != column_array.dtype().kind() ||
+        row_array.itemsize() != column_array.itemsize()) {
+      row_array = py::array_t<int64_t, py::array::forcecast>::ensure(row_array);
+      column_array =
+          py::array_t<int64_t, py::array::forcecast>::ensure(column_array);
+    }
+    size = row_array.size();
+    if ((size_t)column_array.size() != size)
+      throw py::value_error("Edge arrays must have the same length.");
+    row = row_array.data();
+    column = column_array.data();
+    signed_indices = row_array.dtype().kind() == 'i';
+    index_size = row_array.itemsize();
+    if (weights_data.is_none()) return;
+
+    weights_array = as_array_of<value_t, float, double>(
+        py::array::ensure(weights_data));
+    if (weights_array.ndim() != 1)
+      throw py::value_error("Edge arrays must be one-dimensional.");
+    if ((size_t)weights_array.size() != size)
+      throw py::value_error("Edge arrays must have the same length.");
+    weights = weights_array.data();
+    weight_size = weights_array.itemsize();
+  }
+
+ private:
+  // Keep the buffers alive, converted if needed
+  py::array row_array;
+  py::array column_array;
+  py::array weights_array;
+
+  static py::array as_index_array(const py::array& array) {
+    return as_array_of<int64_t, uint32_t, int32_t, uint64_t, int64_t>(array);
+  }
+};
+
+inline std::vector<value_t> to_vector(const value_array_t& array) {
+  return std::vector<value_t>(array.data(), array.data() + array.size());
+}
+
+template <typename Index, typename Weight, typename Func>
+void for_each_edge(const Index* row, const Index* column, const Weight* weights,
+                   size_t size, size_t n_vertices, Func& f) {
+  for (size_t i = 0; i < size; i++) {
+    // Negative indices wrap around and are caught as well
+    if ((uint64_t)row[i] >= n_vertices || (uint64_t)column[i] >= n_vertices)
+      throw py::value_error("The edge (" + std::to_string(row[i]) + ", " +
+                            std::to_string(column[i]) +
+                            ") has a vertex index out of range.");
+    f(vertex_index_t(row[i]), vertex_index_t(column[i]),
+      weights == nullptr ? value_t(0) : value_t(weights[i]));
+  }
+}
+
+template <typename Index, typename Func>
+void for_each_edge(const Index* row, const Index* column,
+                   const edge_buffers_t& edges, size_t n_vertices, Func& f) {
+  if (edges.weights == nullptr)
+    for_each_edge(row, column, (const value_t*)nullptr, edges.size,
+                  n_vertices, f);
+  else if (edges.weight_size == sizeof(float))
+    for_each_edge(row, column, (const float*)edges.weights, edges.size,
+                  n_vertices, f);
+  else
+    for_each_edge(row, column, (const double*)edges.weights, edges.size,
+                  n_vertices, f);
+}
+
+// Call f(source, target, weight) on each edge, reading the buffers in their
+// own dtype. The weight is 0 for unweighted graphs
+template <typename Func>
+void for_each_edge(const edge_buffers_t& edges, size_t n_vertices, Func& f) {
+  if (edges.index_size == 4 && edges.signed_indices)
+    for_each_edge((const int32_t*)edges.row, (const int32_t*)edges.column,
+                  edges, n_vertices, f);
+  else if (edges.index_size == 4)
+    for_each_edge((const uint32_t*)edges.row, (const uint32_t*)edges.column,
+                  edges, n_vertices, f);
+  else if (edges.signed_indices)
+    for_each_edge((const int64_t*)edges.row, (const int64_t*)edges.column,
+                  edges, n_vertices, f);
+  else
+    for_each_edge((const uint64_t*)edges.row, (const uint64_t*)edges.column,
+                  edges, n_vertices, f);
+}
+
+// Read-only view on the index pointer, index and data buffers of a CSR or CSC
+// matrix, obtained while holding the GIL so that the graph can be built
+// without it. Indices can be 32 or 64-bit integers and data booleans, single
+// or double precision floats or 32 or 64-bit integers, other dtypes are
+// converted.
+// Must be destroyed while holding the GIL.
+struct compressed_buffers_t {
+  const void* indptr;
+  const void* indices;
+  const void* data;
+  // Number of rows of a CSR matrix, or of columns of a CSC matrix
+  size_t n_outer;
+  size_t size;
+  bool csc;
+  size_t index_size;
+  char data_kind;
+  size_t data_size;
+
+  compressed_buffers_t(const py::array& indptr_data,
+                       const py::array& indices_data,
+                       const py::array& data_data, bool csc)
+      : csc(csc),
+        indptr_array(as_index_array(indptr_data)),
+        indices_array(as_index_array(indices_data)),
+        data_array(as_array_of<double, bool, float, double, int32_t, int64_t>(
+            data_data)) {
+    if (indptr_array.ndim() != 1 || indices_array.ndim() != 1 ||
+        data_array.ndim() != 1)
+      throw py::value_error("Sparse matrix arrays must be one-dimensional.");
+    if (indptr_array.size() == 0)
+      throw py::value_error("The index pointer array must not be empty.");
+    if (indptr_array.itemsize() != indices_array.itemsize()) {
+      indptr_array = py::array_t<int64_t, py::array::forcecast>::ensure(
+          indptr_array);
+      indices_array = py::array_t<int64_t, py::array::forcecast>::ensure(
+          indices_array);
+    }
+    n_outer = indptr_array.size() - 1;
+    size = indices_array.size();
+    if ((size_t)data_array.size() != size)
+      throw py::value_error(
+          "Sparse matrix indices and data must have the same length.");
+    indptr = indptr_array.data();
+    indices = indices_array.data();
+    data = data_array.data();
+    index_size = indices_array.itemsize();
+    data_kind = data_array.dtype().kind();
+    data_size = data_array.itemsize();
+  }
+
+ private:
+  // Keep the buffers alive, converted if needed
+  py::array indptr_array;
+  py::array indices_array;
+  py::array data_array;
+
+  static py::array as_index_array(const py::array& array) {
+    return as_array_of<int64_t, int32_t, int64_t>(array);
+  }
+};
+
+// Whether an entry of a weighted adjacency matrix is an edge: for floating
+// point weights, finite ones if there is no threshold, i.e. if
+// max_edge_weight is infinite, and otherwise those not greater than
+// max_edge_weight, which is rounded as NumPy would to compare it to them
+template <typename Weight>
+inline bool is_weighted_edge(Weight weight, double max_edge_weight) {
+  if (std::is_floating_point<Weight>::value &&
+      max_edge_weight == std::numeric_limits<double>::infinity())
+    return std::isfinite(double(weight));
+  return double(weight) <= max_edge_weight;
+}
+
+template <typename Index, typename Weight, typename Func>
+void for_each_compressed_edge(const Index* indptr, const Index* indices,
+                              const Weight* data,
+                              const compressed_buffers_t& matrix,
+                              size_t n_vertices, bool weighted,
+                              double max_edge_weight, Func& f) {
+  for (size_t i = 0; i < matrix.n_outer; i++) {
+    const Index start = indptr[i], end = indptr[i + 1];
+    if (start < 0 || start > end || (uint64_t)end > matrix.size)
+      throw py::value_error(
+          "The index pointer array of the sparse matrix is invalid.");
+    for (Index k = start; k < end; k++) {
+      // Negative indices wrap around and are caught as well
+      if ((uint64_t)indices[k] >= n_vertices)
+        throw py::value_error("The sparse matrix has an index out of range.");
+      vertex_index_t u = vertex_index_t(i), v = vertex_index_t(indices[k]);
+      if (matrix.csc) std::swap(u, v);
+      if (u == v) continue;
+      if (weighted ? !is_weighted_edge(data[k], max_edge_weight)
+                   : data[k] == Weight(0))
+        continue;
+      f(u, v, value_t(data[k]));
+    }
+  }
+}
+
+template <typename Index, typename Func>
+void for_each_compressed_edge(const Index* indptr, const Index* indices,
+                              const compressed_buffers_t& matrix,
+                              size_t n_vertices, bool weighted,
+                              double max_edge_weight, Func& f) {
+  if (matrix.data_kind == 'b')
+    for_each_compressed_edge(indptr, indices, (const bool*)matrix.data,
+                             matrix, n_vertices, weighted, max_edge_weight, f);
+  else if (matrix.data_kind == 'f' && matrix.data_size == sizeof(float))
+    for_each_compressed_edge(indptr, indices, (const float*)matrix.data,
+                             matrix, n_vertices, weighted, max_edge_weight, f);
+  else if (matrix.data_kind == 'f')
+    for_each_compressed_edge(indptr, indices, (const double*)matrix.data,
+                             matrix, n_vertices, weighted, max_edge_weight, f);
+  else if (matrix.data_size == sizeof(int32_t))
+    for_each_compressed_edge(indptr, indices, (const int32_t*)matrix.data,
+                             matrix, n_vertices, weighted, max_edge_weight, f);
+  else
+    for_each_compressed_edge(indptr, indices, (const int64_t*)matrix.data,
+                             matrix, n_vertices, weighted, max_edge_weight, f);
+}
+
+// Call f(source, target, weight) on each edge of a CSR or CSC adjacency
+// matrix, reading the buffers in their own dtype. Diagonal entries are
+// skipped, as well as zero entries for unweighted graphs and, for weighted
+// graphs, the entries which are not edges according to is_weighted_edge
+template <typename Func>
+void for_each_compressed_edge(const compressed_buffers_t& matrix,
+                              size_t n_vertices, bool weighted,
+                              double max_edge_weight, Func& f) {
+  if (matrix.n_outer > n_vertices)
+    throw py::value_error("The sparse matrix has more rows or columns than "
+                          "the graph has vertices.");
+  if (matrix.index_size == sizeof(int32_t))
+    for_each_compressed_edge((const int32_t*)matrix.indptr,
+                             (const int32_t*)matrix.indices, matrix,
+                             n_vertices, weighted, max_edge_weight, f);
+  else
+    for_each_compressed_edge((const int64_t*)matrix.indptr,
+                             (const int64_t*)matrix.indices, matrix,
+                             n_vertices, weighted, max_edge_weight, f);
+}
+
+// Add an edge to the graph, checking that its filtration value is consistent
+// with the vertex filtration
+inline void add_weighted_edge(filtered_directed_graph_t& graph,
+                              const std::vector<value_t>& vertices,
+                              vertex_index_t u, vertex_index_t v,
+                              value_t weight) {
+  if (weight < std::max(vertices[u], vertices[v])) {
+    std::string err_msg =
+        "The data contains an edge "
+        "filtration that contradicts the vertex "
+        "filtration, the edge (" +
+        std::to_string(u) + ", " + std::to_string(v) +
+        ") has filtration value " + std::to_string(weight) +
+        ", which is lower than min(" + std::to_string(vertices[u]) + ", " +
+        std::to_string(vertices[v]) + "), the filtrations of its edges.";
+    throw std::runtime_error(err_msg);
+  }
+  graph.add_filtered_edge(u, v, weight);
+}
+
+// Add the edges to the graph. Edges without weights are added as such,
+// otherwise it is checked that the edge filtration is consistent with the
+// vertex filtration
+inline void add_edges(filtered_directed_graph_t& graph,
+                      const std::vector<value_t>& vertices,
+                      const edge_buffers_t& edges) {
+  const bool weighted = edges.weights != nullptr;
+  auto add_edge = [&](vertex_index_t u, vertex_index_t v, value_t weight) {
+    if (weighted)
+      add_weighted_edge(graph, vertices, u, v, weight);
+    else
+      graph.add_edge(u, v);
+  };
+  for_each_edge(edges, vertices.size(), add_edge);
+}
+
+// Same for the edges of a CSR or CSC adjacency matrix, see
+// for_each_compressed_edge
+inline void add_edges(filtered_directed_graph_t& graph,
+                      const std::vector<value_t>& vertices,
+                      const compressed_buffers_t& matrix, bool weighted,
+                      double max_edge_weight) {
+  auto add_edge = [&](vertex_index_t u, vertex_index_t v, value_t weight) {
+    if (weighted)
+      add_weighted_edge(graph, vertices, u, v, weight);
+    else
+      graph.add_edge(u, v);
+  };
+  for_each_compressed_edge(matrix, vertices.size(), weighted,
+                           max_edge_weight, add_edge);
+}
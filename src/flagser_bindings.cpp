@@ -1,5 +1,12 @@
+#include <atomic>
+#include <chrono>
+#include <condition_variable>
+#include <exception>
+#include <functional>
 #include <iostream>
+#include <mutex>
 #include <string>
+#include <thread>
 #include <stdio.h>
 
 #include <flagser/src/flagser.cpp>
@@ -7,8 +14,383 @@
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings_utils.h"
+
 namespace py = pybind11;
 
+// Time between two progress reports
+static const std::chrono::milliseconds progress_interval(100);
+
+// Thrown in the computing thread to abort a cancelled computation
+struct cancelled_t {};
+
+// Thrown in the computing thread to stop a computation on request, keeping
+// the dimensions finished so far
+struct stopped_t {};
+
+typedef persistence_computer_t<directed_flag_complex_compute_t>
+    persistence_computer_type;
+
+// Persistence diagram as an (n_pairs, 2) array of type T
+template <typename T, typename Diagram>
+py::array_t<T> diagram_array(const Diagram& diagram) {
+  py::array_t<T> array(
+      {static_cast<py::ssize_t>(diagram.size()), py::ssize_t(2)});
+  auto pairs = array.template mutable_unchecked<2>();
+  for (size_t i = 0; i < diagram.size(); i++) {
+    pairs(i, 0) = diagram[i].first;
+    pairs(i, 1) = diagram[i].second;
+  }
+  return array;
+}
+
+// Persistence diagrams as a list of (n_pairs, 2) arrays of type T
+template <typename T, typename Diagrams>
+py::list diagram_arrays(const Diagrams& diagrams) {
+  py::list arrays;
+  for (const auto& diagram : diagrams) arrays.append(diagram_array<T>(diagram));
+  return arrays;
+}
+
+// Output class reporting the progress of the computation to an optional
+// Python callback and checking for pending signals such as KeyboardInterrupt.
+// The computation runs in a separate thread while the calling thread does
+// both with the GIL held, at the start of each dimension and then every
+// progress_interval, whether flagser is building the complex, enumerating
+// its cells or reducing a coboundary matrix. An exception raised by the
+// callback or a signal handler cancels the computation, which stops at the
+// next column flagser outputs, and is propagated to the caller. If the
+// callback returns True, the computation is stopped in the same way but the
+// dimensions finished so far are returned. The persistence diagram of each
+// dimension is also passed to an optional dimension callback as soon as the
+// dimension is finished.
+class progress_output_t
+    : public trivial_output_t<directed_flag_complex_compute_t> {
+ public:
+  typedef std::vector<persistence_computer_type> result_t;
+
+  // Must be constructed and destroyed while holding the GIL
+  progress_output_t(py::object callback, py::object dimension_callback)
+      : callback(std::move(callback)),
+        dimension_callback(std::move(dimension_callback)) {}
+
+  // Calls compute in a new thread and reports its progress until it returns.
+  // Must be called while holding the GIL, which is released while waiting
+  result_t run(const std::function<result_t()>& compute) {
+    result_t result;
+    std::exception_ptr error;
+    {
+      py::gil_scoped_release release;
+      std::thread worker([&] {
+        try {
+          result = compute();
+        } catch (...) {
+          error = std::current_exception();
+        }
+        std::lock_guard<std::mutex> lock(mutex);
+        done = true;
+        changed.notify_all();
+      });
+
+      std::unique_lock<std::mutex> lock(mutex);
+      while (true) {
+        changed.wait_for(lock, progress_interval,
+                         [this] { return done || request != no_request; });
+        if (done) break;
+        const request_t current_request = request;
+        // Finished dimensions are still reported once stopped
+        if (state == running ||
+            (state == stopped && current_request == dimension_request)) {
+          lock.unlock();
+          if (current_request == dimension_request)
+            report_dimension();
+          else
+            report();
+          lock.lock();
+        }
+        request = no_request;
+        changed.notify_all();
+      }
+      lock.unlock();
+      worker.join();
+    }
+
+    // The computation is only cancelled after an exception in report
+    if (python_error) std::rethrow_exception(python_error);
+    if (error) std::rethrow_exception(error);
+    return result;
+  }
+
+  void set_complex(directed_flag_complex_compute_t* _complex) override {
+    complex = _complex;
+  }
+
+  void set_persistence_computer(persistence_computer_type* _computer) {
+    persistence_computer = _computer;
+  }
+
+  void computing_barcodes_in_dimension(unsigned short _dimension) override {
+    // The previous dimension, if any, is finished
+    finish_dimension();
+    check_state();
+
+    dimension = _dimension;
+    number_of_columns = 0;
+    update_number_of_cells();
+    started = true;
+
+    // Waits for the progress to be reported at the start of the dimension
+    wait_for(progress_request);
+    check_state();
+  }
+
+  void new_barcode(value_t birth, value_t death) override { new_column(); }
+
+  void new_infinite_barcode(value_t birth) override { new_column(); }
+
+  void skipped_column(size_t number_of_entries) override { new_column(); }
+
+  // Called once flagser is done, the last dimension started is finished
+  void finish_dimension() {
+    if (!started) return;
+    started = false;
+    wait_for(dimension_request);
+    number_of_finished_dimensions++;
+  }
+
+ private:
+  enum state_t { running, stopped, cancelled };
+  enum request_t { no_request, progress_request, dimension_request };
+
+  py::object callback;
+  py::object dimension_callback;
+  directed_flag_complex_compute_t* complex = nullptr;
+  persistence_computer_type* persistence_computer = nullptr;
+
+  // Progress of the computation, written by the computing thread and read
+  // by the reporting one
+  std::atomic<unsigned short> dimension{0};
+  std::atomic<size_t> number_of_cells{0};
+  std::atomic<size_t> number_of_columns{0};
+  std::atomic<state_t> state{running};
+  std::exception_ptr python_error;
+
+  // Only accessed by the computing thread, or by the reporting one while
+  // the computing thread waits for a request to be handled
+  bool started = false;
+  size_t number_of_finished_dimensions = 0;
+
+  // Guard the communication between the two threads
+  std::mutex mutex;
+  std::condition_variable changed;
+  bool done = false;
+  request_t request = no_request;
+
+  // Waits for the reporting thread to handle a request
+  void wait_for(request_t _request) {
+    std::unique_lock<std::mutex> lock(mutex);
+    request = _request;
+    changed.notify_all();
+    changed.wait(lock, [this] { return request == no_request; });
+  }
+
+  void check_state() {
+    switch (state.load(std::memory_order_relaxed)) {
+      case running:
+        return;
+      case stopped:
+        throw stopped_t();
+      case cancelled:
+        throw cancelled_t();
+    }
+  }
+
+  void update_number_of_cells() {
+    if (complex)
+      number_of_cells.store(complex->number_of_cells(dimension),
+                            std::memory_order_relaxed);
+  }
+
+  // Called by flagser for every column of the coboundary matrix giving a
+  // bar, and for every column it skips
+  void new_column() {
+    check_state();
+    number_of_columns.fetch_add(1, std::memory_order_relaxed);
+    update_number_of_cells();
+  }
+
+  void report() {
+    py::gil_scoped_acquire acquire;
+    try {
+      if (PyErr_CheckSignals() != 0) throw py::error_already_set();
+      if (!callback.is_none() &&
+          callback(dimension.load(), number_of_cells.load(),
+                   number_of_columns.load())
+                  .ptr() == Py_True)
+        state = stopped;
+    } catch (...) {
+      python_error = std::current_exception();
+      state = cancelled;
+    }
+  }
+
+  // Passes the persistence diagram of the dimension just finished to the
+  // dimension callback. Diagrams are stored from the minimal dimension on
+  void report_dimension() {
+    if (dimension_callback.is_none() || persistence_computer == nullptr)
+      return;
+    py::gil_scoped_acquire acquire;
+    try {
+      const auto& diagrams = persistence_computer->get_persistence_diagram();
+      if (number_of_finished_dimensions < diagrams.size())
+        dimension_callback(dimension.load(),
+                           diagram_array<value_t>(
+                               diagrams[number_of_finished_dimensions]));
+    } catch (...) {
+      python_error = std::current_exception();
+      state = cancelled;
+    }
+  }
+};
+
+// Same as flagser's compute_homology, but sending the output to the given
+// output class. If the computation is stopped, the returned persistence
+// computer holds the dimensions finished before
+std::vector<persistence_computer_type> compute_homology(
+    filtered_directed_graph_t& graph, const flagser_parameters& params,
+    progress_output_t* output) {
+  std::vector<persistence_computer_type> persistence_computers;
+
+  directed_flag_complex_compute_t complex(graph, params);
+  output->set_complex(&complex);
+
+  persistence_computer_type persistence_computer(
+      complex, output, params.max_entries, params.modulus,
+      params.max_filtration);
+  output->set_persistence_computer(&persistence_computer);
+  try {
+    persistence_computer.compute_persistence(params.min_dimension,
+                                             params.max_dimension);
+    output->finish_dimension();
+  } catch (const stopped_t&) {
+    // Stopped on request
+  }
+  persistence_computers.push_back(persistence_computer);
+
+  output->set_persistence_computer(nullptr);
+  output->set_complex(nullptr);
+  return persistence_computers;
+}
+
+// Sets the parameters of a homology computation. A negative max_dim means no
+// limit, and a zero approximation an exact computation. A non-empty cache is
+// the directory in which flagser stores the coboundary matrices, and
+// in_memory makes it keep the cells of the complex in memory
+void set_parameters(flagser_parameters& params, unsigned short min_dim,
+                    short max_dim, bool directed, coefficient_t modulus,
+                    signed int approximation, const std::string& filtration,
+                    const std::string& cache, bool in_memory) {
+  // Minimum dimension parameter
+  params.min_dimension = min_dim;
+
+  // Maximum dimension parameter
+  unsigned short effective_max_dim = max_dim;
+  if (max_dim < 0) {
+    effective_max_dim = std::numeric_limits<unsigned short>::max();
+  }
+  params.max_dimension = effective_max_dim;
+
+  // Filtration argument
+  params.filtration_algorithm.reset(get_filtration_computer(filtration));
+
+  // Modulus/Coefficient parameter
+  params.modulus = modulus;
+
+  // If approximation is negative it falls back to type::numeric_limits
+  params.approximate_computation = approximation ? true : false;
+  params.max_entries =
+      params.approximate_computation > 0 ? approximation : params.max_entries;
+
+  // Directed parameter
+  params.directed = directed;
+
+  // Storage of the complex and of the coboundary matrices
+  params.cache = cache;
+  params.in_memory = in_memory;
+
+  // Output file is not used
+  params.output_name = std::string("to_delete.flag");
+  // Calls Trivial output, disable the generation of an output file
+  params.output_format = std::string("none");
+}
+
+// Builds the filtered directed graph given by its vertex and edge buffers.
+// Must be called while holding the GIL, which is released while building
+std::unique_ptr<filtered_directed_graph_t> build_graph(
+    const value_array_t& vertices, const py::array& row,
+    const py::array& column, const py::object& weights, bool directed) {
+  // Views on the input buffers, no copy is made if they are C-contiguous
+  // and of a supported dtype. Weights are None for unweighted graphs
+  auto vertex_filtration = to_vector(vertices);
+  edge_buffers_t edge_buffers(row, column, weights);
+
+  // Disable cout for the duration of the call
+  cout_silencer_t cout_silencer;
+
+  py::gil_scoped_release release;
+  std::unique_ptr<filtered_directed_graph_t> graph(
+      new filtered_directed_graph_t(vertex_filtration, directed));
+  add_edges(*graph, vertex_filtration, edge_buffers);
+  return graph;
+}
+
+// Builds the filtered directed graph of a CSR (or CSC, if csc is true)
+// adjacency matrix, reading the edges straight from its buffers, see
+// for_each_compressed_edge. Must be called while holding the GIL, which is
+// released while building
+std::unique_ptr<filtered_directed_graph_t> build_compressed_graph(
+    const value_array_t& vertices, const py::array& indptr,
+    const py::array& indices, const py::array& data, bool csc, bool weighted,
+    double max_edge_weight, bool directed) {
+  auto vertex_filtration = to_vector(vertices);
+  compressed_buffers_t matrix(indptr, indices, data, csc);
+
+  // Disable cout for the duration of the call
+  cout_silencer_t cout_silencer;
+
+  py::gil_scoped_release release;
+  std::unique_ptr<filtered_directed_graph_t> graph(
+      new filtered_directed_graph_t(vertex_filtration, directed));
+  add_edges(*graph, vertex_filtration, matrix, weighted, max_edge_weight);
+  return graph;
+}
+
+// Computes the homology of the flag complex of a graph, reporting progress
+// to progress_callback and the diagram of each finished dimension to
+// dimension_callback. Must be called while holding the GIL, which is
+// released while computing. The graph is not modified and can be reused
+std::vector<persistence_computer_type> graph_homology(
+    filtered_directed_graph_t& graph, unsigned short min_dim, short max_dim,
+    bool directed, coefficient_t modulus, signed int approximation,
+    const std::string& filtration, const std::string& cache, bool in_memory,
+    py::object progress_callback, py::object dimension_callback) {
+  flagser_parameters params;
+  set_parameters(params, min_dim, max_dim, directed, modulus, approximation,
+                 filtration, cache, in_memory);
+
+  // Disable cout for the duration of the call
+  cout_silencer_t cout_silencer;
+
+  // Declared while holding the GIL so that it is destroyed with it held
+  progress_output_t output(std::move(progress_callback),
+                           std::move(dimension_callback));
+
+  // Running flagser's compute_homology routine in a separate thread,
+  // reporting its progress. The GIL is released meanwhile
+  return output.run(
+      [&] { return compute_homology(graph, params, &output); });
+}
+
 #ifdef USE_COEFFICIENTS
 PYBIND11_MODULE(flagser_coeff_pybind, m) {
 #else
@@ -19,8 +401,11 @@ PYBIND11_MODULE(flagser_pybind, m) {
 
   m.attr("AVAILABLE_FILTRATIONS") = custom_filtration_computer;
 
-  using PersistenceComputer =
-      persistence_computer_t<directed_flag_complex_compute_t>;
+  // Number of threads with which flagser builds the complexes, fixed at
+  // compile time
+  m.attr("PARALLEL_THREADS") = PARALLEL_THREADS;
+
+  using PersistenceComputer = persistence_computer_type;
 
   py::class_<PersistenceComputer>(m, "PersistenceComputer", py::module_local())
       .def("get_euler_characteristic",
@@ -37,92 +422,82 @@ PYBIND11_MODULE(flagser_pybind, m) {
            py::overload_cast<>(&PersistenceComputer::get_persistence_diagram))
       .def("get_persistence_diagram",
            py::overload_cast<size_t>(
-               &PersistenceComputer::get_persistence_diagram));
+               &PersistenceComputer::get_persistence_diagram))
+      .def("get_persistence_diagram_arrays",
+           [](PersistenceComputer& self, const py::dtype& dtype) {
+             // One (n_pairs, 2) array per dimension, filled directly from
+             // the C++ diagrams instead of going through lists of tuples.
+             // Filtration values are single precision floats, so float32
+             // arrays hold them exactly
+             if (dtype.kind() == 'f' && dtype.itemsize() == sizeof(float))
+               return diagram_arrays<float>(self.get_persistence_diagram());
+             py::list diagrams =
+                 diagram_arrays<double>(self.get_persistence_diagram());
+             if (dtype.kind() == 'f' && dtype.itemsize() == sizeof(double))
+               return diagrams;
+             for (size_t i = 0; i < diagrams.size(); i++)
+               diagrams[i] = diagrams[i].attr("astype")(dtype);
+             return diagrams;
+           },
+           py::arg("dtype") = py::dtype::of<double>());
 
-  m.def("compute_homology", [](std::vector<value_t>& vertices,
-                               std::vector<std::vector<value_t>>& edges,
+  // Graph kept alive between computations, so that the homology of its flag
+  // complex can be computed several times without building it again
+  py::class_<filtered_directed_graph_t>(m, "FilteredGraph",
+                                        py::module_local())
+      .def(py::init(&build_graph), py::arg("vertices"), py::arg("row"),
+           py::arg("column"), py::arg("weights"), py::arg("directed"))
+      .def("compute_homology",
+           [](filtered_directed_graph_t& self, unsigned short min_dim,
+              short max_dim, bool directed, coefficient_t modulus,
+              signed int approximation, std::string filtration,
+              py::object progress_callback, py::object dimension_callback,
+              std::string cache, bool in_memory) {
+             return graph_homology(self, min_dim, max_dim, directed, modulus,
+                                   approximation, filtration, cache,
+                                   in_memory, std::move(progress_callback),
+                                   std::move(dimension_callback));
+           });
+
+  m.def("compute_homology", [](const value_array_t& vertices,
+                               const py::array& row,
+                               const py::array& column,
+                               const py::object& weights,
                                unsigned short min_dim, short max_dim,
                                bool directed, coefficient_t modulus,
                                signed int approximation,
-                               std::string filtration) {
-    flagser_parameters params;
-
-    // Save std::cout status
-    auto cout_buff = std::cout.rdbuf();
-
-    // Minimum dimension parameter
-    params.min_dimension = min_dim;
-
-    // Maximum dimension parameter
-    unsigned short effective_max_dim = max_dim;
-    if (max_dim < 0) {
-      effective_max_dim = std::numeric_limits<unsigned short>::max();
-    }
-    params.max_dimension = effective_max_dim;
-
-    // Filtration argument
-    params.filtration_algorithm.reset(get_filtration_computer(filtration));
-
-    // Modulus/Coefficient parameter
-    params.modulus = modulus;
-
-    // If approximation is negative it falls back to type::numeric_limits
-    params.approximate_computation = approximation ? true : false;
-    params.max_entries =
-        params.approximate_computation > 0 ? approximation : params.max_entries;
-
-    // Directed parameter
-    params.directed = directed;
-
-    // Output file is not used
-    params.output_name = std::string("to_delete.flag");
-    // Calls Trivial output, disable the generation of an output file
-    params.output_format = std::string("none");
-
-    // Building the filtered directed graph
-    auto graph = filtered_directed_graph_t(vertices, params.directed);
-
-    HAS_EDGE_FILTRATION has_edge_filtration =
-        HAS_EDGE_FILTRATION::TOO_EARLY_TO_DECIDE;
-
-    // If we have at least one edge
-    if (edges.size() && has_edge_filtration == HAS_EDGE_FILTRATION::MAYBE) {
-      // If the edge has three components, the last is the filtration
-      // value
-      has_edge_filtration = edges[0].size() == 2 ? HAS_EDGE_FILTRATION::NO
-                                                 : HAS_EDGE_FILTRATION::YES;
-    }
-
-    for (auto& edge : edges) {
-      if (has_edge_filtration == NO) {
-        graph.add_edge(edge[0], edge[1]);
-      } else {
-        if (edge[2] < std::max(vertices[edge[0]], vertices[edge[1]])) {
-          std::string err_msg =
-              "The data contains an edge "
-              "filtration that contradicts the vertex "
-              "filtration, the edge (" +
-              std::to_string(edge[0]) + ", " + std::to_string(edge[1]) +
-              ") has filtration value " + std::to_string(edge[2]) +
-              ", which is lower than min(" + std::to_string(vertices[edge[0]]) +
-              ", " + std::to_string(vertices[edge[1]]) +
-              "), the filtrations of its edges.";
-          throw std::runtime_error(err_msg);
-        }
-        graph.add_filtered_edge((vertex_index_t)edge[0],
-                                (vertex_index_t)edge[1], edge[2]);
-      }
-    }
-
-    // Disable cout
-    std::cout.rdbuf(nullptr);
-
-    // Running flagser's compute_homology routine
-    auto subgraph_persistence_computer = compute_homology(graph, params);
-
-    // Re-enable again cout
-    std::cout.rdbuf(cout_buff);
+                               std::string filtration,
+                               py::object progress_callback,
+                               py::object dimension_callback,
+                               std::string cache, bool in_memory) {
+    auto graph = build_graph(vertices, row, column, weights, directed);
+    return graph_homology(*graph, min_dim, max_dim, directed, modulus,
+                          approximation, filtration, cache, in_memory,
+                          std::move(progress_callback),
+                          std::move(dimension_callback));
+  });
 
-    return subgraph_persistence_computer;
+  // Same, for the graph of a CSR or CSC adjacency matrix given by its
+  // buffers, without extracting its edges first
+  m.def("compute_homology_compressed", [](const value_array_t& vertices,
+                                          const py::array& indptr,
+                                          const py::array& indices,
+                                          const py::array& data, bool csc,
+                                          bool weighted,
+                                          double max_edge_weight,
+                                          unsigned short min_dim,
+                                          short max_dim, bool directed,
+                                          coefficient_t modulus,
+                                          signed int approximation,
+                                          std::string filtration,
+                                          py::object progress_callback,
+                                          py::object dimension_callback,
+                                          std::string cache, bool in_memory) {
+    auto graph = build_compressed_graph(vertices, indptr, indices, data, csc,
+                                        weighted, max_edge_weight, directed);
+    return graph_homology(*graph, min_dim, max_dim, directed, modulus,
+                          approximation, filtration, cache, in_memory,
+                          std::move(progress_callback),
+                          std::move(dimension_callback));
   });
 }
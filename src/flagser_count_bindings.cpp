@@ -1,68 +1,716 @@
 #include <stdio.h>
+#include <algorithm>
+#include <atomic>
 #include <iostream>
+#include <limits>
+#include <memory>
+#include <mutex>
+#include <thread>
+#include <tuple>
 
 #include <flagser/src/flagser-count.cpp>
 
 #include <pybind11/pybind11.h>
 #include <pybind11/stl.h>
 
+#include "bindings_utils.h"
+
 namespace py = pybind11;
 
-PYBIND11_MODULE(flagser_count_pybind, m) {
-  m.doc() = "Python interface for flagser_count";
+// Per-thread cell counter, the totals are summed once all threads are done
+struct parallel_cell_counter_t {
+  std::vector<size_t> cell_counts;
 
-  m.def("compute_cell_count", [](std::vector<value_t>& vertices,
-                                 std::vector<std::vector<value_t>>& edges,
-                                 bool directed) {
-    // Save std::cout status
-    auto cout_buff = std::cout.rdbuf();
+  void done() {}
 
-    // flagser-count's parameters
-    flagser_parameters params;
+  void operator()(vertex_index_t* first_vertex, int size) {
+    if (cell_counts.size() < size_t(size)) cell_counts.resize(size, 0);
+    cell_counts[size - 1]++;
+  }
+};
 
-    // Building the filtered directed graph
-    auto graph = filtered_directed_graph_t(vertices, directed);
+// Total number of cells per dimension counted by all threads
+inline std::vector<size_t> sum_cell_counts(
+    const std::vector<parallel_cell_counter_t>& cell_counters) {
+  std::vector<size_t> cell_count;
+  for (auto& counter : cell_counters) {
+    if (cell_count.size() < counter.cell_counts.size())
+      cell_count.resize(counter.cell_counts.size(), 0);
+    for (size_t dim = 0; dim < counter.cell_counts.size(); dim++)
+      cell_count[dim] += counter.cell_counts[dim];
+  }
+  return cell_count;
+}
+
+// Run f[i] on the i-th of f.size() threads, each thread enumerating a
+// disjoint part of the cells of the complex. The cells can also be split into
+// number_of_parts parts, by the index of their first vertex modulo
+// number_of_parts, in which case only the cells of the given part are
+// enumerated
+template <typename Func>
+void parallel_for_each_cell(directed_flag_complex_t& complex,
+                            std::vector<Func>& f, int min_dimension,
+                            int max_dimension, int number_of_parts = 1,
+                            int part = 0) {
+  const int number_of_threads = f.size();
+  std::vector<std::thread> threads;
+  for (int index = 0; index < number_of_threads - 1; ++index)
+    threads.push_back(std::thread(
+        &directed_flag_complex_t::worker_thread<Func>, &complex,
+        number_of_threads * number_of_parts, part + index * number_of_parts,
+        std::ref(f[index]), min_dimension, max_dimension));
 
-    HAS_EDGE_FILTRATION has_edge_filtration =
-        HAS_EDGE_FILTRATION::TOO_EARLY_TO_DECIDE;
+  // The calling thread takes care of the last chunk
+  complex.worker_thread(number_of_threads * number_of_parts,
+                        part + (number_of_threads - 1) * number_of_parts,
+                        f[number_of_threads - 1], min_dimension,
+                        max_dimension);
 
-    // If we have at least one edge
-    if (edges.size() && has_edge_filtration == HAS_EDGE_FILTRATION::MAYBE) {
-      // If the edge has three components, the last is the filtration value
-      has_edge_filtration = edges[0].size() == 2 ? HAS_EDGE_FILTRATION::NO
-                                                 : HAS_EDGE_FILTRATION::YES;
+  for (auto& thread : threads) thread.join();
+}
+
+// Filtration values of the edges of a graph, sorted by source and target so
+// that the value, or the index in this order, of an edge is found by binary
+// search. In the undirected case
+// edges are stored from their smaller to their larger vertex and, as for the
+// graph, the edge from the upper triangular part of the adjacency matrix
+// takes precedence
+class edge_filtration_t {
+ public:
+  edge_filtration_t(const edge_buffers_t& edges, size_t n_vertices,
+                    bool _directed)
+      : directed(_directed), offsets(n_vertices + 1, 0) {
+    // (source, target, lower triangular, weight)
+    std::vector<std::tuple<vertex_index_t, vertex_index_t, bool, value_t>>
+        sorted_edges;
+    sorted_edges.reserve(edges.size);
+    auto add_edge = [&](vertex_index_t u, vertex_index_t v, value_t weight) {
+      if (directed || u < v)
+        sorted_edges.emplace_back(u, v, false, weight);
+      else
+        sorted_edges.emplace_back(v, u, true, weight);
+    };
+    for_each_edge(edges, n_vertices, add_edge);
+    std::stable_sort(sorted_edges.begin(), sorted_edges.end(),
+                     [](const decltype(sorted_edges)::value_type& a,
+                        const decltype(sorted_edges)::value_type& b) {
+                       return std::make_tuple(std::get<0>(a), std::get<1>(a),
+                                              std::get<2>(a)) <
+                              std::make_tuple(std::get<0>(b), std::get<1>(b),
+                                              std::get<2>(b));
+                     });
+
+    for (size_t i = 0; i < sorted_edges.size(); i++) {
+      const vertex_index_t u = std::get<0>(sorted_edges[i]);
+      const vertex_index_t v = std::get<1>(sorted_edges[i]);
+      // Keep the first of duplicate edges
+      if (i > 0 && std::get<0>(sorted_edges[i - 1]) == u &&
+          std::get<1>(sorted_edges[i - 1]) == v)
+        continue;
+      targets.push_back(v);
+      values.push_back(std::get<3>(sorted_edges[i]));
+      offsets[u + 1]++;
     }
+    for (size_t u = 1; u <= n_vertices; u++) offsets[u] += offsets[u - 1];
+  }
+
+  value_t operator()(vertex_index_t u, vertex_index_t v) const {
+    const size_t edge = index(u, v);
+    if (edge == size()) return std::numeric_limits<value_t>::infinity();
+    return values[edge];
+  }
+
+  // Index of the edge from u to v, or size() if there is none
+  size_t index(vertex_index_t u, vertex_index_t v) const {
+    if (!directed && v < u) std::swap(u, v);
+    const auto first = targets.begin() + offsets[u];
+    const auto last = targets.begin() + offsets[u + 1];
+    const auto it = std::lower_bound(first, last, v);
+    if (it == last || *it != v) return size();
+    return it - targets.begin();
+  }
+
+  size_t size() const { return targets.size(); }
+
+  // Write the source and target of each edge, in order, to consecutive
+  // entries of out
+  void write_edges(vertex_index_t* out) const {
+    for (size_t u = 0; u + 1 < offsets.size(); u++)
+      for (size_t edge = offsets[u]; edge < offsets[u + 1]; edge++) {
+        *out++ = u;
+        *out++ = targets[edge];
+      }
+  }
+
+ private:
+  bool directed;
+  std::vector<size_t> offsets;
+  std::vector<vertex_index_t> targets;
+  std::vector<value_t> values;
+};
+
+// Filtration value of a cell for the max filtration, i.e. the maximum of the
+// filtration values of its vertices and edges
+inline value_t cell_filtration(const std::vector<value_t>& vertices,
+                               const edge_filtration_t& edge_filtration,
+                               const vertex_index_t* first_vertex, int size) {
+  value_t filtration = vertices[first_vertex[0]];
+  for (int i = 1; i < size; i++) {
+    filtration = std::max(filtration, vertices[first_vertex[i]]);
+    // Edges go from earlier to later vertices of a directed cell
+    for (int j = 0; j < i; j++)
+      filtration = std::max(filtration,
+                            edge_filtration(first_vertex[j], first_vertex[i]));
+  }
+  return filtration;
+}
+
+// Per-thread histogram of the filtration values of the cells, for the max
+// filtration. Cells whose filtration value is at most thresholds[i] but
+// greater than thresholds[i - 1] are counted in histogram[dimension][i]
+struct threshold_cell_counter_t {
+  const std::vector<value_t>* vertices;
+  const edge_filtration_t* edge_filtration;
+  const std::vector<value_t>* thresholds;
+  std::vector<std::vector<size_t>> histogram;
+
+  void done() {}
+
+  void operator()(vertex_index_t* first_vertex, int size) {
+    const value_t filtration =
+        cell_filtration(*vertices, *edge_filtration, first_vertex, size);
+
+    const auto bin = std::lower_bound(thresholds->begin(), thresholds->end(),
+                                      filtration) -
+                     thresholds->begin();
+    if (size_t(bin) == thresholds->size()) return;
+    if (histogram.size() < size_t(size))
+      histogram.resize(size, std::vector<size_t>(thresholds->size(), 0));
+    histogram[size - 1][bin]++;
+  }
+};
+
+// Number of cells of each dimension that each vertex (or each edge) belongs
+// to, in a single table per dimension shared by all threads and incremented
+// atomically, so that memory does not grow with the number of threads. The
+// table of a dimension is allocated by the first thread reaching it
+class participation_table_t {
+ public:
+  explicit participation_table_t(size_t size) : size(size) {}
+
+  // Table of the given dimension, allocating the missing ones
+  std::atomic<size_t>* get(size_t dimension) {
+    std::lock_guard<std::mutex> lock(mutex);
+    while (tables.size() <= dimension)
+      tables.emplace_back(new std::atomic<size_t>[size]());
+    return tables[dimension].get();
+  }
+
+  size_t number_of_dimensions() const { return tables.size(); }
+
+  // Writes the counts to the row-major (size, number_of_dimensions) array out
+  void write(size_t number_of_dimensions, int64_t* out) const {
+    for (size_t dim = 0; dim < tables.size(); dim++)
+      for (size_t i = 0; i < size; i++)
+        out[i * number_of_dimensions + dim] =
+            tables[dim][i].load(std::memory_order_relaxed);
+  }
+
+ private:
+  size_t size;
+  std::mutex mutex;
+  std::vector<std::unique_ptr<std::atomic<size_t>[]>> tables;
+};
+
+// Per-thread counter of the cells that each vertex and each edge belong to,
+// in the shared participation tables. Only the pointers to the tables of the
+// dimensions reached by the thread are stored per thread
+struct participation_counter_t {
+  const edge_filtration_t* edges;
+  participation_table_t* vertex_participation;
+  participation_table_t* edge_participation;
+  std::vector<std::atomic<size_t>*> vertex_counts;
+  std::vector<std::atomic<size_t>*> edge_counts;
+
+  void done() {}
+
+  void operator()(vertex_index_t* first_vertex, int size) {
+    while (vertex_counts.size() < size_t(size)) {
+      vertex_counts.push_back(vertex_participation->get(vertex_counts.size()));
+      edge_counts.push_back(edge_participation->get(edge_counts.size()));
+    }
+    std::atomic<size_t>* vertex_count = vertex_counts[size - 1];
+    std::atomic<size_t>* edge_count = edge_counts[size - 1];
+    for (int i = 0; i < size; i++) {
+      vertex_count[first_vertex[i]].fetch_add(1, std::memory_order_relaxed);
+      for (int j = 0; j < i; j++)
+        edge_count[edges->index(first_vertex[j], first_vertex[i])].fetch_add(
+            1, std::memory_order_relaxed);
+    }
+  }
+};
+
+// Per-thread writer of the vertices of the cells, and of their filtration
+// values if edge_filtration is not null, to consecutive rows of buffers
+// allocated beforehand, one per dimension
+struct cell_writer_t {
+  const std::vector<value_t>* vertices;
+  const edge_filtration_t* edge_filtration;
+  // Next row to be written, per dimension
+  std::vector<vertex_index_t*> cells;
+  std::vector<value_t*> filtrations;
+
+  void done() {}
+
+  void operator()(vertex_index_t* first_vertex, int size) {
+    vertex_index_t*& row = cells[size - 1];
+    // No buffer is allocated below the minimal dimension
+    if (row == nullptr) return;
+    std::copy(first_vertex, first_vertex + size, row);
+    row += size;
+    if (edge_filtration != nullptr)
+      *filtrations[size - 1]++ =
+          cell_filtration(*vertices, *edge_filtration, first_vertex, size);
+  }
+};
+
+// Directed flag complex of a graph whose cells are written to NumPy arrays,
+// all at once or one part at a time so that the cells of only one part are in
+// memory. As in parallel_for_each_cell, a part consists of the cells whose
+// first vertex is congruent to the index of the part modulo the number of
+// parts
+class cell_enumerator_t {
+ public:
+  cell_enumerator_t(const value_array_t& vertices, const py::array& row,
+                    const py::array& column, const py::object& weights,
+                    bool directed, unsigned short min_dim, short max_dim)
+      : vertex_filtration(to_vector(vertices)),
+        graph(vertex_filtration, directed),
+        min_dimension(min_dim),
+        max_dimension(max_dim) {
+    edge_buffers_t edge_buffers(row, column, weights);
+
+    // Disable cout for the duration of the call
+    cout_silencer_t cout_silencer;
+
+    // The GIL is not needed from now on
+    py::gil_scoped_release release;
+
+    add_edges(graph, vertex_filtration, edge_buffers);
+    // Filtration values are only computed for weighted graphs
+    if (!weights.is_none())
+      edge_filtration.reset(new edge_filtration_t(
+          edge_buffers, vertex_filtration.size(), directed));
+  }
+
+  std::vector<size_t> count(int number_of_parts, int part,
+                            unsigned int n_jobs) {
+    cout_silencer_t cout_silencer;
+    py::gil_scoped_release release;
+
+    std::vector<parallel_cell_counter_t> cell_counters(std::max(n_jobs, 1u));
+    directed_flag_complex_t complex(graph);
+    parallel_for_each_cell(complex, cell_counters, min_dimension,
+                           max_dimension, number_of_parts, part);
+    return sum_cell_counts(cell_counters);
+  }
+
+  // List of (cells, filtrations) per dimension from the minimal dimension
+  // on, where cells is an array of shape (n_cells, dimension + 1) of vertex
+  // indices and filtrations is None for unweighted graphs
+  py::list cells(int number_of_parts, int part, unsigned int n_jobs) {
+    const size_t number_of_threads = std::max(n_jobs, 1u);
+
+    // A first enumeration counts the cells of each thread, so that each
+    // thread then writes its cells from a known row of the buffers
+    std::vector<parallel_cell_counter_t> cell_counters(number_of_threads);
+    {
+      cout_silencer_t cout_silencer;
+      py::gil_scoped_release release;
+      directed_flag_complex_t complex(graph);
+      parallel_for_each_cell(complex, cell_counters, min_dimension,
+                             max_dimension, number_of_parts, part);
+    }
+    const auto cell_count = sum_cell_counts(cell_counters);
+
+    std::vector<cell_writer_t> cell_writers(
+        number_of_threads,
+        cell_writer_t{&vertex_filtration, edge_filtration.get(),
+                      std::vector<vertex_index_t*>(cell_count.size(), nullptr),
+                      std::vector<value_t*>(cell_count.size(), nullptr)});
+    py::list out;
+    for (size_t dim = min_dimension; dim < cell_count.size(); dim++) {
+      py::array_t<vertex_index_t> cells(
+          {cell_count[dim], static_cast<size_t>(dim + 1)});
+      py::object filtrations = py::none();
+      value_t* filtrations_data = nullptr;
+      if (edge_filtration) {
+        py::array_t<value_t> filtrations_array(cell_count[dim]);
+        filtrations_data = filtrations_array.mutable_data();
+        filtrations = filtrations_array;
+      }
+
+      size_t offset = 0;
+      for (size_t index = 0; index < number_of_threads; index++) {
+        cell_writers[index].cells[dim] =
+            cells.mutable_data() + offset * (dim + 1);
+        if (filtrations_data != nullptr)
+          cell_writers[index].filtrations[dim] = filtrations_data + offset;
+        if (dim < cell_counters[index].cell_counts.size())
+          offset += cell_counters[index].cell_counts[dim];
+      }
+      out.append(py::make_tuple(cells, filtrations));
+    }
+
+    {
+      cout_silencer_t cout_silencer;
+      py::gil_scoped_release release;
+      // The threads enumerate the same cells in the same order as above
+      directed_flag_complex_t complex(graph);
+      parallel_for_each_cell(complex, cell_writers, min_dimension,
+                             max_dimension, number_of_parts, part);
+    }
+
+    return out;
+  }
 
-    for (auto& edge : edges) {
-      if (has_edge_filtration == NO) {
-        graph.add_edge(edge[0], edge[1]);
+ private:
+  std::vector<value_t> vertex_filtration;
+  filtered_directed_graph_t graph;
+  std::unique_ptr<edge_filtration_t> edge_filtration;
+  unsigned short min_dimension;
+  short max_dimension;
+};
+
+// Cell counts of the flag complex of a graph, kept up to date as edges are
+// added to and removed from the graph. The counts are first computed as by
+// compute_cell_count, after which only the cells containing each changed
+// edge are enumerated, among the common neighbours of its vertices
+class incremental_cell_counter_t {
+ public:
+  incremental_cell_counter_t(const value_array_t& vertices,
+                             const py::array& row, const py::array& column,
+                             bool _directed, unsigned int n_jobs)
+      : directed(_directed),
+        number_of_vertices(vertices.size()),
+        outgoing(number_of_vertices),
+        incoming(directed ? number_of_vertices : 0) {
+    auto vertex_filtration = to_vector(vertices);
+    edge_buffers_t edge_buffers(row, column, py::none());
+
+    // Disable cout for the duration of the call
+    cout_silencer_t cout_silencer;
+
+    // The GIL is not needed from now on
+    py::gil_scoped_release release;
+
+    auto graph = filtered_directed_graph_t(vertex_filtration, directed);
+    ::add_edges(graph, vertex_filtration, edge_buffers);
+    directed_flag_complex_t complex(graph);
+    std::vector<parallel_cell_counter_t> cell_counters(std::max(n_jobs, 1u));
+    parallel_for_each_cell(complex, cell_counters, 0, -1);
+    for (auto count : sum_cell_counts(cell_counters))
+      cell_count.push_back(count);
+
+    // Neighbours are sorted once all edges are added
+    auto add_neighbours = [&](vertex_index_t u, vertex_index_t v, value_t) {
+      if (u == v) return;
+      if (directed) {
+        outgoing[u].push_back(v);
+        incoming[v].push_back(u);
       } else {
-        if (edge[2] < std::max(vertices[edge[0]], vertices[edge[1]])) {
-          std::string err_msg =
-              "The data contains an edge "
-              "filtration that contradicts the vertex "
-              "filtration, the edge (" +
-              std::to_string(edge[0]) + ", " + std::to_string(edge[1]) +
-              ") has filtration value " + std::to_string(edge[2]) +
-              ", which is lower than min(" + std::to_string(vertices[edge[0]]) +
-              ", " + std::to_string(vertices[edge[1]]) +
-              "), the filtrations of its edges.";
-          throw std::runtime_error(err_msg);
-        }
-        graph.add_filtered_edge((vertex_index_t)edge[0],
-                                (vertex_index_t)edge[1], edge[2]);
+        outgoing[u].push_back(v);
+        outgoing[v].push_back(u);
+      }
+    };
+    for_each_edge(edge_buffers, number_of_vertices, add_neighbours);
+    for (auto* neighbours : {&outgoing, &incoming})
+      for (auto& vertices : *neighbours) {
+        std::sort(vertices.begin(), vertices.end());
+        vertices.erase(std::unique(vertices.begin(), vertices.end()),
+                       vertices.end());
+      }
+  }
+
+  // Add the edges which are not already in the graph, self-loops excepted
+  void add_edges(const py::array& row, const py::array& column) {
+    edge_buffers_t edge_buffers(row, column, py::none());
+    py::gil_scoped_release release;
+
+    auto add_edge = [&](vertex_index_t u, vertex_index_t v, value_t) {
+      if (u == v || has_edge(u, v)) return;
+      link(u, v);
+      // Cells containing at least one of the new edges are counted when
+      // the last of them is added
+      update_cell_count(u, v, 1);
+    };
+    for_each_edge(edge_buffers, number_of_vertices, add_edge);
+  }
+
+  // Remove the edges which are in the graph
+  void remove_edges(const py::array& row, const py::array& column) {
+    edge_buffers_t edge_buffers(row, column, py::none());
+    py::gil_scoped_release release;
+
+    auto remove_edge = [&](vertex_index_t u, vertex_index_t v, value_t) {
+      if (u == v || !has_edge(u, v)) return;
+      update_cell_count(u, v, -1);
+      unlink(u, v);
+    };
+    for_each_edge(edge_buffers, number_of_vertices, remove_edge);
+    while (cell_count.size() > 1 && cell_count.back() == 0)
+      cell_count.pop_back();
+  }
+
+  std::vector<int64_t> get_cell_count() const { return cell_count; }
+
+ private:
+  // Position of a vertex in the cells containing a given edge from u to v:
+  // before u, between u and v, or after v
+  enum role_t { BEFORE, BETWEEN, AFTER };
+  typedef std::pair<role_t, vertex_index_t> candidate_t;
+
+  bool directed;
+  size_t number_of_vertices;
+  // Sorted outgoing and incoming neighbours of each vertex. In the undirected
+  // case, all neighbours are outgoing
+  std::vector<std::vector<vertex_index_t>> outgoing;
+  std::vector<std::vector<vertex_index_t>> incoming;
+  std::vector<int64_t> cell_count;
+
+  bool has_edge(vertex_index_t u, vertex_index_t v) const {
+    return std::binary_search(outgoing[u].begin(), outgoing[u].end(), v);
+  }
+
+  static void insert(std::vector<vertex_index_t>& vertices,
+                     vertex_index_t v) {
+    vertices.insert(std::lower_bound(vertices.begin(), vertices.end(), v), v);
+  }
+
+  static void erase(std::vector<vertex_index_t>& vertices, vertex_index_t v) {
+    vertices.erase(std::lower_bound(vertices.begin(), vertices.end(), v));
+  }
+
+  void link(vertex_index_t u, vertex_index_t v) {
+    insert(outgoing[u], v);
+    insert(directed ? incoming[v] : outgoing[v], u);
+  }
+
+  void unlink(vertex_index_t u, vertex_index_t v) {
+    erase(outgoing[u], v);
+    erase(directed ? incoming[v] : outgoing[v], u);
+  }
+
+  // Sorted neighbours of a vertex, in either direction
+  std::vector<vertex_index_t> neighbours(vertex_index_t u) const {
+    if (!directed) return outgoing[u];
+    std::vector<vertex_index_t> out;
+    std::set_union(outgoing[u].begin(), outgoing[u].end(),
+                   incoming[u].begin(), incoming[u].end(),
+                   std::back_inserter(out));
+    return out;
+  }
+
+  void add_to_cell_count(size_t dimension, int sign) {
+    if (cell_count.size() <= dimension) cell_count.resize(dimension + 1, 0);
+    cell_count[dimension] += sign;
+  }
+
+  // Add sign times the number of cells containing the edge from u to v, which
+  // is in the graph, to the cell counts
+  void update_cell_count(vertex_index_t u, vertex_index_t v, int sign) {
+    const auto u_neighbours = neighbours(u);
+    const auto v_neighbours = neighbours(v);
+    std::vector<vertex_index_t> common;
+    std::set_intersection(u_neighbours.begin(), u_neighbours.end(),
+                          v_neighbours.begin(), v_neighbours.end(),
+                          std::back_inserter(common));
+
+    // The vertices which can be added to the edge, with their position
+    std::vector<candidate_t> candidates;
+    for (auto w : common) {
+      if (!directed) {
+        candidates.emplace_back(BETWEEN, w);
+        continue;
+      }
+      if (has_edge(w, u) && has_edge(w, v)) candidates.emplace_back(BEFORE, w);
+      if (has_edge(u, w) && has_edge(w, v))
+        candidates.emplace_back(BETWEEN, w);
+      if (has_edge(u, w) && has_edge(v, w)) candidates.emplace_back(AFTER, w);
+    }
+
+    add_to_cell_count(1, sign);
+    extend(candidates, 2, sign);
+  }
+
+  // Count the cells obtained by adding to a cell of the given dimension minus
+  // one vertices among candidates, all of which can be added to it
+  void extend(const std::vector<candidate_t>& candidates, size_t dimension,
+              int sign) {
+    for (size_t i = 0; i < candidates.size(); i++) {
+      const candidate_t& next = candidates[i];
+      add_to_cell_count(dimension, sign);
+
+      // Vertices which can follow next. Each cell is a sequence of vertices,
+      // its positions being determined by the directed edges between them,
+      // and in the undirected case by the order of their indices
+      std::vector<candidate_t> next_candidates;
+      for (size_t j = directed ? 0 : i + 1; j < candidates.size(); j++) {
+        const candidate_t& other = candidates[j];
+        if (other.first >= next.first && has_edge(next.second, other.second))
+          next_candidates.push_back(other);
       }
+      extend(next_candidates, dimension + 1, sign);
     }
+  }
+};
 
-    // Disable cout
-    std::cout.rdbuf(nullptr);
+PYBIND11_MODULE(flagser_count_pybind, m) {
+  m.doc() = "Python interface for flagser_count";
+
+  m.def("compute_cell_count", [](const value_array_t& vertices,
+                                 const py::array& row,
+                                 const py::array& column,
+                                 const py::object& weights, bool directed,
+                                 unsigned short min_dim, short max_dim,
+                                 unsigned int n_jobs) {
+    // Views on the input buffers, no copy is made if they are C-contiguous
+    // and of a supported dtype. Weights are None for unweighted graphs
+    auto vertex_filtration = to_vector(vertices);
+    edge_buffers_t edge_buffers(row, column, weights);
 
-    // Running flagser-count's count_cells routine
-    auto cell_count = count_cells(graph, params);
+    // Disable cout for the duration of the call
+    cout_silencer_t cout_silencer;
 
-    // Re-enable again cout
-    std::cout.rdbuf(cout_buff);
+    // The GIL is not needed from now on
+    py::gil_scoped_release release;
 
-    return cell_count;
+    // Building the filtered directed graph
+    auto graph = filtered_directed_graph_t(vertex_filtration, directed);
+    add_edges(graph, vertex_filtration, edge_buffers);
+
+    // Enumerating all cells with one counter per thread
+    directed_flag_complex_t complex(graph);
+    std::vector<parallel_cell_counter_t> cell_counters(std::max(n_jobs, 1u));
+    // A negative maximal dimension means no limit
+    parallel_for_each_cell(complex, cell_counters, min_dim, max_dim);
+
+    return sum_cell_counts(cell_counters);
   });
+
+  m.def("compute_cell_count_thresholds",
+        [](const value_array_t& vertices, const py::array& row,
+           const py::array& column, const py::object& weights, bool directed,
+           const value_array_t& thresholds, unsigned short min_dim,
+           short max_dim, unsigned int n_jobs) {
+          auto vertex_filtration = to_vector(vertices);
+          edge_buffers_t edge_buffers(row, column, weights);
+          // Sorted in increasing order by the caller
+          auto sorted_thresholds = to_vector(thresholds);
+
+          // Disable cout for the duration of the call
+          cout_silencer_t cout_silencer;
+
+          // The GIL is not needed from now on
+          py::gil_scoped_release release;
+
+          auto graph = filtered_directed_graph_t(vertex_filtration, directed);
+          add_edges(graph, vertex_filtration, edge_buffers);
+          edge_filtration_t edge_filtration(
+              edge_buffers, vertex_filtration.size(), directed);
+
+          directed_flag_complex_t complex(graph);
+          std::vector<threshold_cell_counter_t> cell_counters(
+              std::max(n_jobs, 1u),
+              threshold_cell_counter_t{&vertex_filtration, &edge_filtration,
+                                       &sorted_thresholds, {}});
+          parallel_for_each_cell(complex, cell_counters, min_dim, max_dim);
+
+          // Number of cells per dimension and threshold
+          std::vector<std::vector<size_t>> cell_count;
+          for (auto& counter : cell_counters) {
+            if (cell_count.size() < counter.histogram.size())
+              cell_count.resize(counter.histogram.size(),
+                                std::vector<size_t>(sorted_thresholds.size()));
+            for (size_t dim = 0; dim < counter.histogram.size(); dim++)
+              for (size_t i = 0; i < sorted_thresholds.size(); i++)
+                cell_count[dim][i] += counter.histogram[dim][i];
+          }
+          for (auto& counts : cell_count)
+            for (size_t i = 1; i < counts.size(); i++)
+              counts[i] += counts[i - 1];
+
+          return cell_count;
+        });
+
+  m.def("compute_participation",
+        [](const value_array_t& vertices, const py::array& row,
+           const py::array& column, const py::object& weights, bool directed,
+           unsigned short min_dim, short max_dim, unsigned int n_jobs) {
+          auto vertex_filtration = to_vector(vertices);
+          edge_buffers_t edge_buffers(row, column, weights);
+          const size_t number_of_vertices = vertex_filtration.size();
+
+          // Disable cout for the duration of the call
+          cout_silencer_t cout_silencer;
+
+          std::unique_ptr<edge_filtration_t> edges;
+          participation_table_t vertex_table(number_of_vertices);
+          std::unique_ptr<participation_table_t> edge_table;
+          {
+            py::gil_scoped_release release;
+
+            auto graph =
+                filtered_directed_graph_t(vertex_filtration, directed);
+            add_edges(graph, vertex_filtration, edge_buffers);
+            // Edges are identified by their index in the sorted edge list
+            edges.reset(new edge_filtration_t(edge_buffers,
+                                              number_of_vertices, directed));
+            edge_table.reset(new participation_table_t(edges->size()));
+
+            directed_flag_complex_t complex(graph);
+            std::vector<participation_counter_t> participation_counters(
+                std::max(n_jobs, 1u),
+                participation_counter_t{edges.get(), &vertex_table,
+                                        edge_table.get(), {}, {}});
+            parallel_for_each_cell(complex, participation_counters, min_dim,
+                                   max_dim);
+          }
+
+          const size_t number_of_dimensions =
+              vertex_table.number_of_dimensions();
+          py::array_t<int64_t> vertex_participation(
+              {number_of_vertices, number_of_dimensions});
+          py::array_t<vertex_index_t> edge_array(
+              {edges->size(), static_cast<size_t>(2)});
+          py::array_t<int64_t> edge_participation(
+              {edges->size(), number_of_dimensions});
+          int64_t* vertex_participation_data =
+              vertex_participation.mutable_data();
+          int64_t* edge_participation_data = edge_participation.mutable_data();
+          vertex_index_t* edge_data = edge_array.mutable_data();
+          {
+            py::gil_scoped_release release;
+            vertex_table.write(number_of_dimensions,
+                               vertex_participation_data);
+            edge_table->write(number_of_dimensions, edge_participation_data);
+            edges->write_edges(edge_data);
+          }
+
+          return py::make_tuple(vertex_participation, edge_array,
+                                edge_participation);
+        });
+
+  py::class_<cell_enumerator_t>(m, "CellEnumerator")
+      .def(py::init<const value_array_t&, const py::array&, const py::array&,
+                    const py::object&, bool, unsigned short, short>())
+      .def("count", &cell_enumerator_t::count)
+      .def("cells", &cell_enumerator_t::cells);
+
+  py::class_<incremental_cell_counter_t>(m, "IncrementalCellCounter")
+      .def(py::init<const value_array_t&, const py::array&, const py::array&,
+                    bool, unsigned int>())
+      .def("add_edges", &incremental_cell_counter_t::add_edges)
+      .def("remove_edges", &incremental_cell_counter_t::remove_edges)
+      .def("get_cell_count", &incremental_cell_counter_t::get_cell_count);
 }